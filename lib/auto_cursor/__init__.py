@@ -0,0 +1,6 @@
+"""
+Auto-Cursor Python support library
+
+Shared by the bin/ helpers and the web server. Only the standard library
+is used so the CLI keeps working on a bare python3 install.
+"""
@@ -0,0 +1,176 @@
+"""
+Admission control for the scheduler
+
+Enforces coordination.max_parallel as a hard cap on concurrently running
+agents and, optionally, lowers the cap while the host is under pressure.
+Tasks whose dependencies are met but that have no slot wait in a FIFO run
+queue; their position is visible in `orchestrate-agents status`.
+
+Thresholds come from the orchestration file's "coordination" block, with
+environment overrides:
+
+    max_parallel           AUTO_CURSOR_MAX_PARALLEL    (0 = unlimited)
+    max_load_per_cpu       AUTO_CURSOR_MAX_LOAD        (1-minute loadavg / CPUs)
+    min_available_mem_mb   AUTO_CURSOR_MIN_MEM_MB      (MemAvailable)
+
+Each threshold that is crossed halves the effective limit (never below one),
+so a loaded box keeps making progress but stops piling on agents.
+"""
+
+import os
+from collections import deque
+
+# How often a throttled queue re-checks load and memory (seconds)
+PRESSURE_RECHECK_INTERVAL = 5.0
+
+
+def _setting(coordination, key, env_var, cast):
+    value = os.environ.get(env_var)
+    if value in (None, ''):
+        value = coordination.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_per_cpu():
+    """1-minute load average divided by CPU count, or None if unavailable."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return None
+
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo in MB, or None if unavailable."""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class AdmissionController:
+    """
+    Decides how many agents may run and keeps the run queue.
+
+    Args:
+        coordination: The orchestration file's "coordination" block
+    """
+
+    def __init__(self, coordination=None):
+        coordination = coordination or {}
+        self.max_parallel = _setting(coordination, 'max_parallel', 'AUTO_CURSOR_MAX_PARALLEL', int) or 0
+        self.max_load = _setting(coordination, 'max_load_per_cpu', 'AUTO_CURSOR_MAX_LOAD', float)
+        self.min_mem_mb = _setting(coordination, 'min_available_mem_mb', 'AUTO_CURSOR_MIN_MEM_MB', int)
+        self.queue = deque()
+        self.throttled_by = []
+
+    @property
+    def pressure_aware(self):
+        return self.max_load is not None or self.min_mem_mb is not None
+
+    def limit(self):
+        """
+        Effective concurrency limit right now.
+
+        Returns:
+            int: Maximum running agents, or None for unlimited
+        """
+        self.throttled_by = []
+        if self.max_load is not None:
+            load = load_per_cpu()
+            if load is not None and load > self.max_load:
+                self.throttled_by.append(f'load {load:.2f}/cpu > {self.max_load}')
+        if self.min_mem_mb is not None:
+            mem = available_memory_mb()
+            if mem is not None and mem < self.min_mem_mb:
+                self.throttled_by.append(f'available memory {mem}MB < {self.min_mem_mb}MB')
+
+        limit = self.max_parallel if self.max_parallel > 0 else None
+        for _ in self.throttled_by:
+            # Unlimited runs are capped at the CPU count before halving
+            limit = max(1, (limit or os.cpu_count() or 1) // 2)
+        return limit
+
+    def free_slots(self, running):
+        """
+        Args:
+            running: Number of agents currently holding a slot
+
+        Returns:
+            int: How many more agents may start (the whole queue when unlimited)
+        """
+        limit = self.limit()
+        if limit is None:
+            return len(self.queue)
+        return max(0, limit - running)
+
+    def enqueue(self, task_id):
+        """Add a ready task to the back of the run queue (no-op if queued)."""
+        if task_id not in self.queue:
+            self.queue.append(task_id)
+            return True
+        return False
+
+    def remove(self, task_id):
+        try:
+            self.queue.remove(task_id)
+        except ValueError:
+            pass
+
+    def reorder(self, key):
+        """Re-rank the run queue (e.g. by critical path); stable for equal keys."""
+        self.queue = deque(sorted(self.queue, key=key))
+
+    def admit(self, running, allow=None):
+        """
+        Pop as many queued tasks as there are free slots.
+
+        Args:
+            running: Number of agents currently holding a slot
+            allow: Optional callable(task_id, admitted_so_far) -> bool; tasks
+                it rejects keep their place in the queue
+
+        Returns:
+            list: Task ids to start, in queue order
+        """
+        admitted = []
+        slots = self.free_slots(running)
+        kept = deque()
+        while self.queue and len(admitted) < slots:
+            task_id = self.queue.popleft()
+            if allow is None or allow(task_id, admitted):
+                admitted.append(task_id)
+            else:
+                kept.append(task_id)
+        kept.extend(self.queue)
+        self.queue = kept
+        return admitted
+
+    def positions(self):
+        """Run-queue position (1-based) per queued task id."""
+        return {task_id: position for position, task_id in enumerate(self.queue, 1)}
+
+    def recheck_interval(self):
+        """
+        Wake-up interval needed while tasks wait only because of host
+        pressure; None when slots only free up on agent exits.
+        """
+        if self.queue and self.pressure_aware:
+            return PRESSURE_RECHECK_INTERVAL
+        return None
+
+    def describe(self):
+        parts = [f'max_parallel={self.max_parallel or "unlimited"}']
+        if self.max_load is not None:
+            parts.append(f'max_load_per_cpu={self.max_load}')
+        if self.min_mem_mb is not None:
+            parts.append(f'min_available_mem_mb={self.min_mem_mb}')
+        return ', '.join(parts)
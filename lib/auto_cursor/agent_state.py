@@ -0,0 +1,84 @@
+"""
+Agent status and shared-state helpers
+
+Python counterparts of get_agent_status/set_agent_status/set_agent_state in
+bin/orchestrate-agents. Files under STATE_DIR stay the on-disk format; the
+SQLite store is used as well when AUTO_CURSOR_STATE_STORE=sqlite. Shared
+state goes through the coordination service (coord.py).
+"""
+
+from pathlib import Path
+
+from . import coord, state_store
+from .common import STATE_DIR, load_json, write_json_atomic, write_text_atomic
+
+_store = None
+
+
+def _get_store():
+    global _store
+    if _store is None and state_store.enabled():
+        _store = state_store.StateStore()
+    return _store
+
+
+def get_agent_status(agent_id):
+    store = _get_store()
+    if store:
+        status = store.get_agent_status(agent_id)
+        if status:
+            return status
+    try:
+        return (STATE_DIR / f'{agent_id}.status').read_text().strip() or 'pending'
+    except OSError:
+        return 'pending'
+
+
+def set_agent_status(agent_id, status, project_id=None):
+    store = _get_store()
+    if store:
+        store.transition(agent_id, status, project_id=project_id)
+    write_text_atomic(STATE_DIR / f'{agent_id}.status', status + '\n')
+
+
+def get_agent_state(agent_id):
+    return load_json(STATE_DIR / f'{agent_id}.json', {}) or {}
+
+
+def set_agent_state(agent_id, key, value):
+    # Through the coordination daemon (or its flock'd fallback), which also
+    # mirrors into the SQLite store when that is enabled
+    coord.set_value(agent_id, key, value)
+
+
+def update_task(tasks_file, project_id, task_id, status=None, fields=None):
+    """
+    Update one task in a project's tasks.json.
+
+    Args:
+        tasks_file: Path to tasks.json (skipped if it doesn't exist)
+        project_id: Project id, used for the state store
+        status: New status, or None to leave it
+        fields: Extra fields to merge into the task
+
+    Returns:
+        bool: True if the task was found
+    """
+    if not tasks_file or not Path(tasks_file).exists():
+        return False
+    store = _get_store()
+    if store and project_id and store.has_project(project_id):
+        found = store.update_task(project_id, task_id, status, fields) is not None
+        store.export_tasks(project_id, tasks_file)
+        return found
+    tasks = load_json(tasks_file, [])
+    found = False
+    for task in tasks:
+        if task.get('id') == task_id:
+            task.update(fields or {})
+            if status:
+                task['status'] = status
+            found = True
+    if found:
+        write_json_atomic(tasks_file, tasks)
+    return found
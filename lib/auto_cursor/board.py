@@ -0,0 +1,362 @@
+"""
+Kanban board, progress and task views for the CLI
+
+`auto-cursor status` used to run five jq filters over tasks.json and then
+five more jq processes plus cut for every board row; `status --detailed`
+and `tasks` re-parsed the file once per figure. These views read tasks.json
+once and lay out everything in a single pass.
+
+`--watch` redraws only when something the view shows changes: the
+project's tasks.json or orchestration.json, or an agent status file in
+STATE_DIR. Changes are delivered by inotify (via libc) where available and
+otherwise detected by comparing file stamps once a second.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from . import agent_state
+from .common import PID_DIR, PROJECTS_DIR, STATE_DIR, load_json
+
+RED = '\033[0;31m'
+GREEN = '\033[0;32m'
+YELLOW = '\033[1;33m'
+BLUE = '\033[0;34m'
+CYAN = '\033[0;36m'
+MAGENTA = '\033[0;35m'
+NC = '\033[0m'
+CLEAR = '\033[H\033[2J'
+
+# Board columns and the statuses shown in each
+COLUMNS = (
+    ('PENDING', ('pending',)),
+    ('RUNNING', ('running', 'retry_wait')),
+    ('QA', ('qa_queued', 'qa_running')),
+    ('COMPLETED', ('completed', 'qa_passed')),
+    ('FAILED', ('qa_failed', 'failed')),
+)
+COLUMN_WIDTH = 20
+DONE = ('completed', 'qa_passed')
+FAILED = ('qa_failed', 'failed')
+DEBUG_STATUSES = ('running', 'qa_running', 'qa_failed', 'failed')
+
+STATUS_COLOURS = {
+    'pending': YELLOW, 'waiting': YELLOW, 'queued': YELLOW, 'retry_wait': YELLOW,
+    'running': BLUE, 'completed': GREEN, 'qa_passed': GREEN,
+    'qa_failed': RED, 'failed': RED, 'qa_queued': CYAN, 'qa_running': CYAN,
+}
+
+SERVER_STATE_DIR = Path.home() / '.auto-cursor' / 'server-state'
+
+# inotify(7)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+EVENT_HEADER = struct.Struct('iIII')
+# Changes arriving this close together are drawn once
+SETTLE_SECONDS = 0.1
+POLL_SECONDS = 1.0
+
+
+def status_of(task):
+    return task.get('status') or 'pending'
+
+
+def _number(value):
+    return int(value) if float(value).is_integer() else round(value, 2)
+
+
+def render_board(project_id, tasks):
+    """
+    Returns:
+        list: Lines of the kanban board
+    """
+    column_of = {status: index for index, (_, statuses) in enumerate(COLUMNS) for status in statuses}
+    columns = [[] for _ in COLUMNS]
+    for task in tasks:
+        index = column_of.get(status_of(task))
+        if index is not None:
+            columns[index].append(str(task.get('id', ''))[:COLUMN_WIDTH - 2])
+
+    row_format = ' '.join(f'%-{COLUMN_WIDTH}s' for _ in COLUMNS)
+    lines = [f'{MAGENTA}=== Auto-Cursor Kanban Board: {project_id} ==={NC}', '',
+             row_format % tuple(name for name, _ in COLUMNS), '─' * 92]
+    for row in range(max(1, max(len(column) for column in columns))):
+        lines.append(row_format % tuple(column[row] if row < len(column) else '' for column in columns))
+    lines.append('')
+    return lines
+
+
+def render_agents(orchestration):
+    """
+    Status of the project's agents (the watch view's replacement for
+    `orchestrate-agents status`, which covers every project).
+    """
+    lines = []
+    for agent in (orchestration or {}).get('agents', []):
+        agent_id = agent.get('id')
+        if not agent_id or not ((STATE_DIR / f'{agent_id}.status').exists()
+                                or (PID_DIR / f'{agent_id}.pid').exists()):
+            continue
+        status = agent_state.get_agent_status(agent_id)
+        lines.append(f"  {STATUS_COLOURS.get(status, NC)}{agent_id}: {status}{NC}")
+    return [f'{CYAN}Orchestration Status:{NC}'] + (lines or ['  No active agents'])
+
+
+def render_progress(project_id, tasks):
+    """
+    Returns:
+        list: Lines of the `status --detailed` view
+    """
+    if not tasks:
+        return ['No tasks found']
+    total = len(tasks)
+    counts = {'completed': 0, 'running': 0, 'failed': 0}
+    estimated = done_estimated = 0
+    for task in tasks:
+        status = status_of(task)
+        hours = task.get('estimated_hours') or 0
+        hours = hours if isinstance(hours, (int, float)) else 0
+        estimated += hours
+        if status in DONE:
+            counts['completed'] += 1
+            done_estimated += hours
+        elif status == 'running':
+            counts['running'] += 1
+        elif status in FAILED:
+            counts['failed'] += 1
+    progress = counts['completed'] * 100 // total
+    filled = progress * 50 // 100
+
+    lines = [f'{MAGENTA}=== Progress: {project_id} ==={NC}', '',
+             f'{CYAN}Overall Progress:{NC}',
+             f"  Completed: {counts['completed']}/{total} ({progress}%)",
+             f"  Running: {counts['running']}",
+             f"  Failed: {counts['failed']}", '',
+             f"  [{'█' * filled}{'░' * (50 - filled)}] {progress}%", '']
+    if estimated:
+        lines += [f'{CYAN}Time Estimates:{NC}',
+                  f'  Total estimated: {_number(estimated)} hours',
+                  f'  Completed: {_number(done_estimated)} hours',
+                  f'  Remaining: {_number(estimated - done_estimated)} hours', '']
+    lines.append(f'{CYAN}Task Status:{NC}')
+    for task in tasks:
+        lines += [f"{task.get('id')}: {status_of(task)}",
+                  f"  {task.get('description')}",
+                  f"  Estimated: {task.get('estimated_hours') or 'unknown'} hours", '']
+    return lines
+
+
+def task_debug_info(project_dir, task):
+    """
+    Port, readiness, Playwright result, flakiness and latest artifacts for a
+    task, joined with " | " (same fields as get_task_debug_info in bin/auto-cursor).
+    """
+    task_id = task.get('id')
+    info = []
+    try:
+        port = (SERVER_STATE_DIR / f'{task_id}.port').read_text().strip()
+    except OSError:
+        port = ''
+    if port:
+        info += [f'Port: {port}', f'Base URL: http://127.0.0.1:{port}']
+    if (SERVER_STATE_DIR / f'{task_id}.readiness-proof').exists():
+        info.append('Readiness: READY')
+    elif (SERVER_STATE_DIR / f'{task_id}.readiness-failure').exists():
+        info.append('Readiness: FAILED')
+    if task.get('last_qa_result'):
+        info.append(f"Playwright: {task['last_qa_result']}")
+    if task.get('flaky_pass'):
+        info.append('Flaky: YES')
+    attempts = sorted((project_dir / 'artifacts' / str(task_id)).glob('attempt-*'),
+                      key=lambda p: p.stat().st_mtime, reverse=True)
+    if attempts:
+        info.append(f'Artifacts: {attempts[0]}')
+    return ' | '.join(info)
+
+
+def render_tasks(project_id, tasks, project_dir):
+    """
+    Returns:
+        list: Lines of the `auto-cursor tasks` view
+    """
+    lines = [f'{MAGENTA}=== Tasks: {project_id} ==={NC}', '']
+    if not tasks:
+        return lines + [f'No tasks found. Create a plan first with: auto-cursor plan {project_id} <goal>']
+    completed = sum(1 for task in tasks if status_of(task) in DONE)
+    lines += [f'{CYAN}Progress: {completed}/{len(tasks)} tasks completed '
+              f'({completed * 100 // len(tasks)}%){NC}', '']
+    for task in tasks:
+        lines += [f"{task.get('id')} - {task.get('description')}",
+                  f'  Status: {status_of(task)}',
+                  f"  Complexity: {task.get('complexity') or 'unknown'}",
+                  f"  Directory: {task.get('directory') or '.'}",
+                  f"  Dependencies: {', '.join(task.get('dependencies') or []) or 'none'}",
+                  f"  Estimated: {task.get('estimated_hours') or 'unknown'} hours"]
+    lines += ['', f'{CYAN}Debugging Info:{NC}']
+    for task in tasks:
+        if status_of(task) in DEBUG_STATUSES:
+            info = task_debug_info(project_dir, task)
+            lines += ['', f"{YELLOW}Task: {task.get('id')}{NC}", f"  {info or '(No debugging info available)'}"]
+    return lines
+
+
+def render(project_id, view='board', watching=False):
+    project_dir = PROJECTS_DIR / project_id
+    tasks = load_json(project_dir / 'tasks.json', []) or []
+    if view == 'progress':
+        return render_progress(project_id, tasks)
+    if view == 'tasks':
+        return render_tasks(project_id, tasks, project_dir)
+    lines = render_board(project_id, tasks)
+    if watching:
+        lines += render_agents(load_json(project_dir / 'orchestration.json'))
+    return lines
+
+
+class ChangeWatcher:
+    """
+    Blocks until a watched file changes.
+
+    Args:
+        watched: {directory: predicate on a file name} pairs
+    """
+
+    def __init__(self, watched):
+        self.watched = {Path(d): predicate for d, predicate in watched.items()}
+        self.fd = None
+        self.wds = {}
+        self.stamps = None
+        libc_name = ctypes.util.find_library('c')
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+        for directory in self.watched:
+            directory.mkdir(parents=True, exist_ok=True)
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+            if wd < 0:
+                os.close(fd)
+                return
+            self.wds[wd] = directory
+        self.fd = fd
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _relevant_events(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return False
+            raise
+        relevant = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            directory = self.wds.get(wd)
+            if directory is not None and self.watched[directory](os.fsdecode(name)):
+                relevant = True
+        return relevant
+
+    def _stamps(self):
+        stamps = {}
+        for directory, predicate in self.watched.items():
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if predicate(entry.name):
+                    try:
+                        stat = entry.stat()
+                        stamps[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        pass
+        return stamps
+
+    def wait(self):
+        """Return once a watched file has changed."""
+        if self.fd is None:
+            if self.stamps is None:
+                self.stamps = self._stamps()
+            while True:
+                time.sleep(POLL_SECONDS)
+                stamps = self._stamps()
+                if stamps != self.stamps:
+                    self.stamps = stamps
+                    return
+        while True:
+            select.select([self.fd], [], [])
+            if not self._relevant_events():
+                continue
+            # Let a burst (write + rename, several agents) settle into one redraw
+            while select.select([self.fd], [], [], SETTLE_SECONDS)[0]:
+                self._relevant_events()
+            return
+
+
+def watch(project_id, view='board', out=None):
+    out = out or sys.stdout
+    project_dir = PROJECTS_DIR / project_id
+    watched = {project_dir: lambda name: name in ('tasks.json', 'orchestration.json')}
+    if view == 'board':
+        watched[STATE_DIR] = lambda name: name.endswith('.status')
+    watcher = ChangeWatcher(watched)
+    try:
+        while True:
+            lines = render(project_id, view, watching=True)
+            stamp = time.strftime('%H:%M:%S')
+            out.write(CLEAR + '\n'.join(lines) + f'\n\nUpdated {stamp} - Press Ctrl+C to exit\n')
+            out.flush()
+            watcher.wait()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-board', description='Kanban board and progress views')
+    parser.add_argument('project_id')
+    parser.add_argument('--view', choices=('board', 'progress', 'tasks'), default='board')
+    parser.add_argument('--watch', action='store_true', help='Redraw whenever tasks or agent states change')
+    args = parser.parse_args(argv)
+
+    if not (PROJECTS_DIR / args.project_id).is_dir():
+        print(f'{RED}Error: Project not found: {args.project_id}{NC}', file=sys.stderr)
+        return 1
+    try:
+        if args.watch:
+            return watch(args.project_id, args.view)
+        print('\n'.join(render(args.project_id, args.view)))
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (`| head`); point stdout at /dev/null so the
+        # interpreter's own flush at exit doesn't raise again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Common paths and JSON helpers
+
+Directory layout mirrors the defaults used by bin/auto-cursor and
+bin/orchestrate-agents, including their environment overrides.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+AUTO_CURSOR_DIR = Path(os.environ.get('AUTO_CURSOR_DIR', str(Path.home() / '.auto-cursor')))
+PROJECTS_DIR = AUTO_CURSOR_DIR / 'projects'
+MEMORY_DIR = AUTO_CURSOR_DIR / 'memory'
+WORKTREES_DIR = AUTO_CURSOR_DIR / 'worktrees'
+
+AGENTS_DIR = Path(os.environ.get('AGENTS_DIR', '/tmp/cursor-agents'))
+LOG_DIR = AGENTS_DIR / 'logs'
+PID_DIR = AGENTS_DIR / 'pids'
+STATE_DIR = AGENTS_DIR / 'state'
+QA_DIR = AGENTS_DIR / 'qa'
+
+
+def load_json(path, default=None):
+    """
+    Load a JSON file, returning default if it is missing or unreadable.
+
+    Args:
+        path: File to read
+        default: Value returned when the file cannot be parsed
+
+    Returns:
+        The decoded JSON value or default
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json_atomic(path, data):
+    """
+    Write JSON to path via a temp file and rename.
+
+    Readers never observe a half-written file, which the previous
+    `jq ... > file` pattern could not guarantee.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_text_atomic(path, text):
+    """Write a small text file (status, PID) atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def project_id_for_task_file(task_file):
+    """
+    Derive the project id from an orchestration file path.
+
+    Orchestration files live at PROJECTS_DIR/<project-id>/orchestration.json;
+    anything else (e.g. a temp file) has no project.
+    """
+    task_file = Path(task_file).resolve()
+    if task_file.parent.parent == PROJECTS_DIR.resolve():
+        return task_file.parent.name
+    return None
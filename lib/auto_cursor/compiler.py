@@ -0,0 +1,155 @@
+"""
+Plan to orchestration compiler
+
+Turns a project's tasks.json into the orchestration.json consumed by
+orchestrate-agents and auto-cursor-scheduler in a single pass. This replaces
+the per-task jq loop in `auto-cursor start`, which re-parsed the growing
+agents array for every task (O(n^2) JSON work, ~6 process spawns per task)
+and pasted descriptions into a heredoc without escaping them.
+
+Used by `auto-cursor start` (fresh coordination block from --parallel and
+--policy) and `auto-cursor continue` (keeps the existing coordination block
+so settings survive a resume).
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from .common import PROJECTS_DIR, WORKTREES_DIR, load_json, write_json_atomic
+from .graph import DEFAULT_POLICY, POLICIES
+
+DEFAULT_PARALLEL = 3
+
+PROMPT_TEMPLATE = ("{description}. Work in the {directory} directory. "
+                   "Follow the project's coding standards and best practices.")
+
+
+class CompileError(Exception):
+    """Raised when a project cannot be compiled."""
+
+
+def worktree_path(project_id, task_id):
+    return WORKTREES_DIR / f'auto-cursor-{project_id}-{task_id}'
+
+
+def compile_agent(project_id, task):
+    """
+    Returns:
+        dict: The orchestration agent entry for one task
+    """
+    agent = {
+        'id': task['id'],
+        'directory': str(worktree_path(project_id, task['id'])),
+        'initial_prompt': PROMPT_TEMPLATE.format(description=task.get('description') or task['id'],
+                                                 directory=task.get('directory') or '.'),
+        'model': 'auto',
+        'dependencies': list(task.get('dependencies') or []),
+        'estimated_hours': task.get('estimated_hours'),
+        'complexity': task.get('complexity'),
+        'run_qa': True,
+        'qa_required': True,
+    }
+    if task.get('wait_for'):
+        agent['wait_for'] = list(task['wait_for'])
+    return agent
+
+
+def compile_plan(project_id, tasks, coordination):
+    """
+    Args:
+        project_id: Project the tasks belong to
+        tasks: tasks.json contents, in plan order
+        coordination: The coordination block to emit
+
+    Returns:
+        dict: orchestration.json contents
+
+    Raises:
+        CompileError: On tasks without ids or with duplicate ids
+    """
+    agents = []
+    seen = set()
+    for position, task in enumerate(tasks):
+        task_id = task.get('id') if isinstance(task, dict) else None
+        if not task_id:
+            raise CompileError(f'task #{position + 1} has no id')
+        if task_id in seen:
+            raise CompileError(f'duplicate task id: {task_id}')
+        seen.add(task_id)
+        agents.append(compile_agent(project_id, task))
+    return {'agents': agents, 'coordination': coordination}
+
+
+def default_coordination(parallel=DEFAULT_PARALLEL, policy=DEFAULT_POLICY):
+    return {
+        'shared_vars': [],
+        'qa_on_completion': True,
+        'max_parallel': parallel,
+        'policy': policy,
+    }
+
+
+def compile_project(project_id, parallel=None, policy=None, keep_coordination=False, output=None):
+    """
+    Compile PROJECTS_DIR/<project_id>/tasks.json into orchestration.json.
+
+    Args:
+        parallel: max_parallel for a fresh coordination block
+        policy: Scheduling policy for a fresh coordination block
+        keep_coordination: Reuse the existing file's coordination block
+            (parallel/policy, when given, still override it)
+        output: Where to write (default PROJECTS_DIR/<project_id>/orchestration.json)
+
+    Returns:
+        tuple: (output path, orchestration dict)
+    """
+    project_dir = PROJECTS_DIR / project_id
+    tasks = load_json(project_dir / 'tasks.json')
+    if not isinstance(tasks, list):
+        raise CompileError(f'no readable tasks.json for project {project_id}')
+    output = Path(output or project_dir / 'orchestration.json')
+
+    coordination = default_coordination()
+    if keep_coordination:
+        existing = load_json(project_dir / 'orchestration.json', {}) or {}
+        coordination.update(existing.get('coordination') or {})
+    if parallel is not None:
+        coordination['max_parallel'] = parallel
+    if policy is not None:
+        coordination['policy'] = policy
+
+    orchestration = compile_plan(project_id, tasks, coordination)
+    write_json_atomic(output, orchestration)
+    return output, orchestration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-compile',
+                                     description='Compile tasks.json into orchestration.json')
+    parser.add_argument('project_id')
+    parser.add_argument('--parallel', type=int, help=f'max_parallel (default {DEFAULT_PARALLEL})')
+    parser.add_argument('--policy', choices=POLICIES)
+    parser.add_argument('--keep-coordination', action='store_true',
+                        help="Keep the existing orchestration.json's coordination block")
+    parser.add_argument('--output', help='Write here instead of the project directory')
+    parser.add_argument('--worktrees', action='store_true',
+                        help='Print "<task-id>\\t<worktree>" for each agent after compiling')
+    args = parser.parse_args(argv)
+
+    try:
+        output, orchestration = compile_project(args.project_id, args.parallel, args.policy,
+                                                args.keep_coordination, args.output)
+    except CompileError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    if args.worktrees:
+        for agent in orchestration['agents']:
+            print(f"{agent['id']}\t{agent['directory']}")
+    else:
+        print(f"Compiled {len(orchestration['agents'])} agents into {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
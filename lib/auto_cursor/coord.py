@@ -0,0 +1,605 @@
+"""
+Shared-state coordination service
+
+`set-state` used to be `cat state.json | jq '. + {k: v}' > state.json`:
+two agents writing at once lost updates, and nothing could wait for a key
+to appear, so an agent needing a peer's API_URL had to poll. This module is
+a small daemon on a Unix socket (AGENTS_DIR/coord.sock, override with
+AUTO_CURSOR_COORD_SOCKET) that serialises all reads and writes and offers:
+
+    get       one key, or a whole namespace
+    set       set a key, returns its new version
+    cas       compare-and-set (expected value, or expected absence)
+    delete    remove a key
+    wait      block until a key exists
+    watch     block until a key changes past a known version
+
+Namespaces are agent ids plus the conventional `shared` namespace. Each one
+is persisted to STATE_DIR/<namespace>.json after every write (and to the
+SQLite store when AUTO_CURSOR_STATE_STORE=sqlite), so existing readers keep
+working. When the daemon is not running the module-level helpers fall back
+to the same files under an flock, and `wait`/`watch` poll.
+
+Protocol: one JSON object per line in each direction.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import re
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import state_store
+from .common import AGENTS_DIR, STATE_DIR, load_json, write_json_atomic
+
+SOCKET_PATH = Path(os.environ.get('AUTO_CURSOR_COORD_SOCKET', str(AGENTS_DIR / 'coord.sock')))
+PID_FILE = AGENTS_DIR / 'coord.pid'
+LOG_FILE = AGENTS_DIR / 'coord.log'
+SHARED_NAMESPACE = 'shared'
+
+CONNECT_TIMEOUT = 2.0
+# Fallback polling interval, and how often blocked waiters re-check the
+# mirror files for writes made without the daemon
+POLL_INTERVAL = 0.5
+
+NAMESPACE_PATTERN = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]*$')
+
+_MISSING = object()
+
+
+class CoordError(Exception):
+    """Raised for invalid requests and errors reported by the daemon."""
+
+
+class CoordUnavailable(CoordError):
+    """Raised when no coordination daemon is listening."""
+
+
+def _check_namespace(namespace):
+    if not isinstance(namespace, str) or not NAMESPACE_PATTERN.match(namespace):
+        raise CoordError(f'invalid namespace: {namespace!r}')
+    return namespace
+
+
+def _mirror_path(namespace):
+    return STATE_DIR / f'{namespace}.json'
+
+
+@contextmanager
+def _file_lock(namespace):
+    """Exclusive flock guarding one namespace's mirror file."""
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(STATE_DIR / f'.{namespace}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_mirror(namespace):
+    data = load_json(_mirror_path(namespace), {})
+    return data if isinstance(data, dict) else {}
+
+
+def _mtime(namespace):
+    try:
+        return _mirror_path(namespace).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+_store = None
+
+
+def _write_mirror(namespace, data, key=None):
+    """
+    Persist a namespace; also record the changed key in the SQLite store,
+    deleting it there when it is no longer in data.
+    """
+    global _store
+    write_json_atomic(_mirror_path(namespace), data)
+    if key is not None and state_store.enabled():
+        if _store is None:
+            _store = state_store.StateStore()
+        if key in data:
+            _store.set_state(namespace, key, data[key] if isinstance(data[key], str) else json.dumps(data[key]))
+        else:
+            _store.delete_state(namespace, key)
+
+
+class CoordState:
+    """
+    In-memory namespaces with per-key versions; every write is persisted
+    before it is acknowledged.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.data = {}          # namespace -> {key: value}
+        self.mtimes = {}        # namespace -> mirror mtime we last read or wrote
+        self.versions = {}      # (namespace, key) -> int
+
+    def _namespace(self, namespace):
+        """Current contents of a namespace, reloading it if the mirror changed."""
+        _check_namespace(namespace)
+        mtime = _mtime(namespace)
+        if namespace in self.data and mtime == self.mtimes.get(namespace):
+            return self.data[namespace]
+        # First use, or written by someone without the daemon
+        fresh = _read_mirror(namespace)
+        old = self.data.get(namespace, {})
+        for key in set(old) | set(fresh):
+            if old.get(key, _MISSING) != fresh.get(key, _MISSING):
+                self.versions[(namespace, key)] = self.versions.get((namespace, key), 0) + 1
+        self.data[namespace] = fresh
+        self.mtimes[namespace] = mtime
+        if old != fresh:
+            self.cond.notify_all()
+        return fresh
+
+    def _commit(self, namespace, key):
+        # Callers hold both self.cond and the namespace's file lock
+        self.versions[(namespace, key)] = self.versions.get((namespace, key), 0) + 1
+        _write_mirror(namespace, self.data[namespace], key)
+        self.mtimes[namespace] = _mtime(namespace)
+        self.cond.notify_all()
+        return self.versions[(namespace, key)]
+
+    def get(self, namespace, key=None):
+        with self.cond:
+            values = self._namespace(namespace)
+            if key is None:
+                return {'found': True, 'value': dict(values)}
+            return {'found': key in values, 'value': values.get(key),
+                    'version': self.versions.get((namespace, key), 0)}
+
+    def set(self, namespace, key, value):
+        with self.cond, _file_lock(_check_namespace(namespace)):
+            self._namespace(namespace)[key] = value
+            return {'version': self._commit(namespace, key)}
+
+    def cas(self, namespace, key, expected, value, absent=False):
+        with self.cond, _file_lock(_check_namespace(namespace)):
+            values = self._namespace(namespace)
+            current_found = key in values
+            matches = not current_found if absent else current_found and values[key] == expected
+            if not matches:
+                return {'swapped': False, 'found': current_found, 'value': values.get(key),
+                        'version': self.versions.get((namespace, key), 0)}
+            values[key] = value
+            return {'swapped': True, 'found': True, 'value': value, 'version': self._commit(namespace, key)}
+
+    def delete(self, namespace, key):
+        with self.cond, _file_lock(_check_namespace(namespace)):
+            values = self._namespace(namespace)
+            if key not in values:
+                return {'found': False}
+            del values[key]
+            return {'found': True, 'version': self._commit(namespace, key)}
+
+    def _block(self, namespace, predicate, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                values = self._namespace(namespace)
+                if predicate(values):
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(POLL_INTERVAL if remaining is None else min(remaining, POLL_INTERVAL))
+
+    def wait(self, namespace, key, timeout=None):
+        found = self._block(namespace, lambda values: key in values, timeout)
+        return dict(self.get(namespace, key), timed_out=not found)
+
+    def watch(self, namespace, key, since=None, timeout=None):
+        if since is None:
+            since = self.get(namespace, key)['version']
+        changed = self._block(namespace, lambda _: self.versions.get((namespace, key), 0) > since, timeout)
+        return dict(self.get(namespace, key), timed_out=not changed)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = dict(self.server.dispatch(json.loads(line)), ok=True)
+            except (CoordError, ValueError, TypeError, KeyError) as e:
+                response = {'ok': False, 'error': str(e)}
+            try:
+                self.wfile.write(json.dumps(response).encode() + b'\n')
+                self.wfile.flush()
+            except OSError:
+                return
+
+
+class CoordServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path=SOCKET_PATH):
+        self.state = CoordState()
+        super().__init__(str(path), _Handler)
+
+    def dispatch(self, request):
+        op = request.get('op')
+        state = self.state
+        if op == 'ping':
+            return {'pid': os.getpid()}
+        if op == 'get':
+            return state.get(request['namespace'], request.get('key'))
+        if op == 'set':
+            return state.set(request['namespace'], request['key'], request['value'])
+        if op == 'cas':
+            return state.cas(request['namespace'], request['key'], request.get('expected'),
+                             request['value'], request.get('absent', False))
+        if op == 'delete':
+            return state.delete(request['namespace'], request['key'])
+        if op == 'wait':
+            return state.wait(request['namespace'], request['key'], request.get('timeout'))
+        if op == 'watch':
+            return state.watch(request['namespace'], request['key'], request.get('since'),
+                               request.get('timeout'))
+        raise CoordError(f'unknown op: {op!r}')
+
+
+class CoordClient:
+    """
+    Connection to the coordination daemon.
+
+    Raises:
+        CoordUnavailable: If nothing is listening on the socket
+    """
+
+    def __init__(self, path=SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            self.sock.connect(str(path))
+        except OSError as e:
+            self.sock.close()
+            raise CoordUnavailable(str(e))
+        # Blocking ops (wait/watch) may take as long as they need
+        self.sock.settimeout(None)
+        self.stream = self.sock.makefile('rwb')
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def request(self, op, **fields):
+        self.stream.write(json.dumps(dict(fields, op=op)).encode() + b'\n')
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise CoordUnavailable('coordination daemon closed the connection')
+        response = json.loads(line)
+        if not response.pop('ok', False):
+            raise CoordError(response.get('error', 'request failed'))
+        return response
+
+
+def _request(op, **fields):
+    with CoordClient() as client:
+        return client.request(op, **fields)
+
+
+# Module-level API: the daemon when it is up, the flock'd files otherwise
+
+
+def get(namespace, key=None):
+    """
+    Returns:
+        dict: found, value (the whole namespace when key is None), version
+    """
+    try:
+        return _request('get', namespace=namespace, key=key)
+    except CoordUnavailable:
+        values = _read_mirror(_check_namespace(namespace))
+        if key is None:
+            return {'found': True, 'value': values}
+        return {'found': key in values, 'value': values.get(key)}
+
+
+def set_value(namespace, key, value):
+    try:
+        return _request('set', namespace=namespace, key=key, value=value)
+    except CoordUnavailable:
+        with _file_lock(_check_namespace(namespace)):
+            values = _read_mirror(namespace)
+            values[key] = value
+            _write_mirror(namespace, values, key)
+        return {}
+
+
+def cas(namespace, key, expected, value, absent=False):
+    """
+    Set key to value only if it currently equals expected (or, with absent,
+    does not exist).
+
+    Returns:
+        dict: swapped, and the key's value after the call
+    """
+    try:
+        return _request('cas', namespace=namespace, key=key, expected=expected, value=value, absent=absent)
+    except CoordUnavailable:
+        with _file_lock(_check_namespace(namespace)):
+            values = _read_mirror(namespace)
+            matches = key not in values if absent else key in values and values[key] == expected
+            if not matches:
+                return {'swapped': False, 'found': key in values, 'value': values.get(key)}
+            values[key] = value
+            _write_mirror(namespace, values, key)
+        return {'swapped': True, 'found': True, 'value': value}
+
+
+def delete(namespace, key):
+    try:
+        return _request('delete', namespace=namespace, key=key)
+    except CoordUnavailable:
+        with _file_lock(_check_namespace(namespace)):
+            values = _read_mirror(namespace)
+            if key not in values:
+                return {'found': False}
+            del values[key]
+            _write_mirror(namespace, values, key)
+        return {'found': True}
+
+
+def wait_for_key(namespace, key, timeout=None):
+    """
+    Block until key exists in namespace.
+
+    Returns:
+        dict: found, value, timed_out
+    """
+    try:
+        return _request('wait', namespace=namespace, key=key, timeout=timeout)
+    except CoordUnavailable:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            values = _read_mirror(_check_namespace(namespace))
+            if key in values:
+                return {'found': True, 'value': values[key], 'timed_out': False}
+            if deadline is not None and time.monotonic() >= deadline:
+                return {'found': False, 'value': None, 'timed_out': True}
+            time.sleep(POLL_INTERVAL)
+
+
+def watch(namespace, key, since=None, timeout=None):
+    """
+    Block until key changes after version since (the current version when
+    None). Without the daemon, changes are detected by comparing values.
+
+    Returns:
+        dict: found, value, version, timed_out
+    """
+    try:
+        return _request('watch', namespace=namespace, key=key, since=since, timeout=timeout)
+    except CoordUnavailable:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        initial = _read_mirror(_check_namespace(namespace)).get(key, _MISSING)
+        while True:
+            time.sleep(POLL_INTERVAL)
+            values = _read_mirror(namespace)
+            if values.get(key, _MISSING) != initial:
+                return {'found': key in values, 'value': values.get(key), 'timed_out': False}
+            if deadline is not None and time.monotonic() >= deadline:
+                return {'found': key in values, 'value': values.get(key), 'timed_out': True}
+
+
+# Daemon management
+
+
+def daemon_pid():
+    """PID of the running daemon, or None."""
+    try:
+        return _request('ping')['pid']
+    except (CoordError, OSError, ValueError):
+        return None
+
+
+def serve(path=SOCKET_PATH):
+    """Run the daemon in the foreground until SIGTERM/SIGINT."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.parent / '.coord.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print('Coordination daemon already running', file=sys.stderr)
+            return 1
+        # Leftover socket from a daemon that died without cleaning up
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        server = CoordServer(path)
+        os.chmod(path, 0o600)
+        PID_FILE.write_text(f'{os.getpid()}\n')
+
+        def stop(*_):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        try:
+            server.serve_forever(poll_interval=POLL_INTERVAL)
+        finally:
+            server.server_close()
+            for leftover in (path, PID_FILE):
+                try:
+                    leftover.unlink()
+                except OSError:
+                    pass
+    return 0
+
+
+def ensure_daemon(wait=5.0):
+    """
+    Start the daemon in the background unless one is already listening.
+
+    Returns:
+        int: The daemon's PID, or None if it did not come up
+    """
+    pid = daemon_pid()
+    if pid:
+        return pid
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOG_FILE, 'a') as log:
+        subprocess.Popen([sys.executable, '-m', 'auto_cursor.coord', 'serve'],
+                         cwd='/', stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                         start_new_session=True,
+                         env=dict(os.environ, PYTHONPATH=os.pathsep.join(
+                             filter(None, [str(Path(__file__).resolve().parent.parent),
+                                           os.environ.get('PYTHONPATH')]))))
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        pid = daemon_pid()
+        if pid:
+            return pid
+        time.sleep(0.05)
+    return None
+
+
+def stop_daemon():
+    pid = daemon_pid()
+    if not pid:
+        return False
+    os.kill(pid, signal.SIGTERM)
+    return True
+
+
+def _parse_value(text, as_json):
+    if not as_json:
+        return text
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise CoordError(f'not valid JSON: {text}')
+
+
+def _print_value(value):
+    print(value if isinstance(value, str) else json.dumps(value, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-coord', description='Shared-state coordination service')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('serve', help='Run the daemon in the foreground')
+    sub.add_parser('start', help='Start the daemon in the background (no-op if running)')
+    sub.add_parser('stop', help='Stop the daemon')
+    sub.add_parser('status', help='Show whether the daemon is running')
+
+    p = sub.add_parser('get', help='Print a value, or a whole namespace as JSON')
+    p.add_argument('namespace')
+    p.add_argument('key', nargs='?')
+
+    p = sub.add_parser('set', help='Set a value')
+    p.add_argument('namespace')
+    p.add_argument('key')
+    p.add_argument('value')
+    p.add_argument('--json', action='store_true', help='Parse value as JSON')
+
+    p = sub.add_parser('cas', help='Compare-and-set; exit 1 if the current value did not match')
+    p.add_argument('namespace')
+    p.add_argument('key')
+    p.add_argument('expected', nargs='?')
+    p.add_argument('value')
+    p.add_argument('--absent', action='store_true', help='Only set if the key does not exist')
+    p.add_argument('--json', action='store_true', help='Parse expected and value as JSON')
+
+    p = sub.add_parser('delete', help='Remove a key')
+    p.add_argument('namespace')
+    p.add_argument('key')
+
+    p = sub.add_parser('wait', help='Block until a key exists, then print it')
+    p.add_argument('namespace')
+    p.add_argument('key')
+    p.add_argument('--timeout', type=float)
+
+    p = sub.add_parser('watch', help='Print a key every time it changes')
+    p.add_argument('namespace')
+    p.add_argument('key')
+    p.add_argument('--timeout', type=float, help='Stop after this many seconds without a change')
+    p.add_argument('--once', action='store_true', help='Exit after the first change')
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'serve':
+            return serve()
+        if args.command == 'start':
+            pid = ensure_daemon()
+            if not pid:
+                print(f'Coordination daemon failed to start; see {LOG_FILE}', file=sys.stderr)
+                return 1
+            print(f'Coordination daemon running (PID: {pid}, socket: {SOCKET_PATH})')
+        elif args.command == 'stop':
+            print('Coordination daemon stopped' if stop_daemon() else 'Coordination daemon not running')
+        elif args.command == 'status':
+            pid = daemon_pid()
+            print(f'Coordination daemon running (PID: {pid}, socket: {SOCKET_PATH})' if pid
+                  else 'Coordination daemon not running (falling back to state files)')
+            return 0 if pid else 1
+        elif args.command == 'get':
+            result = get(args.namespace, args.key)
+            if not result['found']:
+                return 1
+            _print_value(result['value'])
+        elif args.command == 'set':
+            set_value(args.namespace, args.key, _parse_value(args.value, args.json))
+        elif args.command == 'cas':
+            if args.expected is None and not args.absent:
+                parser.error('cas needs an expected value or --absent')
+            result = cas(args.namespace, args.key,
+                         None if args.absent else _parse_value(args.expected, args.json),
+                         _parse_value(args.value, args.json), args.absent)
+            if not result['swapped']:
+                if result['found']:
+                    _print_value(result['value'])
+                return 1
+        elif args.command == 'delete':
+            return 0 if delete(args.namespace, args.key)['found'] else 1
+        elif args.command == 'wait':
+            result = wait_for_key(args.namespace, args.key, args.timeout)
+            if result['timed_out']:
+                return 1
+            _print_value(result['value'])
+        elif args.command == 'watch':
+            version = None
+            while True:
+                result = watch(args.namespace, args.key, version, args.timeout)
+                if result['timed_out']:
+                    return 1
+                version = result.get('version')
+                _print_value(result['value'] if result['found'] else None)
+                sys.stdout.flush()
+                if args.once:
+                    break
+    except CoordError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
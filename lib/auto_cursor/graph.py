@@ -0,0 +1,145 @@
+"""
+Plan dependency graph and critical-path ranking
+
+Tasks carry `dependencies` and `estimated_hours` from auto-cursor-planner.
+The critical-path rank of a task is the longest chain of estimated hours
+from that task down to the end of the plan, so tasks that gate long chains
+can be started first when there are more ready tasks than slots.
+
+Observed run times are fed back through DurationModel, which keeps a
+per-complexity correction factor (actual / estimated) in
+MEMORY_DIR/durations.json.
+"""
+
+import time
+
+from .common import MEMORY_DIR, load_json, write_json_atomic
+
+POLICIES = ('critical-path', 'fifo')
+DEFAULT_POLICY = 'critical-path'
+
+# Fallback estimates when a task has no estimated_hours
+COMPLEXITY_HOURS = {'simple': 2.0, 'medium': 4.0, 'complex': 8.0}
+DEFAULT_HOURS = 4.0
+
+DURATIONS_FILE = MEMORY_DIR / 'durations.json'
+
+# Weight of the newest observation in the moving average
+DURATION_ALPHA = 0.3
+
+
+class DependencyGraph:
+    """
+    Task dependency graph in plan order.
+
+    Args:
+        nodes: Iterable of (task_id, dependencies, estimated_hours) in plan order
+    """
+
+    def __init__(self, nodes):
+        self.order = []
+        self.dependencies = {}
+        self.dependents = {}
+        self.weights = {}
+        for task_id, dependencies, hours in nodes:
+            self.order.append(task_id)
+            self.dependencies[task_id] = list(dependencies or [])
+            self.dependents.setdefault(task_id, [])
+            self.weights[task_id] = hours
+            for dep in self.dependencies[task_id]:
+                self.dependents.setdefault(dep, []).append(task_id)
+        self.index = {task_id: i for i, task_id in enumerate(self.order)}
+        self._ranks = None
+
+    def critical_path_lengths(self):
+        """
+        Longest remaining path (in hours) from each task to the end of the plan,
+        including the task itself.
+
+        Returns:
+            dict: task_id -> hours
+        """
+        if self._ranks is not None:
+            return self._ranks
+
+        ranks = {}
+        visiting = set()
+        for root in self.order:
+            if root in ranks:
+                continue
+            # Iterative post-order DFS over dependents so deep chains don't
+            # hit the recursion limit
+            stack = [(root, iter(self.dependents.get(root, ())))]
+            visiting.add(root)
+            while stack:
+                task_id, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    visiting.discard(task_id)
+                    downstream = max((ranks.get(c, 0.0) for c in self.dependents.get(task_id, ())
+                                      if c in self.weights), default=0.0)
+                    ranks[task_id] = self.weights.get(task_id, 0.0) + downstream
+                elif child in self.weights and child not in ranks and child not in visiting:
+                    # Children already on the stack form a cycle; they count as 0
+                    visiting.add(child)
+                    stack.append((child, iter(self.dependents.get(child, ()))))
+        self._ranks = ranks
+        return ranks
+
+    def priority_key(self, policy=DEFAULT_POLICY):
+        """
+        Sort key for ready tasks: longest remaining path first, plan order
+        breaking ties. The fifo policy uses plan order only.
+        """
+        if policy == 'fifo':
+            return lambda task_id: self.index.get(task_id, len(self.order))
+        ranks = self.critical_path_lengths()
+        return lambda task_id: (-ranks.get(task_id, 0.0), self.index.get(task_id, len(self.order)))
+
+
+class DurationModel:
+    """
+    Per-complexity correction of planner estimates from observed run times.
+
+    durations.json:
+        {"ratios": {"medium": {"ratio": 1.4, "samples": 12}, ...}, "updated": ...}
+    """
+
+    def __init__(self, path=DURATIONS_FILE):
+        self.path = path
+        self.data = load_json(path, {}) or {}
+        self.data.setdefault('ratios', {})
+
+    def _ratio(self, complexity):
+        entry = self.data['ratios'].get(complexity or 'default') or self.data['ratios'].get('default')
+        return entry['ratio'] if entry else 1.0
+
+    def estimate(self, estimated_hours, complexity=None):
+        """
+        Corrected estimate in hours for a task.
+
+        Args:
+            estimated_hours: Planner estimate, or None
+            complexity: simple/medium/complex, or None
+        """
+        if not estimated_hours:
+            estimated_hours = COMPLEXITY_HOURS.get(complexity, DEFAULT_HOURS)
+        return float(estimated_hours) * self._ratio(complexity)
+
+    def record(self, estimated_hours, complexity, actual_seconds):
+        """Fold one observed run into the moving average and save."""
+        if not actual_seconds or actual_seconds <= 0:
+            return
+        if not estimated_hours:
+            estimated_hours = COMPLEXITY_HOURS.get(complexity, DEFAULT_HOURS)
+        observed = (actual_seconds / 3600.0) / float(estimated_hours)
+        for key in {complexity or 'default', 'default'}:
+            entry = self.data['ratios'].get(key)
+            if entry:
+                entry['ratio'] = (1 - DURATION_ALPHA) * entry['ratio'] + DURATION_ALPHA * observed
+                entry['samples'] += 1
+            else:
+                self.data['ratios'][key] = {'ratio': observed, 'samples': 1}
+        self.data['updated'] = time.time()
+        write_json_atomic(self.path, self.data)
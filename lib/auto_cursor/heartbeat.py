@@ -0,0 +1,241 @@
+"""
+Agent heartbeats and the liveness watchdog
+
+While an agent runs, auto-cursor-logcap rewrites LOG_DIR/<agent-id>.heartbeat
+every AGENT_HEARTBEAT_INTERVAL seconds (default 5) with one line:
+
+    <epoch> <agent-pid> <log-bytes> <running|paused>
+
+It beats while cursor-agent is alive, so the beats stop as soon as the
+agent (or logcap) dies. `cursor-agent --print` can sit silent and nearly
+idle for minutes while it waits on a long model response, so being alive
+counts as progress; setting AGENT_IDLE_GRACE (seconds) also stops the beats
+once the agent has produced no output and used no CPU time for that long.
+Before the agent starts (pause file, waiting on shared state) the wrapper
+beats "paused" itself.
+
+The scheduler's watchdog reads it on every tick:
+
+- missed heartbeat: no beat for MISSED_BEATS intervals means the agent is
+  gone (or idle past AGENT_IDLE_GRACE when that is set); detected within
+  ~15 seconds.
+- stalled agent: the agent is alive but the log has not grown for the
+  task's stall timeout, which is what catches a hung agent. The timeout depends on complexity and can be set
+  with coordination.stall_timeout (seconds, or {"simple": ..., "medium":
+  ..., "complex": ...}) or AUTO_CURSOR_STALL_TIMEOUT. Paused agents (PAUSE
+  file) never stall.
+
+Either way the agent's whole process group is killed and its slot freed.
+
+When the agent exits, logcap writes its exit code to LOG_DIR/<agent-id>.exit
+next to the heartbeat. Agents started in tmux are not the scheduler's
+children, so this is the only way it learns that one crashed.
+"""
+
+import os
+import time
+from pathlib import Path
+
+from .common import LOG_DIR
+
+HEARTBEAT_INTERVAL = float(os.environ.get('AGENT_HEARTBEAT_INTERVAL', '5'))
+MISSED_BEATS = 3
+# Seconds without output or CPU time before the agent stops beating; 0
+# (the default) beats for as long as the agent is alive
+IDLE_GRACE = float(os.environ.get('AGENT_IDLE_GRACE') or 0)
+
+# Hangs are caught here, not by missed beats
+DEFAULT_STALL_TIMEOUTS = {'simple': 300, 'medium': 600, 'complex': 900}
+DEFAULT_STALL_TIMEOUT = 600
+
+# Seconds between SIGTERM and SIGKILL when the watchdog stops an agent
+KILL_GRACE = 5.0
+
+
+def heartbeat_path(agent_id):
+    return LOG_DIR / f'{agent_id}.heartbeat'
+
+
+def read_heartbeat(agent_id):
+    """
+    Returns:
+        dict: ts, pid, log_bytes, state; or None if there is no heartbeat
+    """
+    try:
+        fields = heartbeat_path(agent_id).read_text().split()
+        return {
+            'ts': float(fields[0]),
+            'pid': int(fields[1]),
+            'log_bytes': int(fields[2]),
+            'state': fields[3] if len(fields) > 3 else 'running',
+        }
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def exit_path(heartbeat_file):
+    """The exit code file that goes with a heartbeat file."""
+    return Path(heartbeat_file).with_suffix('.exit')
+
+
+def read_exit_code(agent_id):
+    """
+    Returns:
+        int: The agent's exit code as recorded by logcap, or None
+    """
+    try:
+        return int(exit_path(heartbeat_path(agent_id)).read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(agent_id, now=None):
+    """True if the agent made progress (or was paused) within the missed-heartbeat window."""
+    beat = read_heartbeat(agent_id)
+    return bool(beat) and (now or time.time()) - beat['ts'] <= HEARTBEAT_INTERVAL * MISSED_BEATS
+
+
+def group_cpu_ticks(pgid, exclude=()):
+    """
+    CPU time (clock ticks, including reaped children) of every process in a
+    process group.
+
+    Returns:
+        int: Total ticks, or None where /proc is not available
+    """
+    total = 0
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return None
+    for name in entries:
+        if not name.isdigit() or int(name) in exclude:
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after "(comm)": state ppid pgrp ... utime stime cutime cstime
+        fields = stat[stat.rindex(')') + 2:].split()
+        if len(fields) > 14 and int(fields[2]) == pgid:
+            total += sum(int(v) for v in fields[11:15])
+    return total
+
+
+class AgentBeat:
+    """
+    Writes an agent's heartbeat while it makes progress (used by
+    auto-cursor-logcap).
+
+    Args:
+        path: The heartbeat file
+        pid: The agent's PID, written into each beat
+        pause_files: A beat is "paused" (never a stall) while any of these exist
+        cpu_ticks: Called with no arguments, returns the agent's CPU time
+            (default: its process group's, without this process)
+        idle_grace: Stop beating after this many seconds without output or
+            CPU time; 0 beats while the agent is alive
+    """
+
+    def __init__(self, path, pid, pause_files=(), cpu_ticks=None,
+                 interval=HEARTBEAT_INTERVAL, idle_grace=IDLE_GRACE):
+        self.path = str(path)
+        self.pid = pid
+        self.pause_files = [str(p) for p in pause_files]
+        if cpu_ticks is None:
+            pgid, me = os.getpgid(pid), os.getpid()
+            cpu_ticks = lambda: group_cpu_ticks(pgid, exclude=(me,))
+        self.cpu_ticks = cpu_ticks
+        self.interval = interval
+        self.idle_grace = idle_grace
+        self.last_beat = None
+        self.last_progress = None
+        self.last_sample = (None, None)
+
+    def tick(self, log_bytes, now=None):
+        """
+        Beat if an interval has passed and, with an idle grace period, the
+        agent made progress within it.
+
+        Returns:
+            bool: True if a beat was written
+        """
+        now = now or time.time()
+        if self.last_beat is not None and now - self.last_beat < self.interval:
+            return False
+        self.last_beat = now
+        paused = any(os.path.exists(p) for p in self.pause_files)
+        if self.idle_grace:
+            cpu = self.cpu_ticks()
+            # Without /proc, being alive has to count as progress
+            if (log_bytes, cpu) != self.last_sample or cpu is None or self.last_progress is None:
+                self.last_progress = now
+            self.last_sample = (log_bytes, cpu)
+            if not paused and now - self.last_progress > self.idle_grace:
+                return False
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(f"{int(now)} {self.pid} {log_bytes} {'paused' if paused else 'running'}\n")
+            os.replace(tmp, self.path)
+        except OSError:
+            return False
+        return True
+
+
+def stall_timeout(complexity, coordination=None):
+    value = os.environ.get('AUTO_CURSOR_STALL_TIMEOUT') or (coordination or {}).get('stall_timeout')
+    if isinstance(value, dict):
+        value = value.get(complexity or 'medium', value.get('default'))
+    try:
+        if value not in (None, ''):
+            return float(value)
+    except (TypeError, ValueError):
+        pass
+    return float(DEFAULT_STALL_TIMEOUTS.get(complexity, DEFAULT_STALL_TIMEOUT))
+
+
+class Watchdog:
+    """
+    Tracks heartbeat progress per running agent.
+
+    Args:
+        coordination: The orchestration file's "coordination" block
+    """
+
+    def __init__(self, coordination=None):
+        self.coordination = coordination or {}
+        self.progress = {}      # agent id -> (log_bytes, when it last changed)
+
+    def forget(self, agent_id):
+        self.progress.pop(agent_id, None)
+
+    def check(self, agent_id, started, complexity=None, now=None):
+        """
+        Args:
+            agent_id: Agent to check
+            started: When the agent was launched (epoch seconds)
+            complexity: Task complexity, selects the stall timeout
+
+        Returns:
+            str: Why the agent is considered dead, or None if it is healthy
+        """
+        now = now or time.time()
+        beat = read_heartbeat(agent_id)
+        if not beat or (started and beat['ts'] < started - 1):
+            # No beat from this run yet (older wrappers never beat)
+            return None
+
+        silence = now - beat['ts']
+        if silence > HEARTBEAT_INTERVAL * MISSED_BEATS:
+            return f'missed heartbeat ({silence:.0f}s since last beat)'
+
+        last_bytes, changed = self.progress.get(agent_id, (None, now))
+        if beat['log_bytes'] != last_bytes or beat['state'] == 'paused':
+            self.progress[agent_id] = (beat['log_bytes'], now)
+            return None
+        timeout = stall_timeout(complexity, self.coordination)
+        if now - changed > timeout:
+            return f'no output for {now - changed:.0f}s (stall timeout {timeout:.0f}s)'
+        return None
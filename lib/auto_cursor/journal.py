@@ -0,0 +1,255 @@
+"""
+Write-ahead scheduler journal
+
+`auto-cursor continue` rebuilt the scheduler's view of a run from scratch:
+cleanup_stale_resources() ran jq and kill -0 for every task, every task was
+piped through jq in a `while read` loop to fix its status, and the restarted
+scheduler then read every task's status file again. Resume time grew with
+the size of the plan rather than with what happened since the last run.
+
+The scheduler now appends each decision to PROJECTS_DIR/<project>/journal.jsonl
+before acting on it, one compact JSON object per line:
+
+- status: the task entered a status
+- spawn: an agent was started, with its pid
+- exit: an agent exited, with its exit code
+- qa: a QA verdict (passed or failed, and whether it came from the cache)
+- retry: a retry was scheduled (attempt count and due time)
+- merged: auto-cursor-merge merged the task's branch
+
+journal-checkpoint.json holds every task's state as of the last checkpoint,
+and the journal only holds the records written since. On start the
+scheduler loads the checkpoint, replays the journal tail, writes a new
+checkpoint and truncates the journal; it checkpoints again every
+CHECKPOINT_EVERY records and when it stops. Records carry absolute values
+(a status, a pid, an attempt count), never increments, so a crash between
+writing the checkpoint and truncating the journal only replays records
+whose effect is already in the checkpoint.
+
+Appends hold a shared flock on the journal and checkpoints an exclusive one,
+so records from auto-cursor-merge are never lost to a truncation. Status
+changes made outside the scheduler (ORCHESTRATE_ENGINE=bash) are not
+journaled; that engine and `auto-cursor start` drop the journal, and the
+scheduler falls back to the per-task status files.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+import time
+
+from .common import PROJECTS_DIR, load_json, write_json_atomic
+
+JOURNAL_FILE = 'journal.jsonl'
+CHECKPOINT_FILE = 'journal-checkpoint.json'
+CHECKPOINT_EVERY = int(os.environ.get('AUTO_CURSOR_JOURNAL_CHECKPOINT_EVERY', '256'))
+CHECKPOINT_VERSION = 1
+
+EVENTS = ('status', 'spawn', 'exit', 'qa', 'retry', 'merged')
+
+
+def enabled():
+    return os.environ.get('AUTO_CURSOR_JOURNAL', '').lower() not in ('off', '0', 'false', 'no')
+
+
+def journal_paths(project_id):
+    project_dir = PROJECTS_DIR / project_id
+    return project_dir / JOURNAL_FILE, project_dir / CHECKPOINT_FILE
+
+
+def apply(state, record):
+    """Fold one record into state (task id -> fields); unknown records are ignored."""
+    task_id = record.get('task')
+    event = record.get('e')
+    if not task_id or event not in EVENTS:
+        return
+    entry = state.setdefault(task_id, {'status': 'pending'})
+    if event == 'status':
+        entry['status'] = record.get('status') or 'pending'
+    elif event == 'spawn':
+        entry['pid'] = record.get('pid') or 0
+        entry['started'] = record.get('t')
+    elif event == 'exit':
+        entry['exit_code'] = record.get('code')
+    elif event == 'qa':
+        entry['qa'] = 'passed' if record.get('passed') else 'failed'
+        entry['qa_cached'] = bool(record.get('cached'))
+    elif event == 'retry':
+        entry['retry_count'] = record.get('retry_count') or 0
+        entry['next_retry_time'] = record.get('due')
+    elif event == 'merged':
+        entry['merged'] = record.get('t')
+
+
+def read_records(f):
+    """Records from an open journal, skipping a torn last line left by a crash."""
+    f.seek(0)
+    records = []
+    for line in f:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records
+
+
+class Journal:
+    """One project's journal and checkpoint; append errors never reach the caller."""
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.path, self.checkpoint_path = journal_paths(project_id)
+        self.state = None
+        self.appended = 0
+
+    def exists(self):
+        return self.checkpoint_path.exists() or self.path.exists()
+
+    def append(self, event, task_id, **fields):
+        record = dict(fields, e=event, task=task_id, t=round(time.time(), 3))
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+        try:
+            # One write() on an O_APPEND descriptor, under a shared lock so a
+            # checkpoint can't truncate between our write and its read
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except OSError:
+            return
+        self.appended += 1
+        if self.state is not None and self.appended >= CHECKPOINT_EVERY:
+            self.checkpoint()
+
+    def _load_checkpoint(self):
+        data = load_json(self.checkpoint_path)
+        if isinstance(data, dict) and data.get('version') == CHECKPOINT_VERSION:
+            return data.get('tasks') or {}
+        return {}
+
+    def checkpoint(self):
+        """
+        Fold the journal into the checkpoint and truncate it.
+
+        Returns:
+            tuple: (task id -> state, number of records replayed)
+        """
+        if self.state is None:
+            self.state = self._load_checkpoint()
+        try:
+            f = open(self.path, 'a+')
+        except OSError:
+            return self.state, 0
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            records = read_records(f)
+            for record in records:
+                apply(self.state, record)
+            try:
+                write_json_atomic(self.checkpoint_path, {
+                    'version': CHECKPOINT_VERSION,
+                    'written': time.time(),
+                    'tasks': self.state,
+                })
+                f.truncate(0)
+            except OSError:
+                pass
+        self.appended = 0
+        return self.state, len(records)
+
+    def recover(self):
+        """
+        The state of every journaled task, as of the last record.
+
+        Returns:
+            tuple: (task id -> state, number of records replayed), or (None, 0)
+                if there is no journal
+        """
+        if not self.exists():
+            return None, 0
+        return self.checkpoint()
+
+    def reset(self):
+        for path in (self.path, self.checkpoint_path):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self.state = None
+        self.appended = 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-journal', description='Scheduler write-ahead journal')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('append', help='Append a record (for shell scripts)')
+    p.add_argument('project_id')
+    p.add_argument('event', choices=EVENTS)
+    p.add_argument('--task', required=True)
+
+    p = sub.add_parser('show', help="Every journaled task's state (replays the tail, read-only)")
+    p.add_argument('project_id')
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('exists', help='Exit 0 if the project has a journal')
+    p.add_argument('project_id')
+
+    p = sub.add_parser('checkpoint', help='Fold the journal into the checkpoint now')
+    p.add_argument('project_id')
+
+    p = sub.add_parser('reset', help='Drop the journal and checkpoint')
+    p.add_argument('project_id')
+
+    args = parser.parse_args(argv)
+
+    if not (PROJECTS_DIR / args.project_id).is_dir():
+        print(f'Error: Project not found: {args.project_id}', file=sys.stderr)
+        return 1
+    journal = Journal(args.project_id)
+
+    if args.command == 'append':
+        if enabled():
+            journal.append(args.event, args.task)
+    elif args.command == 'exists':
+        return 0 if journal.exists() else 1
+    elif args.command == 'checkpoint':
+        _, replayed = journal.checkpoint()
+        print(f'Folded {replayed} records into {journal.checkpoint_path}')
+    elif args.command == 'reset':
+        journal.reset()
+    elif args.command == 'show':
+        state = journal._load_checkpoint()
+        try:
+            with open(journal.path) as f:
+                for record in read_records(f):
+                    apply(state, record)
+        except OSError:
+            pass
+        if args.json:
+            print(json.dumps(state, indent=2))
+        else:
+            for task_id, entry in state.items():
+                details = [entry.get('status', 'pending')]
+                if entry.get('pid'):
+                    details.append(f"pid {entry['pid']}")
+                if entry.get('exit_code') is not None:
+                    details.append(f"exit {entry['exit_code']}")
+                if entry.get('qa'):
+                    details.append(f"QA {entry['qa']}" + (' (cached)' if entry.get('qa_cached') else ''))
+                if entry.get('retry_count'):
+                    details.append(f"attempt {entry['retry_count'] + 1}")
+                if entry.get('merged'):
+                    details.append('merged')
+                print(f"{task_id:<24} {', '.join(details)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
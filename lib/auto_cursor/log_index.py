@@ -0,0 +1,368 @@
+"""
+Full-text search over a project's agent and QA logs
+
+An SQLite FTS5 inverted index (AUTO_CURSOR_DIR/log-index.db, override with
+AUTO_CURSOR_LOG_INDEX_DB) over every line of a project's agent logs and QA
+logs. Each file's indexed size and inode are remembered, so an update only
+reads the bytes appended since the last one; a file that shrank or was
+replaced (a new run) is re-indexed from the start. QA logs are rewritten in
+place by each attempt (and by a QA cache hit) and can grow past their old
+size, so a fingerprint of the indexed bytes (the first and last
+FINGERPRINT_BYTES of them) is remembered too; appends never change it, and
+a rewrite that does is re-indexed from the start.
+
+Agent logs are indexed from their structured capture (<id>.jsonl, see
+logcap.py) when there is one, otherwise from the raw log. Every hit carries
+the byte offset of its line in the file it came from, which is what the web
+log view's `offset` parameter takes.
+
+The index is bounded to MAX_LINES lines per project (oldest dropped first,
+AUTO_CURSOR_LOG_INDEX_MAX_LINES) and can always be rebuilt from the logs.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from . import logcap
+from .common import AUTO_CURSOR_DIR, LOG_DIR, PROJECTS_DIR, QA_DIR, load_json
+
+DEFAULT_DB_PATH = Path(os.environ.get('AUTO_CURSOR_LOG_INDEX_DB', str(AUTO_CURSOR_DIR / 'log-index.db')))
+MAX_LINES = int(os.environ.get('AUTO_CURSOR_LOG_INDEX_MAX_LINES', '200000'))
+# Appended bytes are read and indexed in chunks of this size
+READ_SIZE = 1 << 20
+FINGERPRINT_BYTES = 4096
+
+SEVERITIES = ('error', 'warning', 'success', 'info')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    project_id  TEXT NOT NULL,
+    task_id     TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    inode       INTEGER,
+    indexed     INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT,
+    updated     REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5(
+    message,
+    project_id UNINDEXED,
+    task_id UNINDEXED,
+    kind UNINDEXED,
+    severity UNINDEXED,
+    path UNINDEXED,
+    byte_offset UNINDEXED,
+    ts UNINDEXED,
+    tokenize = 'unicode61'
+);
+"""
+
+
+def project_log_files(project_id):
+    """
+    Log files belonging to a project's tasks.
+
+    Returns:
+        list: (task_id, kind, path) for files that exist
+    """
+    tasks = load_json(PROJECTS_DIR / project_id / 'tasks.json', []) or []
+    files = []
+    for task in tasks:
+        task_id = task.get('id')
+        if not task_id:
+            continue
+        raw = LOG_DIR / f'{task_id}.log'
+        records = logcap.sidecar_paths(raw)[0]
+        if records.exists():
+            files.append((task_id, 'agent', records))
+        elif raw.exists():
+            files.append((task_id, 'agent', raw))
+        qa_log = QA_DIR / f'{task_id}.log'
+        if qa_log.exists():
+            files.append((task_id, 'qa', qa_log))
+    return files
+
+
+def parse_line(path, line):
+    """
+    Returns:
+        tuple: (message, severity, ts) for one line of a log file
+    """
+    if path.suffix == '.jsonl':
+        try:
+            record = json.loads(line)
+            return record.get('msg', ''), record.get('level', 'info'), record.get('ts')
+        except ValueError:
+            pass
+    message = logcap.strip_ansi(line).strip()
+    return message, logcap.classify(message), None
+
+
+def fingerprint(f, end):
+    """Hash of the first and last FINGERPRINT_BYTES of an open file's first end bytes."""
+    digest = hashlib.sha1()
+    f.seek(0)
+    digest.update(f.read(min(end, FINGERPRINT_BYTES)))
+    if end > FINGERPRINT_BYTES:
+        start = max(FINGERPRINT_BYTES, end - FINGERPRINT_BYTES)
+        f.seek(start)
+        digest.update(f.read(end - start))
+    return digest.hexdigest()
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, a trailing *
+    makes a word a prefix match. Quoting keeps FTS operators in user input
+    from being interpreted.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+class LogIndex:
+    """Inverted index over project logs."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA busy_timeout=30000')
+        self.conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(files)')}
+        if 'fingerprint' not in columns:
+            # Indexes from before fingerprints: every file is re-indexed once
+            self.conn.execute('ALTER TABLE files ADD COLUMN fingerprint TEXT')
+
+    def close(self):
+        self.conn.close()
+
+    def _forget_file(self, path):
+        self.conn.execute('DELETE FROM lines WHERE path = ?', (str(path),))
+        self.conn.execute('DELETE FROM files WHERE path = ?', (str(path),))
+
+    def update_file(self, project_id, task_id, kind, path):
+        """
+        Index the complete lines appended to path since the last update.
+
+        Returns:
+            int: Lines added
+        """
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return 0
+        with f:
+            return self._update_file(project_id, task_id, kind, path, f)
+
+    def _update_file(self, project_id, task_id, kind, path, f):
+        stat = os.fstat(f.fileno())
+        row = self.conn.execute('SELECT inode, indexed, fingerprint FROM files WHERE path = ?',
+                                (str(path),)).fetchone()
+        start = 0
+        if (row and row['inode'] == stat.st_ino and row['indexed'] <= stat.st_size
+                and row['fingerprint'] == fingerprint(f, row['indexed'])):
+            start = row['indexed']
+        if row and start == row['indexed'] == stat.st_size:
+            return 0
+
+        added = 0
+        offset = start
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            if row and start == 0:
+                # Truncated, rewritten or replaced by a new run
+                self._forget_file(path)
+            f.seek(start)
+            leftover = b''
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                data = leftover + chunk
+                # Only complete lines; a partial last line waits for the next update
+                end = data.rfind(b'\n') + 1
+                rows = []
+                position = 0
+                for raw_line in data[:end].split(b'\n')[:-1]:
+                    message, severity, ts = parse_line(path, raw_line.decode(errors='replace'))
+                    if message:
+                        rows.append((message, project_id, task_id, kind, severity, str(path),
+                                     offset + position, ts))
+                    position += len(raw_line) + 1
+                self.conn.executemany(
+                    'INSERT INTO lines (message, project_id, task_id, kind, severity, path, byte_offset, ts) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                added += len(rows)
+                offset += end
+                leftover = data[end:]
+            self.conn.execute(
+                'INSERT INTO files (path, project_id, task_id, kind, inode, indexed, fingerprint, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET '
+                'inode = excluded.inode, indexed = excluded.indexed, '
+                'fingerprint = excluded.fingerprint, updated = excluded.updated',
+                (str(path), project_id, task_id, kind, stat.st_ino, offset, fingerprint(f, offset),
+                 time.time()))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def _enforce_limit(self, project_id, max_lines):
+        count = self.conn.execute('SELECT COUNT(*) FROM lines WHERE project_id = ?', (project_id,)).fetchone()[0]
+        if count <= max_lines:
+            return 0
+        excess = count - max_lines
+        # Oldest first: rowids grow in indexing order
+        self.conn.execute(
+            'DELETE FROM lines WHERE rowid IN (SELECT rowid FROM lines WHERE project_id = ? '
+            'ORDER BY rowid LIMIT ?)', (project_id, excess))
+        # Merge FTS segments so the freed space is actually reused
+        self.conn.execute("INSERT INTO lines (lines) VALUES ('optimize')")
+        return excess
+
+    def update(self, project_id, max_lines=MAX_LINES):
+        """
+        Bring a project's index up to date.
+
+        Returns:
+            int: Lines added
+        """
+        files = project_log_files(project_id)
+        current = {str(path) for _, _, path in files}
+        # Agent logs that switched from raw to structured capture, or were removed
+        for row in self.conn.execute('SELECT path FROM files WHERE project_id = ?', (project_id,)).fetchall():
+            if row['path'] not in current:
+                self.conn.execute('BEGIN IMMEDIATE')
+                self._forget_file(row['path'])
+                self.conn.execute('COMMIT')
+        added = sum(self.update_file(project_id, task_id, kind, path)
+                    for task_id, kind, path in files)
+        if added:
+            self._enforce_limit(project_id, max_lines)
+        return added
+
+    def rebuild(self, project_id):
+        """Drop a project's index and index its logs from scratch."""
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.conn.execute('DELETE FROM lines WHERE project_id = ?', (project_id,))
+        self.conn.execute('DELETE FROM files WHERE project_id = ?', (project_id,))
+        self.conn.execute('COMMIT')
+        return self.update(project_id)
+
+    def search(self, project_id, query, severity=None, task=None, kind=None, limit=100, order='time'):
+        """
+        Args:
+            query: Words that must all appear (trailing * for a prefix)
+            severity: error/warning/success/info, or None for any
+            task: Restrict to one task id
+            kind: 'agent' or 'qa'
+            order: 'time' (log order) or 'rank' (best match first)
+
+        Returns:
+            list: Hit dicts with task, kind, severity, offset, line, ts, path
+        """
+        match = fts_query(query or '')
+        if not match:
+            return []
+        sql = ('SELECT task_id, kind, severity, byte_offset, message, ts, path FROM lines '
+               'WHERE lines MATCH ? AND project_id = ?')
+        params = [match, project_id]
+        for column, value in (('severity', severity), ('task_id', task), ('kind', kind)):
+            if value:
+                sql += f' AND {column} = ?'
+                params.append(value)
+        sql += ' ORDER BY rank' if order == 'rank' else ' ORDER BY rowid'
+        sql += ' LIMIT ?'
+        params.append(limit)
+        return [
+            {'task': row['task_id'], 'kind': row['kind'], 'severity': row['severity'],
+             'offset': row['byte_offset'], 'line': row['message'], 'ts': row['ts'], 'path': row['path']}
+            for row in self.conn.execute(sql, params)
+        ]
+
+    def stats(self, project_id=None):
+        where, params = ('WHERE project_id = ?', (project_id,)) if project_id else ('', ())
+        lines = self.conn.execute(f'SELECT COUNT(*) FROM lines {where}', params).fetchone()[0]
+        files = self.conn.execute(f'SELECT COUNT(*) FROM files {where}', params).fetchone()[0]
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        return {'lines': lines, 'files': files, 'db_bytes': size}
+
+
+def search(project_id, query, **filters):
+    """Update the project's index, then search it."""
+    index = LogIndex()
+    try:
+        index.update(project_id)
+        return index.search(project_id, query, **filters)
+    finally:
+        index.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-log-index', description='Search agent and QA logs')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('search', help='Search a project\'s logs')
+    p.add_argument('project_id')
+    p.add_argument('query')
+    p.add_argument('--severity', choices=SEVERITIES)
+    p.add_argument('--task')
+    p.add_argument('--kind', choices=('agent', 'qa'))
+    p.add_argument('--limit', type=int, default=50)
+    p.add_argument('--rank', action='store_true', help='Best matches first instead of log order')
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('update', help='Index newly appended log lines')
+    p.add_argument('project_id')
+
+    p = sub.add_parser('rebuild', help='Re-index a project from scratch')
+    p.add_argument('project_id')
+
+    p = sub.add_parser('stats', help='Show index size')
+    p.add_argument('project_id', nargs='?')
+
+    args = parser.parse_args(argv)
+    index = LogIndex()
+    try:
+        if args.command == 'search':
+            index.update(args.project_id)
+            hits = index.search(args.project_id, args.query, severity=args.severity, task=args.task,
+                                kind=args.kind, limit=args.limit, order='rank' if args.rank else 'time')
+            for hit in hits:
+                if args.json:
+                    print(json.dumps(hit))
+                else:
+                    print(f"{hit['task']} [{hit['kind']}] @{hit['offset']} {hit['severity']:<7} {hit['line']}")
+            return 0 if hits else 1
+        if args.command == 'update':
+            print(f'Indexed {index.update(args.project_id)} new lines')
+        elif args.command == 'rebuild':
+            print(f'Indexed {index.rebuild(args.project_id)} lines')
+        elif args.command == 'stats':
+            print(json.dumps(index.stats(args.project_id), indent=2))
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
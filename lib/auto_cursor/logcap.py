@@ -0,0 +1,351 @@
+"""
+Structured agent output capture
+
+bin/orchestrate-agent-wrapper used to run `cursor-agent ... 2>&1 | tee LOG`,
+leaving raw ANSI text with no timestamps: the web server had to strip escape
+codes, classify lines with substring checks and guess timing from the file
+mtime. auto-cursor-logcap runs the agent instead of tee and writes, next to
+the unchanged raw log (<id>.log):
+
+    <id>.jsonl   one record per line:
+                 {"ts": 1718000000.12, "seq": 41, "stream": "stdout",
+                  "level": "info", "msg": "ANSI-stripped text"}
+    <id>.idx     sparse index, "<ts> <seq> <byte offset into .jsonl>" every
+                 INDEX_EVERY records or INDEX_SECONDS seconds
+
+so "records between 14:00 and 14:05" or "the last 200 records" seek straight
+to the right place instead of scanning the whole log. Raw output is also
+copied to stdout so a tmux pane still shows it live.
+"""
+
+import argparse
+import bisect
+import json
+import os
+import re
+import selectors
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .common import write_text_atomic
+from .heartbeat import AgentBeat, exit_path
+
+INDEX_EVERY = 100
+INDEX_SECONDS = 30.0
+# A partial line with no newline for this long is emitted as its own record
+PARTIAL_FLUSH_SECONDS = 1.0
+READ_SIZE = 65536
+
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+# Same vocabulary as the web UI's log types, checked in this order
+LEVEL_PATTERNS = (
+    ('error', re.compile(r'\b(error|errors|failed|failure|exception|traceback|fatal)\b', re.I)),
+    ('success', re.compile(r'\b(success|successful|successfully|completed|done|passed)\b', re.I)),
+    ('warning', re.compile(r'\b(warn|warning|warnings|deprecated)\b', re.I)),
+)
+
+
+def strip_ansi(text):
+    return ANSI_ESCAPE.sub('', text)
+
+
+def classify(message):
+    for level, pattern in LEVEL_PATTERNS:
+        if pattern.search(message):
+            return level
+    return 'info'
+
+
+def sidecar_paths(log_path):
+    """
+    Returns:
+        tuple: (records path, index path) for a raw log path
+    """
+    log_path = Path(log_path)
+    stem = log_path.with_suffix('') if log_path.suffix == '.log' else log_path
+    return stem.with_name(stem.name + '.jsonl'), stem.with_name(stem.name + '.idx')
+
+
+def has_sidecar(log_path):
+    return sidecar_paths(log_path)[0].exists()
+
+
+class CaptureWriter:
+    """
+    Writes records and the sparse index for one capture.
+
+    Args:
+        log_path: The raw log; the sidecar files are derived from it
+    """
+
+    def __init__(self, log_path):
+        records_path, index_path = sidecar_paths(log_path)
+        self.records = open(records_path, 'wb')
+        self.index = open(index_path, 'w')
+        self.seq = 0
+        self.offset = 0
+        self.indexed_seq = None
+        self.indexed_at = 0.0
+
+    def write(self, stream, text, ts=None):
+        ts = ts or time.time()
+        # Keep what a terminal would show for carriage-return progress lines
+        message = strip_ansi(text.rstrip('\r').split('\r')[-1]).rstrip()
+        if not message:
+            return
+        if self.indexed_seq is None or self.seq - self.indexed_seq >= INDEX_EVERY \
+                or ts - self.indexed_at >= INDEX_SECONDS:
+            self.index.write(f'{ts:.3f} {self.seq} {self.offset}\n')
+            self.indexed_seq, self.indexed_at = self.seq, ts
+        line = json.dumps({'ts': round(ts, 3), 'seq': self.seq, 'stream': stream,
+                           'level': classify(message), 'msg': message}) + '\n'
+        data = line.encode()
+        self.records.write(data)
+        self.offset += len(data)
+        self.seq += 1
+
+    def flush(self):
+        self.records.flush()
+        self.index.flush()
+
+    def close(self):
+        self.records.close()
+        self.index.close()
+
+
+def capture(command, log_path, echo=True, heartbeat=None, pause_files=()):
+    """
+    Run command, teeing its raw output to log_path (and stdout) and writing
+    the structured sidecar.
+
+    Args:
+        heartbeat: Heartbeat file to keep fresh while the command runs
+            (heartbeat.AgentBeat); the exit code is written next to it
+        pause_files: Files that mark the agent paused in its heartbeat
+
+    Returns:
+        int: The command's exit code
+    """
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    proc = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # The scheduler and `orchestrate-agents stop` signal the wrapper's group;
+    # pass anything aimed at us alone on to the agent
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, lambda signum, _: proc.send_signal(signum))
+
+    beat = AgentBeat(heartbeat, proc.pid, pause_files) if heartbeat else None
+    written = 0
+
+    out = sys.stdout.buffer if echo else None
+    writer = CaptureWriter(log_path)
+    selector = selectors.DefaultSelector()
+    pending = {}                # stream name -> (partial bytes, when it started)
+    for pipe, name in ((proc.stdout, 'stdout'), (proc.stderr, 'stderr')):
+        os.set_blocking(pipe.fileno(), False)
+        selector.register(pipe, selectors.EVENT_READ, name)
+
+    with open(log_path, 'wb') as raw:
+        while selector.get_map():
+            if beat:
+                beat.tick(written)
+            for key, _ in selector.select(PARTIAL_FLUSH_SECONDS):
+                name = key.data
+                try:
+                    chunk = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    partial, _ = pending.pop(name, (b'', 0))
+                    if partial:
+                        writer.write(name, partial.decode(errors='replace'))
+                    continue
+                raw.write(chunk)
+                written += len(chunk)
+                if out:
+                    try:
+                        out.write(chunk)
+                    except OSError:
+                        out = None
+                now = time.time()
+                previous, since = pending.get(name, (b'', now))
+                *lines, partial = (previous + chunk).split(b'\n')
+                for line in lines:
+                    writer.write(name, line.decode(errors='replace'), now)
+                # Age of the partial line is measured from when it began
+                pending[name] = (partial, since if previous and not lines else now)
+            now = time.time()
+            for name, (partial, since) in list(pending.items()):
+                if partial and now - since >= PARTIAL_FLUSH_SECONDS:
+                    writer.write(name, partial.decode(errors='replace'), now)
+                    pending[name] = (b'', now)
+            raw.flush()
+            if out:
+                try:
+                    out.flush()
+                except OSError:
+                    out = None
+            writer.flush()
+    writer.close()
+    exit_code = proc.wait()
+    if heartbeat:
+        try:
+            write_text_atomic(exit_path(heartbeat), f'{exit_code}\n')
+        except OSError:
+            pass
+    return exit_code
+
+
+# Readers
+
+
+def read_index(log_path):
+    """
+    Returns:
+        list: (ts, seq, offset) tuples in file order
+    """
+    entries = []
+    try:
+        with open(sidecar_paths(log_path)[1]) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 3:
+                    entries.append((float(fields[0]), int(fields[1]), int(fields[2])))
+    except (OSError, ValueError):
+        pass
+    return entries
+
+
+def _parse(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        # A record still being written
+        return None
+
+
+def read_from(log_path, offset=0, limit=None):
+    """
+    Records starting at a byte offset into the sidecar.
+
+    Returns:
+        tuple: (records, offset just past the last complete record read)
+    """
+    records = []
+    try:
+        with open(sidecar_paths(log_path)[0], 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                record = _parse(line)
+                offset += len(line)
+                if record:
+                    records.append(record)
+                    if limit and len(records) >= limit:
+                        break
+    except OSError:
+        pass
+    return records, offset
+
+
+def records_between(log_path, start=None, end=None, limit=None):
+    """
+    Records with start <= ts <= end (either bound may be None), reading from
+    the last index entry at or before start.
+    """
+    offset = 0
+    if start is not None:
+        index = read_index(log_path)
+        position = bisect.bisect_right([ts for ts, _, _ in index], start) - 1
+        if position >= 0:
+            offset = index[position][2]
+    matched = []
+    try:
+        with open(sidecar_paths(log_path)[0], 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                record = _parse(line)
+                if not record:
+                    continue
+                if end is not None and record['ts'] > end:
+                    break
+                if start is None or record['ts'] >= start:
+                    matched.append(record)
+                    if limit and len(matched) >= limit:
+                        break
+    except OSError:
+        pass
+    return matched
+
+
+def tail(log_path, count=200):
+    """
+    The last count records, reading from the index entry that precedes them.
+
+    Returns:
+        tuple: (records, sidecar size in bytes, to continue streaming from)
+    """
+    index = read_index(log_path)
+    offset = 0
+    if index:
+        # At most INDEX_EVERY records follow the last index entry, so starting
+        # at or before its seq - count always covers the last count records
+        seqs = [seq for _, seq, _ in index]
+        position = bisect.bisect_right(seqs, index[-1][1] - count) - 1
+        if position >= 0:
+            offset = index[position][2]
+    records, end = read_from(log_path, offset)
+    return (records[-count:] if count > 0 else []), end
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-logcap', description='Structured agent output capture')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='Run a command, capturing its output')
+    p.add_argument('--log', required=True, help='Raw log file; sidecars are written next to it')
+    p.add_argument('--quiet', action='store_true', help="Don't copy output to stdout")
+    p.add_argument('--heartbeat', help='Heartbeat file to keep fresh while the command runs')
+    p.add_argument('--pause-file', action='append', default=[], help='Beat "paused" while this file exists')
+    p.add_argument('cmd', nargs=argparse.REMAINDER)
+
+    p = sub.add_parser('show', help='Print captured records')
+    p.add_argument('log')
+    p.add_argument('--since', type=float, help='Epoch seconds')
+    p.add_argument('--until', type=float, help='Epoch seconds')
+    p.add_argument('--tail', type=int, help='Only the last N records')
+    p.add_argument('--json', action='store_true', help='Print records as JSON lines')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        command = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        if not command:
+            parser.error('run needs a command after --')
+        return capture(command, args.log, echo=not args.quiet, heartbeat=args.heartbeat,
+                       pause_files=args.pause_file)
+
+    if args.tail:
+        records = tail(args.log, args.tail)[0]
+        records = [r for r in records if (args.since is None or r['ts'] >= args.since)
+                   and (args.until is None or r['ts'] <= args.until)]
+    else:
+        records = records_between(args.log, args.since, args.until)
+    for record in records:
+        if args.json:
+            print(json.dumps(record))
+        else:
+            stamp = time.strftime('%H:%M:%S', time.localtime(record['ts']))
+            print(f"{stamp} [{record['stream']}] {record['level']:<7} {record['msg']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Event-driven project memory updates
+
+`auto-cursor status` used to call save_plan_to_memory() on every run: it
+re-read tasks.json, plan.json and config.json through about eight jq/grep
+pipelines, rewrote memory.json and incremented total_successful_builds each
+time, so the counter measured how often someone looked at the board.
+
+Memory is now updated when a task completes (the scheduler and
+orchestrate-agents call record_completion() after writing completed or
+qa_passed to tasks.json) and status is read-only. memory.json keeps a watermark:
+
+- completed: the latest task completion time already folded in; only tasks
+  completed after it contribute successful_patterns
+- build: the plan run (earliest task creation time) already counted in
+  total_successful_builds, so a run is counted once, when at least 80% of
+  its tasks have succeeded
+
+As before, nothing is learned from a run until it reaches 80%; the watermark
+doesn't move until then, so those completions are folded in once it does.
+Updates hold a per-project flock, so concurrent events can't double-count.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import re
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import task_index
+from .common import PROJECTS_DIR, load_json, write_json_atomic
+
+SUCCESS_STATUSES = ('completed', 'qa_passed')
+SUCCESS_RATE = 80
+PATTERN_WORDS = re.compile(r'(create|add|implement|build|setup|configure)', re.IGNORECASE)
+STACK_DIRS = re.compile(r'(api|backend|frontend|ui|component)')
+MAX_PATTERNS = 10
+
+
+@contextmanager
+def _project_lock(project_dir):
+    with open(project_dir / '.memory.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _timestamp(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def build_id(tasks):
+    """
+    The plan run the tasks belong to: their earliest creation time, or a
+    hash of their ids for plans without timestamps.
+    """
+    created = [_timestamp(t.get('created')) for t in tasks]
+    created = [c for c in created if c is not None]
+    if created:
+        return min(created)
+    return hashlib.sha256('\0'.join(str(t.get('id')) for t in tasks).encode()).hexdigest()[:16]
+
+
+def detect_project_type(project_path):
+    if not project_path or not project_path.is_dir():
+        return ''
+    if (project_path / 'package.json').is_file():
+        return 'nodejs'
+    if (project_path / 'requirements.txt').is_file() or (project_path / 'pyproject.toml').is_file():
+        return 'python'
+    if (project_path / 'src').is_dir() and (project_path / 'Cargo.toml').is_file():
+        return 'rust'
+    if (project_path / 'backend').is_dir() and (project_path / 'frontend').is_dir():
+        return 'fullstack'
+    return ''
+
+
+def detect_tech_stack(plan):
+    directories = sorted({t.get('directory') for t in plan if isinstance(t, dict) and t.get('directory')})
+    return [d for d in directories if STACK_DIRS.search(d)][:3]
+
+
+def update(project_id):
+    """
+    Fold tasks completed since the watermark into the project's memory.json.
+
+    Returns:
+        dict: folded (number of newly folded tasks), build_counted,
+            success_rate; None if the project has no tasks
+    """
+    project_dir = PROJECTS_DIR / project_id
+    tasks = load_json(project_dir / 'tasks.json')
+    if not isinstance(tasks, list) or not tasks:
+        return None
+    tasks = [t for t in tasks if isinstance(t, dict)]
+    successful = [t for t in tasks if t.get('status') in SUCCESS_STATUSES]
+    rate = len(successful) * 100 // len(tasks) if tasks else 0
+    result = {'folded': 0, 'build_counted': False, 'success_rate': rate}
+    if not successful or rate < SUCCESS_RATE:
+        return result
+
+    with _project_lock(project_dir):
+        memory = load_json(project_dir / 'memory.json', {})
+        if not isinstance(memory, dict):
+            memory = {}
+        watermark = memory.get('watermark') or {}
+        since = _timestamp(watermark.get('completed')) or 0
+
+        newly_completed = [t for t in successful if (_timestamp(t.get('completed')) or 0) > since]
+        if newly_completed:
+            patterns = [t['description'] for t in newly_completed
+                        if isinstance(t.get('description'), str) and PATTERN_WORDS.search(t['description'])]
+            memory['successful_patterns'] = sorted(set(memory.get('successful_patterns') or []) |
+                                                   set(patterns))[:MAX_PATTERNS]
+            watermark['completed'] = max(_timestamp(t.get('completed')) for t in newly_completed)
+            result['folded'] = len(newly_completed)
+
+        build = build_id(tasks)
+        if watermark.get('build') != build:
+            config = load_json(project_dir / 'config.json', {}) or {}
+            plan = load_json(project_dir / 'plan.json', []) or []
+            memory['tech_stack'] = sorted(set(memory.get('tech_stack') or []) |
+                                          set(detect_tech_stack(plan if isinstance(plan, list) else [])))
+            if not memory.get('project_type'):
+                path = config.get('path')
+                memory['project_type'] = detect_project_type(Path(path) if path else None)
+            memory['last_successful_build'] = time.time()
+            memory['total_successful_builds'] = memory.get('total_successful_builds', 0) + 1
+            watermark['build'] = build
+            result['build_counted'] = True
+
+        if result['folded'] or result['build_counted']:
+            memory['watermark'] = watermark
+            write_json_atomic(project_dir / 'memory.json', memory)
+    return result
+
+
+def record_completion(project_id):
+    """
+    Task completion event: update memory.json and the project's entries in
+    the cross-project task index.
+    """
+    result = update(project_id)
+    task_index.update([project_id])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-memory', description='Project memory updates')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('update', help='Fold newly completed tasks into memory.json and the task index')
+    p.add_argument('project_id')
+    p.add_argument('--json', action='store_true')
+
+    args = parser.parse_args(argv)
+
+    if not (PROJECTS_DIR / args.project_id).is_dir():
+        print(f'Error: Project not found: {args.project_id}', file=sys.stderr)
+        return 1
+    result = record_completion(args.project_id)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif result is None:
+        print('No tasks')
+    else:
+        print(f"Folded {result['folded']} task(s)" + (', counted a successful build' if result['build_counted'] else '')
+              + f" ({result['success_rate']}% of tasks succeeded)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Merge planner for auto-cursor-merge
+
+`auto-cursor merge <project> all` used to merge completed task branches one
+at a time in tasks.json order, stopping at every conflict to run AI
+resolution before trying the next branch. The planner predicts the outcome
+first, without touching the working tree or index:
+
+1. Every pending auto-cursor/<task> branch is dry-run merged against the
+   target (HEAD of the project checkout) with `git merge-tree
+   --write-tree`, in parallel (AUTO_CURSOR_MERGE_JOBS, default 8).
+2. Branches that change a common file are dry-run merged against each
+   other too; branches with disjoint changes can't conflict textually and
+   are not compared.
+3. Branches are ordered by task dependencies (plan order breaking ties) and
+   grouped into steps. A step is either a batch of branches that merge
+   cleanly into the target and with each other, merged together as one
+   octopus merge, or a single branch predicted to conflict (with the
+   target or with a branch merged before it), merged on its own so
+   conflict resolution only runs where it is needed.
+
+The predicted conflicting files are reported up front.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import PROJECTS_DIR, WORKTREES_DIR, load_json
+
+DEFAULT_JOBS = int(os.environ.get('AUTO_CURSOR_MERGE_JOBS', '8'))
+BRANCH_PREFIX = 'auto-cursor/'
+MERGEABLE_STATUSES = ('completed', 'qa_passed')
+
+RED = '\033[0;31m'
+GREEN = '\033[0;32m'
+YELLOW = '\033[1;33m'
+CYAN = '\033[0;36m'
+NC = '\033[0m'
+
+
+class PlanError(Exception):
+    """Raised when a merge plan cannot be made."""
+
+
+def _git(repo, *args):
+    return subprocess.run(['git', '-C', str(repo)] + list(args), stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def changed_files(repo, target, branch):
+    """Files the branch changed since it forked from target."""
+    result = _git(repo, 'diff', '--name-only', '-z', f'{target}...{branch}')
+    if result.returncode != 0:
+        return set()
+    return {os.fsdecode(p) for p in result.stdout.split(b'\0') if p}
+
+
+def dry_run_merge(repo, ours, theirs):
+    """
+    Merge theirs into ours in memory only.
+
+    Returns:
+        list: Conflicting paths (empty for a clean merge), or None if git
+            could not merge the two at all (e.g. no common history)
+    """
+    result = _git(repo, 'merge-tree', '--write-tree', '--name-only', '--no-messages', '-z', ours, theirs)
+    if result.returncode not in (0, 1):
+        return None
+    fields = [os.fsdecode(f) for f in result.stdout.split(b'\0') if f]
+    # First field is the resulting tree; the rest are conflicted paths
+    return sorted(set(fields[1:])) if result.returncode == 1 else []
+
+
+def pending_tasks(project_id, task_ids=None):
+    """
+    Completed tasks whose branch exists, still has a worktree and isn't
+    merged into HEAD yet, in plan order.
+
+    Returns:
+        tuple: (project path, tasks, skipped {task id: reason})
+    """
+    project_dir = PROJECTS_DIR / project_id
+    config = load_json(project_dir / 'config.json') or {}
+    repo = config.get('path')
+    if not repo or _git(repo, 'rev-parse', '--verify', '--quiet', 'HEAD').returncode != 0:
+        raise PlanError(f'{project_id} has no git repository with commits')
+    tasks = [t for t in load_json(project_dir / 'tasks.json', []) or [] if isinstance(t, dict) and t.get('id')]
+    if task_ids:
+        wanted = set(task_ids)
+        tasks = [t for t in tasks if t['id'] in wanted]
+    else:
+        tasks = [t for t in tasks if t.get('status') in MERGEABLE_STATUSES]
+
+    pending = []
+    skipped = {}
+    for task in tasks:
+        branch = BRANCH_PREFIX + task['id']
+        if not (WORKTREES_DIR / f"auto-cursor-{project_id}-{task['id']}").is_dir():
+            skipped[task['id']] = 'no worktree'
+        elif _git(repo, 'rev-parse', '--verify', '--quiet', f'refs/heads/{branch}').returncode != 0:
+            skipped[task['id']] = 'no branch'
+        elif _git(repo, 'merge-base', '--is-ancestor', branch, 'HEAD').returncode == 0:
+            skipped[task['id']] = 'already merged'
+        else:
+            pending.append(task)
+    return repo, pending, skipped
+
+
+def topological_order(tasks):
+    """
+    Dependencies before dependents, plan order otherwise. Dependencies on
+    tasks outside the list are ignored; a cycle falls back to plan order.
+    """
+    ids = [t['id'] for t in tasks]
+    present = set(ids)
+    position = {task_id: i for i, task_id in enumerate(ids)}
+    indegree = {task_id: 0 for task_id in ids}
+    dependents = {task_id: [] for task_id in ids}
+    for task in tasks:
+        for dep in set(task.get('dependencies') or []):
+            if dep in present and dep != task['id']:
+                indegree[task['id']] += 1
+                dependents[dep].append(task['id'])
+    ready = sorted((t for t in ids if indegree[t] == 0), key=position.get)
+    order = []
+    while ready:
+        task_id = ready.pop(0)
+        order.append(task_id)
+        for dependent in dependents[task_id]:
+            indegree[dependent] -= 1
+            if indegree[dependent] == 0:
+                ready.append(dependent)
+        ready.sort(key=position.get)
+    ordered = set(order)
+    return order + [t for t in ids if t not in ordered]
+
+
+def plan(project_id, task_ids=None, jobs=DEFAULT_JOBS):
+    """
+    Returns:
+        dict: target, steps, predicted conflicts, skipped tasks and timing
+    """
+    started = time.monotonic()
+    repo, tasks, skipped = pending_tasks(project_id, task_ids)
+    target = _git(repo, 'rev-parse', 'HEAD').stdout.decode().strip()
+    target_name = _git(repo, 'rev-parse', '--abbrev-ref', 'HEAD').stdout.decode().strip()
+    by_id = {t['id']: t for t in tasks}
+    branch = {task_id: BRANCH_PREFIX + task_id for task_id in by_id}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        ids = list(by_id)
+        files = dict(zip(ids, executor.map(lambda t: changed_files(repo, target, branch[t]), ids)))
+        against_target = dict(zip(ids, executor.map(lambda t: dry_run_merge(repo, target, branch[t]), ids)))
+        # Only branches touching a common file can conflict with each other
+        pairs = [(a, b) for i, a in enumerate(ids) for b in ids[i + 1:] if files[a] & files[b]]
+        pair_results = dict(zip(pairs, executor.map(lambda p: dry_run_merge(repo, branch[p[0]], branch[p[1]]),
+                                                    pairs)))
+    dry_runs = len(ids) + len(pairs)
+
+    conflicts_with = {task_id: {} for task_id in ids}
+    for (a, b), result in pair_results.items():
+        if result:
+            conflicts_with[a][b] = result
+            conflicts_with[b][a] = result
+
+    steps = []
+    placed = set()
+    remaining = topological_order(tasks)
+    dependencies = {t: {d for d in by_id[t].get('dependencies') or [] if d in by_id and d != t} for t in by_id}
+    predicted = {}
+    while remaining:
+        batch = []
+        for task_id in remaining:
+            if not dependencies[task_id] <= placed | set(batch):
+                continue
+            if against_target[task_id] != [] or any(other in conflicts_with[task_id]
+                                                     for other in placed | set(batch)):
+                continue
+            batch.append(task_id)
+        if batch:
+            steps.append({'kind': 'batch', 'tasks': batch})
+        else:
+            # Everything ready is predicted to conflict: merge the first one alone
+            task_id = next((t for t in remaining if dependencies[t] <= placed), remaining[0])
+            files_hit = {}
+            for path in against_target[task_id] or []:
+                files_hit.setdefault(path, []).append(target_name)
+            for other in placed:
+                for path in conflicts_with[task_id].get(other, []):
+                    files_hit.setdefault(path, []).append(other)
+            predicted[task_id] = files_hit
+            steps.append({'kind': 'conflict', 'tasks': [task_id], 'files': files_hit,
+                          'unmergeable': against_target[task_id] is None})
+            batch = [task_id]
+        placed.update(batch)
+        remaining = [t for t in remaining if t not in placed]
+
+    return {
+        'project_id': project_id,
+        'target': target_name,
+        'target_commit': target,
+        'steps': steps,
+        'predicted_conflicts': predicted,
+        'conflicting_files': sorted({path for files_hit in predicted.values() for path in files_hit}),
+        'skipped': skipped,
+        'dry_runs': dry_runs,
+        'seconds': round(time.monotonic() - started, 3),
+    }
+
+
+def print_plan(report, out=sys.stdout):
+    total = sum(len(step['tasks']) for step in report['steps'])
+    print(f"{CYAN}Merge plan for {report['project_id']} into {report['target']}: "
+          f"{total} branches, {len(report['steps'])} steps "
+          f"({report['dry_runs']} dry runs in {report['seconds']:.2f}s){NC}", file=out)
+    for number, step in enumerate(report['steps'], 1):
+        if step['kind'] == 'batch':
+            print(f"  {GREEN}{number}. clean{NC}    {' '.join(step['tasks'])}", file=out)
+        else:
+            detail = ', '.join(f"{path} (with {', '.join(sources)})" for path, sources in step['files'].items())
+            if step.get('unmergeable'):
+                detail = 'git cannot merge this branch (no common history)'
+            print(f"  {YELLOW}{number}. conflict{NC} {step['tasks'][0]}: {detail}", file=out)
+    if report['conflicting_files']:
+        print(f"{YELLOW}Predicted conflicting files: {', '.join(report['conflicting_files'])}{NC}", file=out)
+    for task_id, reason in report['skipped'].items():
+        print(f'  skipped {task_id}: {reason}', file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-merge-plan',
+                                     description='Predict conflicts and plan merges of task branches')
+    parser.add_argument('project_id')
+    parser.add_argument('task_ids', nargs='*', help='Only these tasks (default: all completed tasks)')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--steps', action='store_true',
+                        help='Print "<batch|conflict|copy>\\t<task ids>" per step (the plan goes to stderr), '
+                             'for auto-cursor-merge')
+    args = parser.parse_args(argv)
+
+    try:
+        report = plan(args.project_id, args.task_ids, args.jobs)
+    except PlanError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif args.steps:
+        print_plan(report, sys.stderr)
+        for step in report['steps']:
+            print(f"{step['kind']}\t{' '.join(step['tasks'])}")
+        # Worktrees without a branch keep auto-cursor-merge's copy fallback
+        for task_id, reason in report['skipped'].items():
+            if reason == 'no branch':
+                print(f'copy\t{task_id}')
+    else:
+        print_plan(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
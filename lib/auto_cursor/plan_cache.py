@@ -0,0 +1,245 @@
+"""
+Plan cache keyed by goal, repository fingerprint and memory digest
+
+Every `auto-cursor plan` (and every `run`, which plans first) made a full
+`cursor-agent --print --output-format json` round trip, even when the same
+goal was re-planned on an unchanged repository. auto-cursor-planner now
+looks plans up here first. The key combines:
+
+- the goal with whitespace normalized, and the complexity override
+- the project fingerprint: HEAD plus the git tree hash of the worktree as it
+  is on disk (untracked files included), or file paths and sizes outside git
+- a digest of the memory.json fields injected into the prompt
+  (successful_patterns, anti_patterns, optimizations, project_type,
+  tech_stack), so other memory updates don't invalidate plans
+- a hash of the planner script, so prompt changes do
+
+The similar past tasks the planner adds to its prompt (task_index.py) are
+not part of the key: the index changes whenever a task finishes in any
+project, so an unchanged repository would never hit.
+
+Only plans the agent actually produced are stored, never the single-task
+fallback. Entries live in AUTO_CURSOR_DIR/plan-cache as <key>.json and are
+evicted by age (AUTO_CURSOR_PLAN_CACHE_MAX_AGE_DAYS, default 30) and total
+size (AUTO_CURSOR_PLAN_CACHE_MAX_MB, default 20), least recently used first.
+AUTO_CURSOR_PLAN_CACHE=off or `auto-cursor plan --no-cache` bypass it.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from .common import AUTO_CURSOR_DIR, load_json, write_json_atomic
+from .qa_cache import SKIP_DIRS, git_tree_hash
+
+CACHE_DIR = AUTO_CURSOR_DIR / 'plan-cache'
+STATS_FILE = CACHE_DIR / 'stats.json'
+MAX_AGE_DAYS = float(os.environ.get('AUTO_CURSOR_PLAN_CACHE_MAX_AGE_DAYS', '30'))
+MAX_SIZE_MB = float(os.environ.get('AUTO_CURSOR_PLAN_CACHE_MAX_MB', '20'))
+
+# memory.json fields auto-cursor-planner puts into the prompt
+MEMORY_FIELDS = ('successful_patterns', 'anti_patterns', 'optimizations', 'project_type', 'tech_stack')
+
+
+def cache_enabled():
+    return os.environ.get('AUTO_CURSOR_PLAN_CACHE', '').lower() not in ('off', '0', 'false', 'no')
+
+
+def normalize_goal(goal):
+    return ' '.join(goal.split())
+
+
+def project_fingerprint(project_path):
+    """HEAD and worktree tree hash, or a path/size listing outside git."""
+    head = subprocess.run(['git', '-C', str(project_path), 'rev-parse', '--verify', '--quiet', 'HEAD'],
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    tree = git_tree_hash(project_path)
+    if tree:
+        return f"git:{head.stdout.strip() or 'unborn'}:{tree}"
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(project_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            digest.update(f'{os.path.relpath(path, project_path)}\0{size}\0'.encode())
+    return 'files:' + digest.hexdigest()
+
+
+def memory_digest(memory_file):
+    memory = load_json(memory_file) if memory_file else None
+    if not isinstance(memory, dict):
+        return 'none'
+    injected = {field: memory.get(field) for field in MEMORY_FIELDS if memory.get(field)}
+    return hashlib.sha256(json.dumps(injected, sort_keys=True).encode()).hexdigest()
+
+
+def file_hash(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (OSError, TypeError):
+        return 'missing'
+
+
+def cache_key(goal, project_path, complexity='', memory_file=None, planner=None):
+    parts = [normalize_goal(goal), complexity or '', project_fingerprint(project_path),
+             memory_digest(memory_file), file_hash(planner)]
+    return hashlib.sha256('\0'.join(parts).encode()).hexdigest()[:40]
+
+
+def _count(outcome):
+    stats = load_json(STATS_FILE) or {}
+    stats[outcome] = stats.get(outcome, 0) + 1
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(STATS_FILE, stats)
+
+
+def lookup(key):
+    """
+    Returns:
+        list: The cached plan, or None (the hit or miss is counted)
+    """
+    path = CACHE_DIR / f'{key}.json'
+    entry = load_json(path)
+    if not entry or time.time() - entry.get('created', 0) > MAX_AGE_DAYS * 86400:
+        _count('misses')
+        return None
+    _count('hits')
+    # Touch so size-based eviction drops the least recently used entries
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry['plan']
+
+
+def store(key, plan, goal='', project_path=''):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(CACHE_DIR / f'{key}.json', {
+        'plan': plan,
+        'goal': goal,
+        'project_path': project_path,
+        'created': time.time(),
+    })
+    prune()
+
+
+def _entries():
+    for path in CACHE_DIR.glob('*.json'):
+        if path != STATS_FILE:
+            yield path
+
+
+def prune(max_age_days=MAX_AGE_DAYS, max_size_mb=MAX_SIZE_MB):
+    """
+    Drop entries older than max_age_days, then least recently used entries
+    until the cache fits in max_size_mb.
+
+    Returns:
+        int: Number of entries removed
+    """
+    if not CACHE_DIR.exists():
+        return 0
+    now = time.time()
+    entries = []
+    for path in _entries():
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries, key=lambda e: e[0]):
+        if now - mtime <= max_age_days * 86400 and total <= max_size_mb * 1024 * 1024:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def stats():
+    counts = load_json(STATS_FILE) or {}
+    sizes = [p.stat().st_size for p in _entries()] if CACHE_DIR.exists() else []
+    hits, misses = counts.get('hits', 0), counts.get('misses', 0)
+    return {
+        'entries': len(sizes),
+        'bytes': sum(sizes),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-plan-cache', description='Plan generation cache')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('key', help='Print the cache key for a planning request')
+    p.add_argument('goal')
+    p.add_argument('project_path')
+    p.add_argument('--complexity', default='')
+    p.add_argument('--memory', help="The project's memory.json")
+    p.add_argument('--planner', help='The planner script (its hash is part of the key)')
+
+    p = sub.add_parser('lookup', help='Print the cached plan, or exit 1 on a miss')
+    p.add_argument('key')
+
+    p = sub.add_parser('store', help='Cache a plan read from a file ("-" for stdin)')
+    p.add_argument('key')
+    p.add_argument('plan')
+    p.add_argument('--goal', default='')
+    p.add_argument('--project-path', default='')
+
+    sub.add_parser('stats', help='Show entries, hits and misses')
+
+    p = sub.add_parser('prune', help='Evict old entries')
+    p.add_argument('--max-age-days', type=float, default=MAX_AGE_DAYS)
+    p.add_argument('--max-mb', type=float, default=MAX_SIZE_MB)
+
+    sub.add_parser('clear', help='Remove every cached plan')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'key':
+        print(cache_key(args.goal, args.project_path, args.complexity, args.memory, args.planner))
+    elif args.command == 'lookup':
+        plan = lookup(args.key)
+        if plan is None:
+            return 1
+        print(json.dumps(plan, indent=2))
+    elif args.command == 'store':
+        try:
+            plan = json.load(sys.stdin) if args.plan == '-' else load_json(args.plan)
+        except ValueError:
+            plan = None
+        if not isinstance(plan, list) or not plan:
+            print('Error: plan must be a non-empty JSON array', file=sys.stderr)
+            return 1
+        store(args.key, plan, args.goal, args.project_path)
+    elif args.command == 'stats':
+        print(json.dumps(stats(), indent=2))
+    elif args.command == 'prune':
+        print(f'Removed {prune(args.max_age_days, args.max_mb)} entries')
+    elif args.command == 'clear':
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print('Plan cache cleared')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
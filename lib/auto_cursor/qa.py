@@ -0,0 +1,78 @@
+"""
+QA job pool for the scheduler
+
+QA runs as its own bounded pool, separate from the agent max_parallel cap:
+a finished agent's QA job is queued, started when a QA slot is free, and
+its exit is observed by the scheduler's ProcessWatcher like any agent, so
+a long test suite never blocks completion handling or slot refills.
+
+The limit comes from coordination.qa_parallel (AUTO_CURSOR_QA_PARALLEL
+overrides it), default 2.
+"""
+
+import os
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_QA_PARALLEL = 2
+
+
+def qa_parallel_limit(coordination=None):
+    value = os.environ.get('AUTO_CURSOR_QA_PARALLEL') or (coordination or {}).get('qa_parallel')
+    try:
+        return max(1, int(value)) if value not in (None, '') else DEFAULT_QA_PARALLEL
+    except (TypeError, ValueError):
+        return DEFAULT_QA_PARALLEL
+
+
+class QAPool:
+    """
+    Queue and bookkeeping for QA jobs; the scheduler starts the processes.
+
+    Args:
+        limit: Maximum concurrent QA jobs
+    """
+
+    def __init__(self, limit=DEFAULT_QA_PARALLEL):
+        self.limit = limit
+        self.queue = deque()
+        self.queued_at = {}
+        self.running = OrderedDict()    # task id -> (pid, started)
+
+    def __len__(self):
+        return len(self.queue) + len(self.running)
+
+    def submit(self, task_id):
+        """Queue a QA job (no-op if it is already queued or running)."""
+        if task_id in self.queued_at or task_id in self.running:
+            return False
+        self.queue.append(task_id)
+        self.queued_at[task_id] = time.time()
+        return True
+
+    def next_jobs(self):
+        """
+        Pop queued jobs that fit in free QA slots.
+
+        Returns:
+            list: (task_id, seconds spent queued) pairs
+        """
+        jobs = []
+        while self.queue and len(self.running) + len(jobs) < self.limit:
+            task_id = self.queue.popleft()
+            jobs.append((task_id, time.time() - self.queued_at.pop(task_id)))
+        return jobs
+
+    def started(self, task_id, pid):
+        self.running[task_id] = (pid, time.time())
+
+    def finished(self, task_id):
+        """
+        Returns:
+            float: QA run time in seconds, or None if the job was unknown
+        """
+        entry = self.running.pop(task_id, None)
+        return time.time() - entry[1] if entry else None
+
+    def pids(self):
+        return [pid for pid, _ in self.running.values()]
@@ -0,0 +1,234 @@
+"""
+QA result cache keyed by worktree content
+
+Retries, `auto-cursor continue` and monitor restarts often re-run QA on a
+worktree that hasn't changed since its last verdict. The cache key is the
+git tree hash of the worktree including untracked (non-ignored) files,
+computed with a throwaway index so the real index is untouched, combined
+with a hash of the QA wrapper. Directories that are not git worktrees fall
+back to hashing file paths and contents.
+
+Only passing verdicts are cached. A failure may be flaky (a timeout, a busy
+port), and a cached one would fail every later run of the same tree; a
+failed run simply runs QA again next time.
+
+Entries live in AUTO_CURSOR_DIR/qa-cache as <key>.json plus <key>.log and
+are evicted by age (AUTO_CURSOR_QA_CACHE_MAX_AGE_DAYS, default 14) and total
+size (AUTO_CURSOR_QA_CACHE_MAX_MB, default 200). AUTO_CURSOR_QA_CACHE=off,
+coordination.qa_cache = false or `--no-cache` bypass it.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import AUTO_CURSOR_DIR, load_json, write_json_atomic
+
+CACHE_DIR = AUTO_CURSOR_DIR / 'qa-cache'
+MAX_AGE_DAYS = float(os.environ.get('AUTO_CURSOR_QA_CACHE_MAX_AGE_DAYS', '14'))
+MAX_SIZE_MB = float(os.environ.get('AUTO_CURSOR_QA_CACHE_MAX_MB', '200'))
+
+# Skipped when hashing directories that are not git worktrees
+SKIP_DIRS = {'.git', 'node_modules', '__pycache__', '.venv', 'venv'}
+
+
+def cache_enabled(coordination=None):
+    if os.environ.get('AUTO_CURSOR_QA_CACHE', '').lower() in ('off', '0', 'false', 'no'):
+        return False
+    return (coordination or {}).get('qa_cache', True) is not False
+
+
+def _git(directory, *args, env=None):
+    return subprocess.run(['git', '-C', str(directory)] + list(args), env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+
+def git_tree_hash(directory):
+    """
+    Tree hash of the worktree as it is on disk (tracked changes and
+    untracked, non-ignored files), or None if directory is not a git worktree.
+    """
+    git_index = _git(directory, 'rev-parse', '--path-format=absolute', '--git-path', 'index')
+    if git_index.returncode != 0:
+        return None
+    fd, tmp_index = tempfile.mkstemp(prefix='qa-cache-index.')
+    os.close(fd)
+    try:
+        # Start from the real index so unchanged files hit git's stat cache
+        try:
+            shutil.copyfile(git_index.stdout.strip(), tmp_index)
+        except OSError:
+            os.unlink(tmp_index)
+        env = dict(os.environ, GIT_INDEX_FILE=tmp_index)
+        if _git(directory, 'add', '-A', env=env).returncode != 0:
+            return None
+        tree = _git(directory, 'write-tree', env=env)
+        return tree.stdout.strip() if tree.returncode == 0 else None
+    finally:
+        try:
+            os.unlink(tmp_index)
+        except OSError:
+            pass
+
+
+def content_hash(directory):
+    """sha256 over relative paths and file contents (non-git fallback)."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, directory).encode() + b'\0')
+            try:
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(chunk)
+            except OSError:
+                continue
+    return digest.hexdigest()
+
+
+def wrapper_hash(qa_wrapper):
+    try:
+        with open(qa_wrapper, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return 'missing'
+
+
+def cache_key(directory, qa_wrapper):
+    """
+    Returns:
+        tuple: (key, worktree hash)
+    """
+    tree = git_tree_hash(directory) or 'content-' + content_hash(directory)
+    key = hashlib.sha256(f'{tree}\0{wrapper_hash(qa_wrapper)}'.encode()).hexdigest()[:40]
+    return key, tree
+
+
+def lookup(key):
+    """
+    Returns:
+        dict: Cached entry (passed, exit_code, created, tree, ...) or None
+    """
+    entry = load_json(CACHE_DIR / f'{key}.json')
+    # Failed verdicts written before only passes were cached
+    if not entry or not entry.get('passed'):
+        return None
+    if time.time() - entry.get('created', 0) > MAX_AGE_DAYS * 86400:
+        return None
+    entry['log_path'] = str(CACHE_DIR / f'{key}.log')
+    # Touch so size-based eviction drops the least recently used entries
+    try:
+        os.utime(CACHE_DIR / f'{key}.json')
+    except OSError:
+        pass
+    return entry
+
+
+def store(key, tree, passed, exit_code, log_path):
+    """Cache a passing verdict; failures are not cached."""
+    if not passed:
+        return
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        shutil.copyfile(log_path, CACHE_DIR / f'{key}.log')
+    except OSError:
+        (CACHE_DIR / f'{key}.log').write_text('')
+    write_json_atomic(CACHE_DIR / f'{key}.json', {
+        'passed': bool(passed),
+        'exit_code': exit_code,
+        'tree': tree,
+        'created': time.time(),
+    })
+    prune()
+
+
+def prune(max_age_days=MAX_AGE_DAYS, max_size_mb=MAX_SIZE_MB):
+    """
+    Drop entries older than max_age_days, then least recently used entries
+    until the cache fits in max_size_mb.
+
+    Returns:
+        int: Number of entries removed
+    """
+    if not CACHE_DIR.exists():
+        return 0
+    now = time.time()
+    entries = []
+    for meta in CACHE_DIR.glob('*.json'):
+        log = meta.with_suffix('.log')
+        try:
+            mtime = meta.stat().st_mtime
+            size = meta.stat().st_size + (log.stat().st_size if log.exists() else 0)
+        except OSError:
+            continue
+        entries.append((mtime, size, meta, log))
+
+    removed = 0
+    total = sum(size for _, size, _, _ in entries)
+    for mtime, size, meta, log in sorted(entries, key=lambda e: e[0]):
+        if now - mtime <= max_age_days * 86400 and total <= max_size_mb * 1024 * 1024:
+            break
+        for path in (meta, log):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-qa-cache', description='QA result cache')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('key', help='Print the cache key for a worktree')
+    p.add_argument('directory')
+    p.add_argument('qa_wrapper')
+
+    p = sub.add_parser('lookup', help='Exit 0 and copy the cached log if there is a verdict')
+    p.add_argument('key')
+    p.add_argument('--log', help='Copy the cached QA log here')
+
+    p = sub.add_parser('store', help='Record a QA verdict (only passes are kept)')
+    p.add_argument('key')
+    p.add_argument('exit_code', type=int)
+    p.add_argument('log')
+    p.add_argument('--tree', default='')
+
+    p = sub.add_parser('prune', help='Evict old entries')
+    p.add_argument('--max-age-days', type=float, default=MAX_AGE_DAYS)
+    p.add_argument('--max-mb', type=float, default=MAX_SIZE_MB)
+
+    sub.add_parser('clear', help='Remove every cached verdict')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'key':
+        print(cache_key(args.directory, args.qa_wrapper)[0])
+    elif args.command == 'lookup':
+        entry = lookup(args.key)
+        if not entry:
+            return 1
+        if args.log:
+            shutil.copyfile(entry['log_path'], args.log)
+        print('passed' if entry['passed'] else 'failed')
+    elif args.command == 'store':
+        store(args.key, args.tree, args.exit_code == 0, args.exit_code, args.log)
+    elif args.command == 'prune':
+        print(f'Removed {prune(args.max_age_days, args.max_mb)} entries')
+    elif args.command == 'clear':
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print('QA cache cleared')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Concurrent, cached merge conflict resolution
+
+resolve_conflicts in auto-cursor-merge used to send each conflicted file to
+`cursor-agent --print` one at a time and forget the answer, so a shared
+file (a route table, a package manifest) that conflicts on every task
+branch cost an agent call on every merge.
+
+Each conflicted file is re-merged from its index stages with `git
+merge-file --diff3`, which splits it into conflict hunks with their base,
+ours and theirs text. Like git's rerere, a hunk's resolution is cached
+under a hash of (base, ours, theirs) in AUTO_CURSOR_DIR/resolve-cache, so an
+identical hunk is resolved from the cache with no agent call. Uncached
+hunks (deduplicated across files) are sent to the agent concurrently, up
+to AUTO_CURSOR_RESOLVE_PARALLEL (default 4) at a time.
+
+Files the agent can't resolve (delete/modify conflicts, binary files,
+failed or empty agent replies, replies that still contain conflict markers)
+are left conflicted for manual resolution.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import AUTO_CURSOR_DIR, load_json, write_json_atomic
+
+CACHE_DIR = AUTO_CURSOR_DIR / 'resolve-cache'
+DEFAULT_PARALLEL = int(os.environ.get('AUTO_CURSOR_RESOLVE_PARALLEL', '4'))
+MAX_AGE_DAYS = float(os.environ.get('AUTO_CURSOR_RESOLVE_CACHE_MAX_AGE_DAYS', '90'))
+AGENT_TIMEOUT = 600
+# Long conflict markers so ordinary "=======" lines in files aren't mistaken for them
+MARKER_SIZE = 32
+OURS_MARKER = '<' * MARKER_SIZE
+BASE_MARKER = '|' * MARKER_SIZE
+SPLIT_MARKER = '=' * MARKER_SIZE
+THEIRS_MARKER = '>' * MARKER_SIZE
+# Lines of unconflicted text shown around a hunk in the prompt
+CONTEXT_LINES = 20
+
+PROMPT = """Resolve this git merge conflict in {path}. Keep the best parts of both versions, ensuring the code works correctly.
+
+CODE BEFORE THE CONFLICT:
+```
+{before}
+```
+
+BASE VERSION (common ancestor):
+```
+{base}
+```
+
+OUR VERSION (current branch):
+```
+{ours}
+```
+
+THEIR VERSION (incoming changes):
+```
+{theirs}
+```
+
+CODE AFTER THE CONFLICT:
+```
+{after}
+```
+
+Reply with only the resolved replacement for the conflicting lines (not the code before or after), with all conflict markers removed:"""
+
+
+def _git(repo, *args, text=True):
+    return subprocess.run(['git', '-C', str(repo)] + list(args), stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text)
+
+
+def conflicted_files(repo):
+    """
+    Returns:
+        dict: path -> {stage number: blob id} for every unmerged path
+    """
+    result = _git(repo, 'ls-files', '-u', '-z')
+    files = {}
+    for entry in result.stdout.split('\0'):
+        if not entry:
+            continue
+        info, path = entry.split('\t', 1)
+        _, blob, stage = info.split()
+        files.setdefault(path, {})[int(stage)] = blob
+    return files
+
+
+def hunk_key(base, ours, theirs):
+    digest = hashlib.sha256()
+    for part in (base, ours, theirs):
+        data = part.encode()
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def split_conflicts(merged):
+    """
+    Split `git merge-file --diff3` output into segments.
+
+    Returns:
+        list: Plain strings for merged text and (base, ours, theirs) tuples
+            for conflict hunks
+    """
+    segments = []
+    plain = []
+    section = None
+    parts = {}
+    for line in merged.splitlines(keepends=True):
+        stripped = line.rstrip('\n')
+        if section is None and stripped.startswith(OURS_MARKER + ' '):
+            segments.append(''.join(plain))
+            plain = []
+            section, parts = 'ours', {'ours': [], 'base': [], 'theirs': []}
+        elif section == 'ours' and stripped.startswith(BASE_MARKER):
+            section = 'base'
+        elif section in ('ours', 'base') and stripped == SPLIT_MARKER:
+            section = 'theirs'
+        elif section == 'theirs' and stripped.startswith(THEIRS_MARKER + ' '):
+            segments.append((''.join(parts['base']), ''.join(parts['ours']), ''.join(parts['theirs'])))
+            section = None
+        elif section:
+            parts[section].append(line)
+        else:
+            plain.append(line)
+    segments.append(''.join(plain))
+    return [s for s in segments if s != '']
+
+
+def diff3_segments(repo, stages):
+    """
+    Re-merge a conflicted path from its index stages.
+
+    Returns:
+        list: Segments (see split_conflicts), or None when the conflict isn't
+            a text conflict of both sides (delete/modify, binary)
+    """
+    if 2 not in stages or 3 not in stages:
+        return None
+    blobs = {}
+    for stage in (1, 2, 3):
+        if stage in stages:
+            data = _git(repo, 'cat-file', 'blob', stages[stage], text=False).stdout
+            if b'\0' in data:
+                return None
+            blobs[stage] = data
+        else:
+            # add/add: no common ancestor
+            blobs[stage] = b''
+    with tempfile.TemporaryDirectory(prefix='auto-cursor-resolve.') as tmp:
+        paths = []
+        for stage in (2, 1, 3):
+            path = os.path.join(tmp, str(stage))
+            with open(path, 'wb') as f:
+                f.write(blobs[stage])
+            paths.append(path)
+        result = subprocess.run(['git', 'merge-file', '-p', '--diff3', f'--marker-size={MARKER_SIZE}',
+                                 '-L', 'ours', '-L', 'base', '-L', 'theirs'] + paths,
+                                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode < 0 or result.returncode > 127:
+        return None
+    return split_conflicts(result.stdout.decode(errors='surrogateescape'))
+
+
+class ResolutionCache:
+    """Hunk resolutions keyed by hunk_key()."""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.dir = directory
+
+    def get(self, key):
+        entry = load_json(self.dir / f'{key}.json')
+        if not entry:
+            return None
+        entry['hits'] = entry.get('hits', 0) + 1
+        entry['used'] = time.time()
+        write_json_atomic(self.dir / f'{key}.json', entry)
+        return entry['resolution']
+
+    def put(self, key, resolution, path):
+        write_json_atomic(self.dir / f'{key}.json', {
+            'resolution': resolution, 'path': path, 'created': time.time(), 'used': time.time(), 'hits': 0,
+        })
+
+    def prune(self, max_age_days=MAX_AGE_DAYS):
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for entry_path in self.dir.glob('*.json'):
+            entry = load_json(entry_path) or {}
+            if entry.get('used', 0) < cutoff:
+                entry_path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def stats(self):
+        entries = [load_json(p) or {} for p in self.dir.glob('*.json')]
+        return {'entries': len(entries), 'hits': sum(e.get('hits', 0) for e in entries)}
+
+
+def clean_reply(output):
+    """Same clean-up as the old resolve_conflicts, plus code fences."""
+    lines = [line for line in output.splitlines() if not line.startswith('Warning:')][1:]
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if len(lines) >= 2 and lines[0].startswith('```') and lines[-1].startswith('```'):
+        lines = lines[1:-1]
+    return '\n'.join(lines)
+
+
+def ask_agent(repo, prompt):
+    """
+    Returns:
+        str: The agent's resolution, or None
+    """
+    try:
+        result = subprocess.run(['cursor-agent', '--print', prompt], cwd=str(repo), stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                timeout=AGENT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    reply = clean_reply(result.stdout)
+    if not reply.strip() or any(marker in reply for marker in ('<<<<<<<', '>>>>>>>')):
+        return None
+    return reply
+
+
+def _context(text, tail):
+    lines = text.splitlines()
+    return '\n'.join(lines[-CONTEXT_LINES:] if tail else lines[:CONTEXT_LINES])
+
+
+def resolve(repo, parallel=DEFAULT_PARALLEL, use_cache=True, cache=None, log=print):
+    """
+    Resolve the unmerged paths of the merge in progress in repo and stage
+    the ones that were fully resolved.
+
+    Returns:
+        dict: resolved and unresolved paths, cache hits and agent calls
+    """
+    cache = cache or ResolutionCache()
+    files = conflicted_files(repo)
+    report = {'resolved': [], 'unresolved': [], 'cache_hits': 0, 'agent_calls': 0}
+
+    segments_by_path = {}
+    requests = {}           # key -> prompt, one per distinct hunk
+    for path, stages in sorted(files.items()):
+        segments = diff3_segments(repo, stages)
+        if segments is None:
+            log(f'  {path}: not a text conflict, leaving it for manual resolution')
+            report['unresolved'].append(path)
+            continue
+        segments_by_path[path] = segments
+        for i, segment in enumerate(segments):
+            if isinstance(segment, tuple) and hunk_key(*segment) not in requests:
+                before = segments[i - 1] if i > 0 and isinstance(segments[i - 1], str) else ''
+                after = segments[i + 1] if i + 1 < len(segments) and isinstance(segments[i + 1], str) else ''
+                base, ours, theirs = segment
+                requests[hunk_key(*segment)] = PROMPT.format(
+                    path=path, before=_context(before, tail=True), base=base.rstrip('\n'),
+                    ours=ours.rstrip('\n'), theirs=theirs.rstrip('\n'), after=_context(after, tail=False))
+
+    resolutions = {}
+    if use_cache:
+        for key in requests:
+            cached = cache.get(key)
+            if cached is not None:
+                resolutions[key] = cached
+        report['cache_hits'] = len(resolutions)
+    pending = [key for key in requests if key not in resolutions]
+    if pending:
+        log(f'  Asking the agent about {len(pending)} conflict hunk(s), {max(1, parallel)} at a time')
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+            replies = dict(zip(pending, executor.map(lambda key: ask_agent(repo, requests[key]), pending)))
+        report['agent_calls'] = len(pending)
+        for key, reply in replies.items():
+            if reply is not None:
+                resolutions[key] = reply
+
+    for path, segments in segments_by_path.items():
+        output = []
+        complete = True
+        for segment in segments:
+            if isinstance(segment, str):
+                output.append(segment)
+                continue
+            key = hunk_key(*segment)
+            if key not in resolutions:
+                complete = False
+                break
+            resolution = resolutions[key]
+            output.append(resolution if resolution.endswith('\n') or not resolution else resolution + '\n')
+        if not complete:
+            log(f'  {path}: could not resolve every conflict, leaving it for manual resolution')
+            report['unresolved'].append(path)
+            continue
+        if use_cache:
+            for segment in segments:
+                if isinstance(segment, tuple):
+                    key = hunk_key(*segment)
+                    if key in pending:
+                        cache.put(key, resolutions[key], path)
+        with open(os.path.join(repo, path), 'w', errors='surrogateescape') as f:
+            f.write(''.join(output))
+        _git(repo, 'add', '--', path)
+        report['resolved'].append(path)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-resolve', description='Resolve merge conflicts')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='Resolve the conflicts of the merge in progress')
+    p.add_argument('repo')
+    p.add_argument('--parallel', type=int, default=DEFAULT_PARALLEL)
+    p.add_argument('--no-cache', action='store_true', help='Neither read nor write cached resolutions')
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('prune', help='Drop resolutions unused for a while')
+    p.add_argument('--max-age-days', type=float, default=MAX_AGE_DAYS)
+
+    sub.add_parser('stats', help='Show cache size and hits')
+
+    args = parser.parse_args(argv)
+    cache = ResolutionCache()
+    if args.command == 'prune':
+        print(f'Removed {cache.prune(args.max_age_days)} entries')
+        return 0
+    if args.command == 'stats':
+        print(json.dumps(cache.stats(), indent=2))
+        return 0
+
+    report = resolve(args.repo, args.parallel, use_cache=not args.no_cache, cache=cache,
+                     log=(lambda message: None) if args.json else print)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"  Resolved {len(report['resolved'])} file(s) ({report['cache_hits']} hunk(s) from cache, "
+              f"{report['agent_calls']} agent call(s))")
+    return 1 if report['unresolved'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
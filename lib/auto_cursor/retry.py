@@ -0,0 +1,103 @@
+"""
+Automatic retries with exponential backoff
+
+A task that ends in `failed` (or `qa_failed` when QA is required) is put
+back through admission control after base * 2^n seconds, capped, until it
+has used max_retries attempts. Waiting retries sit in a min-heap keyed by
+due time, so the scheduler sleeps exactly until the next one is due instead
+of polling.
+
+Settings (coordination block, environment overrides):
+
+    max_retries            AUTO_CURSOR_MAX_RETRIES       default 2 (0 disables)
+    retry_base_seconds     AUTO_CURSOR_RETRY_BASE        default 30
+    retry_max_seconds      AUTO_CURSOR_RETRY_MAX         default 900
+    max_parallel_retries   AUTO_CURSOR_RETRY_SLOTS       default half of max_parallel
+
+Retries are admitted after first attempts and, while first attempts are
+still waiting for a slot, hold at most max_parallel_retries slots, so they
+cannot starve fresh work. Once no first attempt is left to run (or every
+one left waits on a retry), retries may use every free slot.
+"""
+
+import heapq
+import os
+import time
+
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BASE_SECONDS = 30.0
+DEFAULT_MAX_SECONDS = 900.0
+
+
+def _setting(coordination, key, env_var, default, cast):
+    value = os.environ.get(env_var)
+    if value in (None, ''):
+        value = coordination.get(key)
+    try:
+        return cast(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+class RetryPolicy:
+    """Backoff schedule and attempt limit."""
+
+    def __init__(self, coordination=None):
+        coordination = coordination or {}
+        self.max_retries = _setting(coordination, 'max_retries', 'AUTO_CURSOR_MAX_RETRIES',
+                                    DEFAULT_MAX_RETRIES, int)
+        self.base = _setting(coordination, 'retry_base_seconds', 'AUTO_CURSOR_RETRY_BASE',
+                             DEFAULT_BASE_SECONDS, float)
+        self.cap = _setting(coordination, 'retry_max_seconds', 'AUTO_CURSOR_RETRY_MAX',
+                            DEFAULT_MAX_SECONDS, float)
+        max_parallel = _setting(coordination, 'max_parallel', 'AUTO_CURSOR_MAX_PARALLEL', 0, int)
+        self.slots = _setting(coordination, 'max_parallel_retries', 'AUTO_CURSOR_RETRY_SLOTS',
+                              max(1, max_parallel // 2) if max_parallel > 0 else None, int)
+
+    def should_retry(self, retry_count):
+        return retry_count < self.max_retries
+
+    def delay(self, retry_count):
+        """Backoff before retry number retry_count + 1: base * 2^retry_count, capped."""
+        return min(self.cap, self.base * (2 ** retry_count))
+
+
+class RetryQueue:
+    """Min-heap of (due time, task id)."""
+
+    def __init__(self):
+        self.heap = []
+        self.due = {}
+
+    def __len__(self):
+        return len(self.due)
+
+    def __contains__(self, task_id):
+        return task_id in self.due
+
+    def push(self, task_id, due):
+        self.due[task_id] = due
+        heapq.heappush(self.heap, (due, task_id))
+
+    def pop_due(self, now=None):
+        """
+        Returns:
+            list: Task ids whose retry time has come, earliest first
+        """
+        now = now or time.time()
+        ready = []
+        while self.heap and self.heap[0][0] <= now:
+            due, task_id = heapq.heappop(self.heap)
+            # Skip entries superseded by a later push for the same task
+            if self.due.get(task_id) == due:
+                del self.due[task_id]
+                ready.append(task_id)
+        return ready
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the next retry is due, or None if nothing is waiting."""
+        while self.heap and self.due.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - (now or time.time()))
@@ -0,0 +1,1107 @@
+"""
+Event-driven scheduler daemon for orchestrate-agents
+
+Replaces the 5-second polling loop in monitor_agents(). The orchestration
+file is read once and the task graph is kept in memory. Agent exits are
+delivered by the kernel (a pidfd per agent, or waitpid for agents we
+spawned ourselves), so completion, QA and unblocking of dependents happen
+as soon as an agent finishes instead of on the next tick.
+
+The daemon keeps writing the same STATE_DIR/PID_DIR files and tasks.json
+updates as the bash implementation, so `orchestrate-agents status`, the
+web server and `auto-cursor status` work unchanged.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import re
+import selectors
+import shlex
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from . import agent_state, coord
+from .admission import AdmissionController
+from .graph import DEFAULT_POLICY, POLICIES, DependencyGraph, DurationModel
+from .heartbeat import HEARTBEAT_INTERVAL, KILL_GRACE, Watchdog, exit_path, heartbeat_path, read_exit_code
+from . import journal, memory, qa_cache, task_index, trace
+from .qa import QAPool, qa_parallel_limit
+from .retry import RetryPolicy, RetryQueue
+from .common import (AGENTS_DIR, LOG_DIR, PID_DIR, QA_DIR, STATE_DIR, load_json,
+                     project_id_for_task_file, write_json_atomic, write_text_atomic)
+
+RED = '\033[0;31m'
+GREEN = '\033[0;32m'
+YELLOW = '\033[1;33m'
+BLUE = '\033[0;34m'
+CYAN = '\033[0;36m'
+NC = '\033[0m'
+
+SCHEDULER_DIR = AGENTS_DIR / 'scheduler'
+BIN_DIR = Path(__file__).resolve().parents[2] / 'bin'
+AGENT_WRAPPER = os.environ.get('AGENT_WRAPPER', str(BIN_DIR / 'orchestrate-agent-wrapper'))
+QA_WRAPPER = os.environ.get('QA_WRAPPER', '/home/ethan/qa-instructions/qa-wrapper.sh')
+# "tmux" (default when installed) or "direct"
+SPAWN_MODE = os.environ.get('AUTO_CURSOR_SPAWN') or ('tmux' if shutil.which('tmux') else 'direct')
+
+DONE_STATUSES = ('completed', 'qa_passed', 'qa_failed', 'qa_skipped')
+FAILED_STATUSES = ('qa_failed', 'failed')
+ACTIVE_STATUSES = ('running', 'qa_queued', 'qa_running', 'retry_wait')
+
+# Same indicators check_dependencies() greps for in QA logs
+CRITICAL_QA_PATTERN = re.compile(r'(test failed|build failed|error:|exception|traceback|fatal)', re.IGNORECASE)
+
+
+def pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_pid(path):
+    try:
+        return int(Path(path).read_text().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+class ProcessWatcher:
+    """
+    Waits for process exits without polling.
+
+    Each watched process gets a pidfd registered with a selector; the fd
+    becomes readable when the process exits. For our own children the exit
+    code is then reaped with waitpid. Kernels without pidfd_open fall back
+    to a one-second waitpid/kill(0) check.
+    """
+
+    FALLBACK_INTERVAL = 1.0
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.watched = {}       # key -> (pid, pidfd or None, is_child)
+        self.ready = []         # exits noticed outside the selector
+
+    def watch(self, key, pid, child=False):
+        pidfd = None
+        if hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                self.ready.append((key, self._reap(pid) if child else None))
+                return
+            except OSError:
+                pidfd = None
+        self.watched[key] = (pid, pidfd, child)
+        if pidfd is not None:
+            self.selector.register(pidfd, selectors.EVENT_READ, key)
+
+    def unwatch(self, key):
+        entry = self.watched.pop(key, None)
+        if entry and entry[1] is not None:
+            self.selector.unregister(entry[1])
+            os.close(entry[1])
+
+    def __len__(self):
+        return len(self.watched)
+
+    def _reap(self, pid):
+        try:
+            _, status = os.waitpid(pid, 0)
+        except ChildProcessError:
+            return None
+        return os.waitstatus_to_exitcode(status)
+
+    def _poll_fallback(self):
+        exited = []
+        for key, (pid, pidfd, child) in list(self.watched.items()):
+            if pidfd is not None:
+                continue
+            if child:
+                try:
+                    done_pid, status = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done_pid, status = pid, None
+                if done_pid:
+                    exited.append((key, os.waitstatus_to_exitcode(status) if status is not None else None))
+            elif not pid_alive(pid):
+                exited.append((key, None))
+        return exited
+
+    def wait(self, timeout=None):
+        """
+        Block until at least one watched process exits or timeout passes.
+
+        Returns:
+            list: (key, exit_code) pairs; exit_code is None when unknown
+        """
+        if self.ready:
+            exited, self.ready = self.ready, []
+            return exited
+        if any(pidfd is None for _, pidfd, _ in self.watched.values()):
+            timeout = self.FALLBACK_INTERVAL if timeout is None else min(timeout, self.FALLBACK_INTERVAL)
+        exited = []
+        if self.selector.get_map():
+            for selector_key, _ in self.selector.select(timeout):
+                key = selector_key.data
+                pid, _, child = self.watched[key]
+                exited.append((key, self._reap(pid) if child else None))
+        elif timeout:
+            time.sleep(timeout)
+        exited.extend(self._poll_fallback())
+        for key, _ in exited:
+            self.unwatch(key)
+        return exited
+
+
+class AgentTask:
+    """One agent entry from the orchestration file, plus its live status."""
+
+    def __init__(self, index, entry):
+        self.index = index
+        self.id = entry.get('id', '')
+        self.directory = entry.get('directory', '')
+        self.prompt = entry.get('initial_prompt', '')
+        self.dependencies = list(entry.get('dependencies') or [])
+        self.wait_for = list(entry.get('wait_for') or [])
+        self.run_qa = bool(entry.get('run_qa', False))
+        self.qa_required = bool(entry.get('qa_required', False))
+        self.complexity = entry.get('complexity')
+        self.estimated_hours = entry.get('estimated_hours')
+        self.status = 'pending'
+        self.queue_position = None
+        self.qa_queue_seconds = None
+        self.qa_cache_key = None
+        self.qa_tree = None
+        self.kill_reason = None
+        self.killed_at = None
+        self.retry_count = 0
+        self.pid = 0
+        self.started = None
+
+    @property
+    def pid_file(self):
+        return PID_DIR / f'{self.id}.pid'
+
+    @property
+    def session(self):
+        return f'cursor-agent-{self.id}'
+
+    @property
+    def log_file(self):
+        return LOG_DIR / f'{self.id}.log'
+
+    @property
+    def qa_log(self):
+        return QA_DIR / f'{self.id}.log'
+
+
+class Scheduler:
+    """Holds the task graph for one orchestration file and reacts to events."""
+
+    def __init__(self, task_file, out=None):
+        self.task_file = Path(task_file).resolve()
+        config = load_json(self.task_file)
+        if not isinstance(config, dict):
+            raise ValueError(f'Task file not found or invalid: {task_file}')
+        self.out = out or sys.stdout
+        self.coordination = config.get('coordination') or {}
+        self.tasks = OrderedDict()
+        for index, entry in enumerate(config.get('agents') or []):
+            task = AgentTask(index, entry)
+            self.tasks[task.id] = task
+        self.project_id = project_id_for_task_file(self.task_file)
+        tasks_file = self.task_file.parent / 'tasks.json'
+        self.tasks_file = tasks_file if tasks_file.exists() else None
+        self.project_tasks = {t.get('id'): t for t in (load_json(self.tasks_file, []) or [])} if self.tasks_file else {}
+        self.admission = AdmissionController(self.coordination)
+        self._last_throttle = None
+        self.qa_pool = QAPool(qa_parallel_limit(self.coordination))
+        self.watchdog = Watchdog(self.coordination)
+        self.retry_policy = RetryPolicy(self.coordination)
+        self.retries = RetryQueue()
+        self.qa_cache = qa_cache.cache_enabled(self.coordination)
+        # Dependents unblocked outside the exit-event path (QA cache hits)
+        self.unblocked = []
+
+        self.policy = os.environ.get('AUTO_CURSOR_POLICY') or self.coordination.get('policy') or DEFAULT_POLICY
+        if self.policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {self.policy} (expected {' or '.join(POLICIES)})")
+        self.durations = DurationModel()
+        for task in self.tasks.values():
+            planned = self.project_tasks.get(task.id, {})
+            task.estimated_hours = task.estimated_hours or planned.get('estimated_hours')
+            task.complexity = task.complexity or planned.get('complexity')
+            task.retry_count = int(planned.get('retry_count') or 0)
+        self.graph = DependencyGraph(
+            (task.id, task.dependencies, self.durations.estimate(task.estimated_hours, task.complexity))
+            for task in self.tasks.values()
+        )
+        self.started_at = None
+        # task id -> dependencies not yet satisfied; only dependents of a
+        # finished task are re-evaluated
+        self.unmet = {}
+        # dep id -> whether its QA failure is critical (None: no QA log)
+        self.qa_severity = {}
+        self.watcher = ProcessWatcher()
+        self.stopping = False
+        self.tracer = (trace.TaskTracer(trace.trace_path(self.project_id))
+                       if self.project_id and trace.enabled() else None)
+        self.journal = journal.Journal(self.project_id) if self.project_id and journal.enabled() else None
+
+    def log(self, message, color=None):
+        if color:
+            message = f'{color}{message}{NC}'
+        print(message, file=self.out, flush=True)
+
+    # Status bookkeeping
+
+    def set_status(self, task, status):
+        if self.journal:
+            self.journal.append('status', task.id, status=status)
+        task.status = status
+        agent_state.set_agent_status(task.id, status, self.project_id)
+        if self.tracer:
+            self.tracer.phase(task.id, task.index, status)
+
+    def update_project_task(self, task, status, **fields):
+        if self.tasks_file:
+            agent_state.update_task(self.tasks_file, self.project_id, task.id, status, fields)
+            self.project_tasks.setdefault(task.id, {}).update(fields, status=status)
+            # Completion events fold the task into memory.json and the task index
+            if status in task_index.INDEXED_STATUSES and self.project_id:
+                try:
+                    memory.record_completion(self.project_id)
+                except (OSError, sqlite3.Error) as e:
+                    self.log(f'Warning: could not update memory: {e}', YELLOW)
+
+    def qa_enabled(self, task):
+        return task.run_qa or bool(self.coordination.get('qa_on_completion', False))
+
+    # Dependencies
+
+    def qa_failure_is_critical(self, dep_id):
+        if dep_id not in self.qa_severity:
+            try:
+                log = (QA_DIR / f'{dep_id}.log').read_text(errors='ignore')
+                self.qa_severity[dep_id] = bool(CRITICAL_QA_PATTERN.search(log))
+            except OSError:
+                self.qa_severity[dep_id] = None
+        return self.qa_severity[dep_id]
+
+    def dependency_met(self, dep_id):
+        """Same rules as check_dependencies() in bin/orchestrate-agents."""
+        # Decided by status: a task being retried keeps the completed timestamp
+        # of its failed attempt until the retry clears it
+        project_task = self.project_tasks.get(dep_id)
+        if project_task and project_task.get('status') in ('completed', 'qa_passed', 'qa_skipped'):
+            if project_task.get('qa_status') == 'qa_failed':
+                return self.qa_failure_is_critical(dep_id) is False
+            return True
+
+        dep = self.tasks.get(dep_id)
+        status = dep.status if dep else agent_state.get_agent_status(dep_id)
+        if status in ('qa_passed', 'completed', 'qa_skipped'):
+            return True
+        if status in FAILED_STATUSES:
+            # Non-critical QA failures (docs, formatting) don't block dependents;
+            # without a QA log the failure is assumed critical
+            return self.qa_failure_is_critical(dep_id) is False
+        return False
+
+    def init_dependencies(self):
+        """Evaluate every task's dependencies once at startup."""
+        self.unmet = {
+            task.id: {dep for dep in task.dependencies if not self.dependency_met(dep)}
+            for task in self.tasks.values()
+        }
+
+    def resolve(self, task_id):
+        """
+        A task reached a final status; re-check only its dependents.
+
+        Returns:
+            list: Dependents that have no unmet dependencies left
+        """
+        ready = []
+        met = None
+        for child in self.graph.dependents.get(task_id, ()):
+            unmet = self.unmet.get(child)
+            if not unmet or task_id not in unmet:
+                continue
+            if met is None:
+                met = self.dependency_met(task_id)
+            if met:
+                unmet.discard(task_id)
+                if not unmet:
+                    ready.append(child)
+        return ready
+
+    def refresh_dependencies(self):
+        """
+        Full re-evaluation, only used before declaring a deadlock (picks up
+        dependencies outside this plan that changed behind our back).
+        """
+        ready = []
+        for task in self.startable():
+            unmet = self.unmet.get(task.id)
+            if unmet:
+                unmet.difference_update([dep for dep in list(unmet) if self.dependency_met(dep)])
+                if not unmet:
+                    ready.append(task.id)
+        return ready
+
+    # Lifecycle
+
+    def adopt_existing(self):
+        """
+        Pick up statuses (and still-running agents) from a previous run: from
+        the journal when there is one, otherwise from every task's status file.
+        """
+        journaled, replayed = self.journal.recover() if self.journal else (None, 0)
+        if journaled is not None:
+            self.log(f'Resuming from the scheduler journal ({replayed} records since the last checkpoint)', CYAN)
+        for task in self.tasks.values():
+            entry = journaled.get(task.id) if journaled is not None else None
+            if entry is None:
+                status = agent_state.get_agent_status(task.id)
+            else:
+                status = entry.get('status') or 'pending'
+                task.retry_count = max(task.retry_count, int(entry.get('retry_count') or 0))
+            if status in DONE_STATUSES or status in ('failed', 'stopped'):
+                task.status = status
+            elif status == 'running':
+                pid = entry.get('pid') if entry else read_pid(task.pid_file)
+                task.status = 'running'
+                task.started = entry.get('started') if entry else None
+                if self.tracer:
+                    self.tracer.phase(task.id, task.index, 'running')
+                if pid_alive(pid):
+                    task.pid = pid
+                    self.watcher.watch(task.id, pid)
+                    self.log(f'Re-attached to running agent {task.id} (PID: {pid})', CYAN)
+                else:
+                    self.watcher.ready.append((task.id, None))
+            elif status in ('qa_queued', 'qa_running'):
+                # QA was interrupted; run it again
+                self.run_qa(task)
+            elif status == 'retry_wait':
+                task.status = status
+                due = (entry or self.project_tasks.get(task.id, {})).get('next_retry_time')
+                self.retries.push(task.id, due if isinstance(due, (int, float)) else time.time())
+            elif status == 'pending' and entry is not None:
+                # Already pending on disk; nothing to rewrite
+                task.status = status
+            else:
+                self.set_status(task, 'pending')
+            if not (STATE_DIR / f'{task.id}.json').exists():
+                write_json_atomic(STATE_DIR / f'{task.id}.json', {})
+
+    def startable(self):
+        """Tasks that are not started yet, in plan order."""
+        return [task for task in self.tasks.values() if task.status in ('pending', 'waiting', 'queued')]
+
+    def running_count(self):
+        return sum(1 for task in self.tasks.values() if task.status == 'running')
+
+    def schedule(self, candidates=None):
+        """
+        Queue tasks whose dependencies are met and fill free slots.
+
+        Args:
+            candidates: Task ids to evaluate, or None for every unstarted task
+        """
+        if candidates is None:
+            tasks = self.startable()
+        else:
+            tasks = [self.tasks[task_id] for task_id in candidates
+                     if task_id in self.tasks and self.tasks[task_id].status in ('pending', 'waiting', 'queued')]
+        for task in tasks:
+            if not self.unmet.get(task.id):
+                self.admission.enqueue(task.id)
+            elif task.status != 'waiting':
+                self.log(f'Agent {task.id} waiting for dependencies...', YELLOW)
+                self.set_status(task, 'waiting')
+
+        # First attempts go ahead of retries; within each group the policy decides
+        priority = self.graph.priority_key(self.policy)
+        self.admission.reorder(lambda task_id: (self.tasks[task_id].retry_count > 0, priority(task_id)))
+        admitted = self.admission.admit(self.running_count(), self.retry_slot_available)
+        while admitted:
+            launched = self.launch([self.tasks[task_id] for task_id in admitted])
+            # Slots of agents that failed to launch go to the next in line
+            admitted = (self.admission.admit(self.running_count(), self.retry_slot_available)
+                        if launched < len(admitted) else [])
+
+        if self.admission.queue and self.admission.throttled_by:
+            message = f"Admission throttled: {'; '.join(self.admission.throttled_by)}"
+            if message != self._last_throttle:
+                self.log(message, YELLOW)
+            self._last_throttle = message
+        else:
+            self._last_throttle = None
+
+        for task_id, position in self.admission.positions().items():
+            task = self.tasks[task_id]
+            if task.status != 'queued':
+                self.log(f'Agent {task.id} queued (position {position}, {self.admission.describe()})', YELLOW)
+                self.set_status(task, 'queued')
+            if task.queue_position != position:
+                task.queue_position = position
+                agent_state.set_agent_state(task.id, 'queue_position', position)
+
+    def retry_slot_available(self, task_id, admitted):
+        """
+        Retries may hold at most retry_policy.slots running slots while first
+        attempts are waiting for one; otherwise they may fill every free slot.
+        """
+        if self.tasks[task_id].retry_count == 0 or self.retry_policy.slots is None:
+            return True
+        if not self.first_attempts_waiting(admitted):
+            return True
+        retrying = sum(1 for task in self.tasks.values() if task.status == 'running' and task.retry_count)
+        retrying += sum(1 for other in admitted if self.tasks[other].retry_count)
+        return retrying < self.retry_policy.slots
+
+    def first_attempts_waiting(self, admitted=()):
+        """
+        True if an unstarted first attempt will need a slot without waiting
+        for a retry first. Tasks blocked (directly or through other waiting
+        tasks) on a retrying or failed task are not counted: holding slots
+        back for them would only delay the retry they wait for.
+        """
+        blocked = {}
+
+        def waits_on_retry(task_id):
+            if task_id not in blocked:
+                blocked[task_id] = False
+                for dep_id in self.unmet.get(task_id, ()):
+                    dep = self.tasks.get(dep_id)
+                    if dep is None:
+                        continue
+                    if (dep.status in ('failed', 'retry_wait')
+                            or (dep.retry_count and dep.status not in DONE_STATUSES)
+                            or waits_on_retry(dep_id)):
+                        blocked[task_id] = True
+                        break
+            return blocked[task_id]
+
+        return any(task.retry_count == 0 and task.status in ('pending', 'waiting', 'queued')
+                   and task.id not in admitted and not waits_on_retry(task.id)
+                   for task in self.tasks.values())
+
+    def maybe_retry(self, task):
+        """
+        Schedule a failed task for another attempt if it has attempts left.
+
+        Returns:
+            bool: True if a retry was scheduled
+        """
+        if task.status == 'qa_failed' and not task.qa_required:
+            return False
+        if not self.retry_policy.should_retry(task.retry_count):
+            if self.retry_policy.max_retries:
+                self.log(f'Agent {task.id} out of retries ({task.retry_count}/{self.retry_policy.max_retries})', RED)
+            return False
+        delay = self.retry_policy.delay(task.retry_count)
+        task.retry_count += 1
+        due = time.time() + delay
+        if self.journal:
+            self.journal.append('retry', task.id, retry_count=task.retry_count, due=round(due, 3))
+        self.retries.push(task.id, due)
+        self.log(f'Retrying agent {task.id} in {delay:.0f}s '
+                 f'(attempt {task.retry_count + 1}/{self.retry_policy.max_retries + 1})', YELLOW)
+        self.set_status(task, 'retry_wait')
+        agent_state.set_agent_state(task.id, 'retry_count', task.retry_count)
+        agent_state.set_agent_state(task.id, 'next_retry_time', int(due))
+        self.update_project_task(task, 'pending', retry_count=task.retry_count, next_retry_time=due,
+                                 completed=None, qa_status=None)
+        return True
+
+    def release_retries(self):
+        """
+        Move retries that are due back to admission.
+
+        Returns:
+            list: Task ids to schedule
+        """
+        due = self.retries.pop_due()
+        for task_id in due:
+            task = self.tasks[task_id]
+            self.log(f'Retry due for agent {task.id}', CYAN)
+            self.set_status(task, 'pending')
+        return due
+
+    def launch(self, tasks):
+        """
+        Start agents concurrently and record their exact PIDs.
+
+        With tmux (the default when installed) each agent gets the usual
+        cursor-agent-<id> session, so `orchestrate-agents send` and attaching
+        keep working; `new-session -P` reports the pane PID, which is the
+        wrapper itself because the pane shell execs it. All tmux launches are
+        issued before any is waited on, so launch time does not grow with the
+        number of agents. Without tmux the wrapper is spawned directly.
+
+        Returns:
+            int: Number of agents started
+        """
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        PID_DIR.mkdir(parents=True, exist_ok=True)
+
+        pending = []
+        started = 0
+        for task in tasks:
+            if not os.path.isdir(task.directory):
+                self._launch_failed(task, f'Directory does not exist: {task.directory}')
+                continue
+            self.log(f'Starting agent: {task.id}', GREEN)
+            if self.tracer:
+                self.tracer.phase(task.id, task.index, 'spawn')
+            self.log(f'  Directory: {task.directory}')
+            self.log(f'  Prompt: {task.prompt[:50]}...')
+            for stale in (heartbeat_path(task.id), exit_path(heartbeat_path(task.id))):
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+            task.kill_reason = task.killed_at = None
+            if task.retry_count and task.log_file.exists():
+                # Keep the previous attempt's output (and its capture sidecar) next to the new log
+                for suffix in ('.log', '.jsonl', '.idx'):
+                    previous = task.log_file.with_suffix(suffix)
+                    if previous.exists():
+                        previous.rename(task.log_file.with_name(f'{task.id}.attempt{task.retry_count}{suffix}'))
+            argv = [AGENT_WRAPPER, task.directory, task.prompt, str(task.log_file)] + task.wait_for
+            try:
+                if SPAWN_MODE == 'tmux':
+                    pending.append((task, argv, self._tmux_launch(task, argv)))
+                    continue
+                # New session: the agent and its pipeline form their own process
+                # group, so stopping it never signals the scheduler.
+                proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL, start_new_session=True)
+            except OSError as e:
+                self._launch_failed(task, str(e))
+                continue
+            self._started(task, proc.pid, child=True)
+            started += 1
+
+        for task, argv, proc in pending:
+            out, err = proc.communicate()
+            if proc.returncode != 0 and b'duplicate session' in err:
+                # Leftover session from an earlier run whose agent is gone
+                subprocess.run(['tmux', 'kill-session', '-t', task.session],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    proc = self._tmux_launch(task, argv)
+                except OSError as e:
+                    self._launch_failed(task, str(e))
+                    continue
+                out, err = proc.communicate()
+            try:
+                pid = int(out.decode().strip().splitlines()[0])
+            except (IndexError, ValueError):
+                self._launch_failed(task, err.decode(errors='ignore').strip())
+                continue
+            self._started(task, pid, child=False)
+            started += 1
+        return started
+
+    def _launch_failed(self, task, reason):
+        """An agent could not be started: fail it like an agent that died, retries included."""
+        self.log(f'Error: Failed to start agent {task.id}: {reason}', RED)
+        agent_state.set_agent_state(task.id, 'failure_reason', reason)
+        self.set_status(task, 'failed')
+        self.update_project_task(task, 'failed', error=reason)
+        self.maybe_retry(task)
+
+    def _tmux_launch(self, task, argv):
+        return subprocess.Popen(
+            ['tmux', 'new-session', '-d', '-P', '-F', '#{pane_pid}', '-s', task.session,
+             'exec ' + shlex.join(argv)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+
+    def _started(self, task, pid, child):
+        task.pid = pid
+        task.started = time.time()
+        task.queue_position = None
+        if self.journal:
+            self.journal.append('spawn', task.id, pid=pid)
+        write_text_atomic(task.pid_file, f'{pid}\n')
+        self.set_status(task, 'running')
+        self.update_project_task(task, 'running', started=task.started)
+        self.watcher.watch(task.id, pid, child=child)
+        self.log(f'Agent {task.id} started (PID: {pid})', GREEN)
+
+    def check_liveness(self):
+        """Kill agents whose heartbeat stopped or whose output stalled."""
+        now = time.time()
+        for task in self.tasks.values():
+            if task.status != 'running' or not task.pid:
+                continue
+            if task.killed_at:
+                if now - task.killed_at > KILL_GRACE:
+                    self._signal_group(task.pid, signal.SIGKILL)
+                continue
+            reason = self.watchdog.check(task.id, task.started, task.complexity, now)
+            if reason:
+                self.log(f'Watchdog: agent {task.id} {reason}; killing its process group', RED)
+                task.kill_reason = reason
+                task.killed_at = now
+                self._signal_group(task.pid, signal.SIGTERM)
+
+    def _signal_group(self, pid, sig):
+        try:
+            os.killpg(pid, sig)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+
+    def handle_exit(self, task, exit_code):
+        # `orchestrate-agents stop` marks the agent stopped before killing it
+        if agent_state.get_agent_status(task.id) == 'stopped':
+            task.status = 'stopped'
+            self.log(f'Agent {task.id} was stopped', YELLOW)
+            return
+        self.watchdog.forget(task.id)
+        if exit_code is None:
+            # Not our child (tmux, or adopted after a restart): logcap recorded it
+            exit_code = read_exit_code(task.id)
+        if self.journal:
+            self.journal.append('exit', task.id, code=exit_code)
+        if exit_code is not None:
+            agent_state.set_agent_state(task.id, 'exit_code', str(exit_code))
+
+        reason = task.kill_reason or (f'cursor-agent exited with code {exit_code}' if exit_code else None)
+        if reason:
+            self.log(f'Agent {task.id} failed: {reason}', RED)
+            agent_state.set_agent_state(task.id, 'failure_reason', reason)
+            self.set_status(task, 'failed')
+            self.update_project_task(task, 'failed', error=reason)
+            self.maybe_retry(task)
+            return
+
+        self.log(f'Agent {task.id} just completed!', GREEN)
+
+        started = task.started or self.project_tasks.get(task.id, {}).get('started')
+        if isinstance(started, (int, float)):
+            elapsed = time.time() - started
+            self.durations.record(task.estimated_hours, task.complexity, elapsed)
+            agent_state.set_agent_state(task.id, 'duration_seconds', int(elapsed))
+
+        if self.qa_enabled(task):
+            self.run_qa(task)
+        else:
+            self.set_status(task, 'completed')
+            self.update_project_task(task, 'completed', completed=time.time())
+
+    def run_qa(self, task):
+        """Queue the QA wrapper for a finished agent (run_qa_for_agent())."""
+        if not os.path.isdir(task.directory):
+            self.log(f'Error: Directory does not exist: {task.directory}', RED)
+            self.set_status(task, 'qa_failed')
+            self.update_project_task(task, 'qa_failed', qa_status='qa_failed', completed=time.time())
+            return
+
+        if not os.path.isfile(QA_WRAPPER):
+            self.log(f'Warning: QA wrapper not found at {QA_WRAPPER}', YELLOW)
+            self.log('Skipping QA validation...')
+            self.set_status(task, 'qa_skipped')
+            self.update_project_task(task, 'completed', qa_status='qa_skipped', completed=time.time())
+            return
+
+        self.qa_severity.pop(task.id, None)
+        if self.qa_pool.submit(task.id):
+            self.set_status(task, 'qa_queued')
+        self.start_qa_jobs()
+
+    def start_qa_jobs(self):
+        """Start queued QA jobs while QA slots are free."""
+        QA_DIR.mkdir(parents=True, exist_ok=True)
+        jobs = self.qa_pool.next_jobs()
+        while jobs:
+            hits = 0
+            for task_id, waited in jobs:
+                if self.qa_cache_hit(self.tasks[task_id], waited):
+                    hits += 1
+                else:
+                    self.start_qa_job(self.tasks[task_id], waited)
+            # Cache hits never took a slot; fill them from the queue
+            jobs = self.qa_pool.next_jobs() if hits else []
+
+    def qa_cache_hit(self, task, waited):
+        """Reuse a cached verdict if the worktree and QA wrapper are unchanged."""
+        task.qa_cache_key = task.qa_tree = None
+        if not self.qa_cache:
+            return False
+        task.qa_cache_key, task.qa_tree = qa_cache.cache_key(task.directory, QA_WRAPPER)
+        entry = qa_cache.lookup(task.qa_cache_key)
+        if not entry:
+            return False
+        try:
+            shutil.copyfile(entry['log_path'], task.qa_log)
+        except OSError:
+            pass
+        self.log(f'QA cache hit for agent: {task.id} (tree {task.qa_tree[:12]})', CYAN)
+        agent_state.set_agent_state(task.id, 'qa_cached', 'true')
+        self.finish_qa(task, entry['passed'], qa_cached=True, qa_queue_seconds=round(waited, 1))
+        self.unblocked.extend(self.resolve(task.id))
+        return True
+
+    def start_qa_job(self, task, waited):
+        self.log(f'Running QA for agent: {task.id}', CYAN)
+        self.log(f'  Directory: {task.directory}')
+        with open(task.qa_log, 'w') as qa_log:
+            proc = subprocess.Popen(['bash', QA_WRAPPER, task.directory],
+                                    stdin=subprocess.DEVNULL, stdout=qa_log,
+                                    stderr=subprocess.STDOUT, start_new_session=True)
+        self.qa_pool.started(task.id, proc.pid)
+        self.set_status(task, 'qa_running')
+        task.qa_queue_seconds = round(waited, 1)
+        agent_state.set_agent_state(task.id, 'qa_queue_seconds', task.qa_queue_seconds)
+        self.watcher.watch(('qa', task.id), proc.pid, child=True)
+
+    def handle_qa_exit(self, task, exit_code):
+        timings = {'qa_queue_seconds': task.qa_queue_seconds}
+        duration = self.qa_pool.finished(task.id)
+        if duration is not None:
+            timings['qa_duration_seconds'] = round(duration, 1)
+            agent_state.set_agent_state(task.id, 'qa_duration_seconds', timings['qa_duration_seconds'])
+        if task.qa_cache_key and exit_code is not None:
+            qa_cache.store(task.qa_cache_key, task.qa_tree, exit_code == 0, exit_code, task.qa_log)
+        self.finish_qa(task, exit_code == 0, **timings)
+
+    def finish_qa(self, task, passed, **fields):
+        if self.journal:
+            self.journal.append('qa', task.id, passed=passed, cached=bool(fields.get('qa_cached')))
+        if passed:
+            self.log(f'QA passed for agent: {task.id}', GREEN)
+            self.set_status(task, 'qa_passed')
+            agent_state.set_agent_state(task.id, 'qa_timestamp', time.strftime('%Y-%m-%dT%H:%M:%S%z'))
+        else:
+            self.log(f'QA failed for agent: {task.id}', RED)
+            self.log(f'  Check QA log: {task.qa_log}')
+            self.set_status(task, 'qa_failed')
+        self.update_project_task(task, task.status, qa_status=task.status, completed=time.time(), **fields)
+        if not passed:
+            self.maybe_retry(task)
+
+    def all_done(self):
+        return all(task.status in DONE_STATUSES or task.status in ('failed', 'stopped')
+                   for task in self.tasks.values())
+
+    def idle(self):
+        """Nothing running and nothing that could still start."""
+        if len(self.watcher) or self.watcher.ready or self.admission.queue or len(self.qa_pool) or len(self.retries):
+            return False
+        if any(task.status in ACTIVE_STATUSES for task in self.tasks.values()):
+            return False
+        ready = self.refresh_dependencies()
+        if ready:
+            self.schedule(ready)
+            return False
+        return True
+
+    # Daemon loop
+
+    def request_stop(self, *_):
+        self.stopping = True
+
+    def status_snapshot(self):
+        counts = {}
+        for task in self.tasks.values():
+            counts[task.status] = counts.get(task.status, 0) + 1
+        return {
+            'pid': os.getpid(),
+            'task_file': str(self.task_file),
+            'project_id': self.project_id,
+            'updated': time.time(),
+            'counts': counts,
+            'policy': self.policy,
+            'started_at': self.started_at,
+            'max_parallel': self.admission.limit(),
+            'throttled_by': self.admission.throttled_by,
+            'queue': list(self.admission.queue),
+            'qa_parallel': self.qa_pool.limit,
+            'qa_queue': list(self.qa_pool.queue),
+            'retries': {task_id: due for task_id, due in self.retries.due.items()},
+            'agents': {task.id: {'status': task.status, 'pid': task.pid} for task in self.tasks.values()},
+        }
+
+    def finish_run(self, outcome):
+        """The daemon loop is about to return: checkpoint the journal and close the trace."""
+        if self.journal:
+            self.journal.checkpoint()
+        if self.tracer:
+            self.tracer.instant('scheduler stop', outcome=outcome)
+
+    def run(self, status_file=None):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        self.log(f'Scheduling {len(self.tasks)} agents from {self.task_file}', GREEN)
+        self.log(f'Admission: {self.admission.describe()}, policy={self.policy}')
+        self.started_at = time.time()
+        if self.tracer:
+            self.tracer.instant('scheduler start', slots=self.admission.max_parallel or None,
+                                qa_slots=self.qa_pool.limit, policy=self.policy)
+        if not coord.ensure_daemon():
+            self.log('Warning: coordination daemon did not start; shared state falls back to locked files', YELLOW)
+        self.adopt_existing()
+        self.init_dependencies()
+        self.schedule()
+
+        while True:
+            if status_file:
+                write_json_atomic(status_file, self.status_snapshot())
+            if self.stopping:
+                self.log('Scheduler stopping; running agents keep running', YELLOW)
+                # Nobody would record QA verdicts; they re-run on the next start
+                for pid in self.qa_pool.pids():
+                    try:
+                        os.killpg(pid, signal.SIGTERM)
+                    except OSError:
+                        pass
+                self.finish_run('stopped')
+                return 0
+            if self.all_done():
+                makespan = (time.time() - self.started_at) / 60.0
+                self.log(f'All agents completed! (makespan {makespan:.1f}m, policy {self.policy})', GREEN)
+                self.finish_run('completed')
+                return 0
+            if self.idle():
+                blocked = ', '.join(task.id for task in self.startable())
+                self.log(f'No runnable agents left; blocked on failed or stopped dependencies: {blocked}', RED)
+                self.finish_run('blocked')
+                return 1
+
+            timeout = self.admission.recheck_interval()
+            if self.running_count():
+                # Watchdog tick
+                timeout = min(timeout or HEARTBEAT_INTERVAL, HEARTBEAT_INTERVAL)
+            next_retry = self.retries.seconds_until_next()
+            if next_retry is not None:
+                timeout = next_retry if timeout is None else min(timeout, next_retry)
+            try:
+                events = self.watcher.wait(timeout)
+            except InterruptedError:
+                continue
+            self.check_liveness()
+            candidates = []
+            for key, exit_code in events:
+                if isinstance(key, tuple):
+                    # QA job: ('qa', task_id)
+                    task = self.tasks.get(key[1])
+                    if task:
+                        self.handle_qa_exit(task, exit_code)
+                        candidates.extend(self.resolve(task.id))
+                    continue
+                task = self.tasks.get(key)
+                if task:
+                    self.handle_exit(task, exit_code)
+                    if task.status not in ACTIVE_STATUSES:
+                        candidates.extend(self.resolve(task.id))
+            self.start_qa_jobs()
+            candidates.extend(self.unblocked)
+            self.unblocked = []
+            retried = self.release_retries()
+            candidates.extend(retried)
+            if events or retried or self.admission.queue:
+                self.schedule(candidates)
+
+
+# Daemon management (used by orchestrate-agents start/monitor/status)
+
+def daemon_key(task_file):
+    task_file = Path(task_file).resolve()
+    project_id = project_id_for_task_file(task_file)
+    if project_id:
+        return project_id
+    return 'orch-' + hashlib.sha1(str(task_file).encode()).hexdigest()[:12]
+
+
+def daemon_paths(task_file):
+    key = daemon_key(task_file)
+    return {
+        'lock': SCHEDULER_DIR / f'{key}.lock',
+        'pid': SCHEDULER_DIR / f'{key}.pid',
+        'log': SCHEDULER_DIR / f'{key}.log',
+        'status': SCHEDULER_DIR / f'{key}.json',
+    }
+
+
+def running_daemon_pid(task_file):
+    """PID of the live scheduler for this task file, or 0."""
+    paths = daemon_paths(task_file)
+    pid = read_pid(paths['pid'])
+    return pid if pid_alive(pid) else 0
+
+
+def run_daemon(task_file, out=None):
+    """Run the scheduler in this process, holding the per-task-file lock."""
+    paths = daemon_paths(task_file)
+    SCHEDULER_DIR.mkdir(parents=True, exist_ok=True)
+    lock_fd = os.open(paths['lock'], os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print(f'{YELLOW}Scheduler already running for {task_file}{NC}', file=sys.stderr)
+        return 0
+    try:
+        write_text_atomic(paths['pid'], f'{os.getpid()}\n')
+        return Scheduler(task_file, out=out).run(status_file=paths['status'])
+    finally:
+        try:
+            paths['pid'].unlink()
+        except OSError:
+            pass
+        os.close(lock_fd)
+
+
+def start_daemon(task_file, wait=30.0):
+    """Launch a detached scheduler and echo its startup output."""
+    paths = daemon_paths(task_file)
+    pid = running_daemon_pid(task_file)
+    if pid:
+        print(f'{YELLOW}Scheduler already running (PID: {pid}){NC}')
+        return 0
+
+    SCHEDULER_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        paths['status'].unlink()
+    except OSError:
+        pass
+    log = open(paths['log'], 'a')
+    offset = log.tell()
+    proc = subprocess.Popen(
+        [sys.executable, str(BIN_DIR / 'auto-cursor-scheduler'), 'run', str(Path(task_file).resolve())],
+        stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+        start_new_session=True
+    )
+    log.close()
+
+    # The first status snapshot is written once the initial scheduling pass
+    # is done; show what was started up to that point.
+    deadline = time.time() + wait
+    while time.time() < deadline and not paths['status'].exists() and proc.poll() is None:
+        time.sleep(0.05)
+    with open(paths['log'], 'r', errors='ignore') as f:
+        f.seek(offset)
+        sys.stdout.write(f.read())
+    if proc.poll() not in (None, 0):
+        return proc.returncode
+    print(f'{GREEN}Scheduler running (PID: {proc.pid}). Log: {paths["log"]}{NC}')
+    return 0
+
+
+def follow_daemon(task_file):
+    """Stream the scheduler log until it exits (monitor on top of the daemon)."""
+    paths = daemon_paths(task_file)
+    pid = running_daemon_pid(task_file)
+    print(f'{CYAN}Following scheduler (PID: {pid}) for {task_file}{NC}')
+    print('Press Ctrl+C to stop monitoring')
+    print('')
+    with open(paths['log'], 'r', errors='ignore') as f:
+        f.seek(0, os.SEEK_END)
+        while True:
+            chunk = f.read()
+            if chunk:
+                sys.stdout.write(chunk)
+                sys.stdout.flush()
+            elif not pid_alive(pid):
+                return 0
+            else:
+                time.sleep(0.5)
+
+
+def show_daemons():
+    snapshots = sorted(SCHEDULER_DIR.glob('*.json')) if SCHEDULER_DIR.exists() else []
+    shown = False
+    for path in snapshots:
+        snapshot = load_json(path, {}) or {}
+        if not pid_alive(snapshot.get('pid')):
+            continue
+        shown = True
+        counts = ', '.join(f'{status}: {n}' for status, n in sorted(snapshot.get('counts', {}).items()))
+        print(f"{CYAN}Scheduler (PID: {snapshot.get('pid')}){NC} {snapshot.get('task_file')}")
+        print(f'  {counts}')
+        limit = snapshot.get('max_parallel')
+        print(f"  Slots: {limit if limit else 'unlimited'}"
+              + (f" (throttled: {'; '.join(snapshot['throttled_by'])})" if snapshot.get('throttled_by') else ''))
+        if snapshot.get('queue'):
+            queue = ', '.join(f'{task_id} (#{position})' for position, task_id in enumerate(snapshot['queue'], 1))
+            print(f'  Queue: {queue}')
+        if snapshot.get('retries'):
+            now = time.time()
+            retries = ', '.join(f'{task_id} (in {max(0, due - now):.0f}s)'
+                                for task_id, due in sorted(snapshot['retries'].items(), key=lambda item: item[1]))
+            print(f'  Retries: {retries}')
+    if not shown:
+        print('No scheduler running.')
+    return 0
+
+
+def stop_daemon(task_file):
+    pid = running_daemon_pid(task_file)
+    if not pid:
+        print('No scheduler running for this task file.')
+        return 0
+    os.kill(pid, signal.SIGTERM)
+    print(f'{GREEN}Stopped scheduler (PID: {pid}){NC}')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='auto-cursor-scheduler',
+        description='Event-driven scheduler daemon behind orchestrate-agents'
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (
+        ('run', 'Run the scheduler in the foreground'),
+        ('start', 'Start a detached scheduler for a task file'),
+        ('monitor', 'Follow a running scheduler, or run one in the foreground'),
+        ('stop', 'Stop the scheduler (agents keep running)'),
+    ):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('task_file')
+    sub.add_parser('status', help='Show running schedulers')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'status':
+        return show_daemons()
+    if not os.path.isfile(args.task_file):
+        print(f'{RED}Error: Task file not found: {args.task_file}{NC}', file=sys.stderr)
+        return 1
+    if args.command == 'run':
+        return run_daemon(args.task_file)
+    if args.command == 'start':
+        return start_daemon(args.task_file)
+    if args.command == 'monitor':
+        if running_daemon_pid(args.task_file):
+            return follow_daemon(args.task_file)
+        return run_daemon(args.task_file)
+    if args.command == 'stop':
+        return stop_daemon(args.task_file)
+    return 1
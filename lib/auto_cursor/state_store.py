@@ -0,0 +1,453 @@
+"""
+SQLite state store shared by the orchestrator and the web server
+
+Optional replacement for the read-modify-write JSON files (tasks.json,
+STATE_DIR/<id>.status, STATE_DIR/<id>.json). Enable it with
+AUTO_CURSOR_STATE_STORE=sqlite; the database defaults to
+~/.auto-cursor/state.db (override with AUTO_CURSOR_STATE_DB).
+
+The database runs in WAL mode so readers get a consistent snapshot while a
+writer commits. Every status change is one transaction that updates the
+agent row, the task row and appends to the transitions log. The JSON files
+are still written as exports so existing tools keep working.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .common import AUTO_CURSOR_DIR, STATE_DIR, write_json_atomic, write_text_atomic
+
+DEFAULT_DB_PATH = Path(os.environ.get('AUTO_CURSOR_STATE_DB', str(AUTO_CURSOR_DIR / 'state.db')))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    project_id TEXT NOT NULL,
+    task_id    TEXT NOT NULL,
+    position   INTEGER NOT NULL DEFAULT 0,
+    status     TEXT NOT NULL DEFAULT 'pending',
+    data       TEXT NOT NULL DEFAULT '{}',
+    updated    REAL NOT NULL,
+    PRIMARY KEY (project_id, task_id)
+);
+CREATE TABLE IF NOT EXISTS agents (
+    agent_id   TEXT PRIMARY KEY,
+    project_id TEXT,
+    status     TEXT NOT NULL DEFAULT 'pending',
+    pid        INTEGER,
+    log_path   TEXT,
+    updated    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    agent_id    TEXT NOT NULL,
+    project_id  TEXT,
+    from_status TEXT,
+    to_status   TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    detail      TEXT
+);
+CREATE INDEX IF NOT EXISTS transitions_agent ON transitions (agent_id, id);
+CREATE TABLE IF NOT EXISTS shared_state (
+    namespace TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    value     TEXT,
+    version   INTEGER NOT NULL DEFAULT 1,
+    updated   REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+def enabled():
+    """Return True when the SQLite store has been switched on."""
+    return os.environ.get('AUTO_CURSOR_STATE_STORE', 'files') == 'sqlite'
+
+
+class TransitionConflict(Exception):
+    """Raised when a guarded transition finds an unexpected current status."""
+
+
+class StateStore:
+    """Thin wrapper around the state database."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: we issue BEGIN ourselves so writers can take
+        # the lock up front (BEGIN IMMEDIATE) instead of failing on upgrade.
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA busy_timeout=30000')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self, write=True):
+        """
+        Run a block inside one transaction.
+
+        Args:
+            write: Take the write lock immediately (BEGIN IMMEDIATE). Read-only
+                blocks use a deferred transaction, which in WAL mode is a
+                stable snapshot for its whole duration.
+        """
+        self.conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    # Tasks
+
+    def import_tasks(self, project_id, tasks):
+        """Replace a project's task list with the given tasks.json contents."""
+        now = time.time()
+        with self.transaction() as db:
+            db.execute('DELETE FROM tasks WHERE project_id = ?', (project_id,))
+            db.executemany(
+                'INSERT INTO tasks (project_id, task_id, position, status, data, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (project_id, task.get('id', ''), position,
+                     task.get('status') or 'pending', json.dumps(task), now)
+                    for position, task in enumerate(tasks)
+                ]
+            )
+
+    def list_tasks(self, project_id, db=None):
+        """Return a project's tasks in plan order, as tasks.json entries."""
+        rows = (db or self.conn).execute(
+            'SELECT status, data FROM tasks WHERE project_id = ? ORDER BY position',
+            (project_id,)
+        ).fetchall()
+        tasks = []
+        for row in rows:
+            task = json.loads(row['data'])
+            task['status'] = row['status']
+            tasks.append(task)
+        return tasks
+
+    def has_project(self, project_id):
+        row = self.conn.execute(
+            'SELECT 1 FROM tasks WHERE project_id = ? LIMIT 1', (project_id,)
+        ).fetchone()
+        return row is not None
+
+    def update_task(self, project_id, task_id, status=None, fields=None):
+        """
+        Merge fields into one task (and optionally set its status) atomically.
+
+        Returns:
+            The updated task dict, or None if the task does not exist
+        """
+        with self.transaction() as db:
+            return self._update_task(db, project_id, task_id, status, fields)
+
+    def _update_task(self, db, project_id, task_id, status, fields):
+        row = db.execute(
+            'SELECT status, data FROM tasks WHERE project_id = ? AND task_id = ?',
+            (project_id, task_id)
+        ).fetchone()
+        if row is None:
+            return None
+        task = json.loads(row['data'])
+        task.update(fields or {})
+        task['status'] = status or task.get('status') or row['status']
+        db.execute(
+            'UPDATE tasks SET status = ?, data = ?, updated = ? WHERE project_id = ? AND task_id = ?',
+            (task['status'], json.dumps(task), time.time(), project_id, task_id)
+        )
+        return task
+
+    def update_task_statuses(self, project_id, changes):
+        """
+        Apply several guarded status changes in one transaction.
+
+        Args:
+            changes: {task_id: (expected_status, new_status)}; a task whose
+                status no longer equals expected_status is left alone
+
+        Returns:
+            List of task ids that were updated
+        """
+        updated = []
+        now = time.time()
+        with self.transaction() as db:
+            for task_id, (expected, new_status) in changes.items():
+                row = db.execute(
+                    'SELECT status, data FROM tasks WHERE project_id = ? AND task_id = ?',
+                    (project_id, task_id)
+                ).fetchone()
+                if row is None or (expected is not None and row['status'] != expected):
+                    continue
+                task = json.loads(row['data'])
+                task['status'] = new_status
+                db.execute(
+                    'UPDATE tasks SET status = ?, data = ?, updated = ? WHERE project_id = ? AND task_id = ?',
+                    (new_status, json.dumps(task), now, project_id, task_id)
+                )
+                updated.append(task_id)
+        return updated
+
+    # Agents
+
+    def get_agent_status(self, agent_id):
+        row = self.conn.execute(
+            'SELECT status FROM agents WHERE agent_id = ?', (agent_id,)
+        ).fetchone()
+        return row['status'] if row else None
+
+    def transition(self, agent_id, to_status, project_id=None, expect=None,
+                   task_fields=None, detail=None):
+        """
+        Move an agent (and its task, if project_id is given) to a new status.
+
+        The agent row, the task row and the transitions log are written in a
+        single transaction, so readers never see one without the others.
+
+        Args:
+            expect: Optional list of statuses the agent must currently be in;
+                otherwise TransitionConflict is raised and nothing changes
+            task_fields: Extra fields merged into the task (e.g. timestamps)
+
+        Returns:
+            The previous status (None if the agent was unknown)
+        """
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute(
+                'SELECT status, project_id FROM agents WHERE agent_id = ?', (agent_id,)
+            ).fetchone()
+            from_status = row['status'] if row else None
+            if expect and (from_status or 'pending') not in expect:
+                raise TransitionConflict(
+                    f'{agent_id}: expected {"/".join(expect)}, found {from_status or "pending"}'
+                )
+            project_id = project_id or (row['project_id'] if row else None)
+            db.execute(
+                'INSERT INTO agents (agent_id, project_id, status, updated) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(agent_id) DO UPDATE SET status = excluded.status, '
+                'project_id = COALESCE(excluded.project_id, agents.project_id), '
+                'updated = excluded.updated',
+                (agent_id, project_id, to_status, now)
+            )
+            db.execute(
+                'INSERT INTO transitions (agent_id, project_id, from_status, to_status, ts, detail) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (agent_id, project_id, from_status, to_status, now, detail)
+            )
+            if project_id:
+                self._update_task(db, project_id, agent_id, to_status, task_fields)
+        return from_status
+
+    def set_agent_process(self, agent_id, pid, log_path=None):
+        with self.transaction() as db:
+            db.execute(
+                'INSERT INTO agents (agent_id, status, pid, log_path, updated) '
+                "VALUES (?, 'running', ?, ?, ?) "
+                'ON CONFLICT(agent_id) DO UPDATE SET pid = excluded.pid, '
+                'log_path = COALESCE(excluded.log_path, agents.log_path), updated = excluded.updated',
+                (agent_id, pid, log_path, time.time())
+            )
+
+    def agents(self, project_id=None, db=None):
+        db = db or self.conn
+        if project_id:
+            rows = db.execute('SELECT * FROM agents WHERE project_id = ?', (project_id,)).fetchall()
+        else:
+            rows = db.execute('SELECT * FROM agents').fetchall()
+        return [dict(row) for row in rows]
+
+    def transitions(self, agent_id, limit=50):
+        rows = self.conn.execute(
+            'SELECT from_status, to_status, ts, detail FROM transitions '
+            'WHERE agent_id = ? ORDER BY id DESC LIMIT ?', (agent_id, limit)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    # Shared state
+
+    def get_state(self, namespace, key=None, db=None):
+        """Return one value, or the whole namespace as a dict when key is None."""
+        db = db or self.conn
+        if key is not None:
+            row = db.execute(
+                'SELECT value FROM shared_state WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            return row['value'] if row else None
+        rows = db.execute(
+            'SELECT key, value FROM shared_state WHERE namespace = ? ORDER BY key', (namespace,)
+        ).fetchall()
+        return {row['key']: row['value'] for row in rows}
+
+    def set_state(self, namespace, key, value):
+        """Set one key; returns the new version number."""
+        with self.transaction() as db:
+            db.execute(
+                'INSERT INTO shared_state (namespace, key, value, version, updated) VALUES (?, ?, ?, 1, ?) '
+                'ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value, '
+                'version = shared_state.version + 1, updated = excluded.updated',
+                (namespace, key, value, time.time())
+            )
+            row = db.execute(
+                'SELECT version FROM shared_state WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            return row['version']
+
+    def delete_state(self, namespace, key):
+        """Remove one key; returns True if it existed."""
+        with self.transaction() as db:
+            cursor = db.execute('DELETE FROM shared_state WHERE namespace = ? AND key = ?', (namespace, key))
+            return cursor.rowcount > 0
+
+    # Snapshots and exports
+
+    def snapshot(self, project_id):
+        """Read tasks, agents and their shared state from one consistent snapshot."""
+        with self.transaction(write=False) as db:
+            tasks = self.list_tasks(project_id, db=db)
+            agents = self.agents(project_id, db=db)
+            state = {task.get('id'): self.get_state(task.get('id'), db=db) for task in tasks}
+        return {'project_id': project_id, 'tasks': tasks, 'agents': agents, 'state': state}
+
+    def export_tasks(self, project_id, path):
+        """Write the project's tasks back out as tasks.json (atomic)."""
+        write_json_atomic(path, self.list_tasks(project_id))
+
+    def export_agent_files(self, agent_id, state_dir=None):
+        """Mirror an agent into STATE_DIR/<id>.status and STATE_DIR/<id>.json."""
+        state_dir = Path(state_dir or STATE_DIR)
+        status = self.get_agent_status(agent_id)
+        if status:
+            write_text_atomic(state_dir / f'{agent_id}.status', status + '\n')
+        write_json_atomic(state_dir / f'{agent_id}.json', self.get_state(agent_id))
+
+
+def _parse_field(text):
+    """Parse key=value where value is JSON if it parses, else a string."""
+    key, _, raw = text.partition('=')
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    return key, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='auto-cursor-state',
+        description='Query and update the Auto-Cursor SQLite state store'
+    )
+    parser.add_argument('--db', help='Database path (default: %(default)s)', default=str(DEFAULT_DB_PATH))
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('init', help='Create the database')
+
+    p = sub.add_parser('import-tasks', help='Load a tasks.json into the store')
+    p.add_argument('project_id')
+    p.add_argument('tasks_file')
+
+    p = sub.add_parser('export-tasks', help='Write the store back out as tasks.json')
+    p.add_argument('project_id')
+    p.add_argument('tasks_file')
+
+    p = sub.add_parser('update-task', help='Atomically update one task')
+    p.add_argument('project_id')
+    p.add_argument('task_id')
+    p.add_argument('--status')
+    p.add_argument('--field', action='append', default=[], metavar='KEY=VALUE')
+    p.add_argument('--now', action='append', default=[], metavar='KEY',
+                   help='Set KEY to the current epoch time')
+    p.add_argument('--export', metavar='TASKS_FILE')
+
+    p = sub.add_parser('transition', help='Change an agent status in one transaction')
+    p.add_argument('agent_id')
+    p.add_argument('status')
+    p.add_argument('--project')
+    p.add_argument('--expect', action='append', default=[])
+    p.add_argument('--detail')
+    p.add_argument('--mirror', metavar='STATE_DIR', help='Also write the .status/.json exports')
+
+    p = sub.add_parser('status', help='Print an agent status')
+    p.add_argument('agent_id')
+
+    p = sub.add_parser('get-state', help='Print shared state (one key or the whole namespace)')
+    p.add_argument('namespace')
+    p.add_argument('key', nargs='?')
+
+    p = sub.add_parser('set-state', help='Set a shared state key')
+    p.add_argument('namespace')
+    p.add_argument('key')
+    p.add_argument('value')
+    p.add_argument('--mirror', metavar='STATE_DIR', help='Also rewrite STATE_DIR/<namespace>.json')
+
+    p = sub.add_parser('snapshot', help='Print a consistent JSON snapshot of a project')
+    p.add_argument('project_id')
+
+    p = sub.add_parser('history', help='Print the transition history of an agent')
+    p.add_argument('agent_id')
+
+    args = parser.parse_args(argv)
+    store = StateStore(args.db)
+
+    try:
+        if args.command == 'init':
+            print(store.path)
+        elif args.command == 'import-tasks':
+            with open(args.tasks_file, 'r') as f:
+                store.import_tasks(args.project_id, json.load(f))
+        elif args.command == 'export-tasks':
+            store.export_tasks(args.project_id, args.tasks_file)
+        elif args.command == 'update-task':
+            fields = dict(_parse_field(item) for item in args.field)
+            now = time.time()
+            fields.update({key: now for key in args.now})
+            if store.update_task(args.project_id, args.task_id, args.status, fields) is None:
+                print(f'Error: Task not found: {args.task_id}', file=sys.stderr)
+                return 1
+            if args.export:
+                store.export_tasks(args.project_id, args.export)
+        elif args.command == 'transition':
+            try:
+                store.transition(args.agent_id, args.status, project_id=args.project,
+                                 expect=args.expect or None, detail=args.detail)
+            except TransitionConflict as e:
+                print(f'Error: {e}', file=sys.stderr)
+                return 2
+            if args.mirror:
+                store.export_agent_files(args.agent_id, args.mirror)
+        elif args.command == 'status':
+            status = store.get_agent_status(args.agent_id)
+            if status:
+                print(status)
+        elif args.command == 'get-state':
+            value = store.get_state(args.namespace, args.key)
+            if args.key is None:
+                print(json.dumps(value, indent=2))
+            elif value is not None:
+                print(value)
+        elif args.command == 'set-state':
+            store.set_state(args.namespace, args.key, args.value)
+            if args.mirror:
+                write_json_atomic(Path(args.mirror) / f'{args.namespace}.json',
+                                  store.get_state(args.namespace))
+        elif args.command == 'snapshot':
+            print(json.dumps(store.snapshot(args.project_id), indent=2))
+        elif args.command == 'history':
+            for entry in store.transitions(args.agent_id):
+                print(f"{entry['ts']:.3f} {entry['from_status'] or '-'} -> {entry['to_status']}")
+    finally:
+        store.close()
+    return 0
@@ -0,0 +1,443 @@
+"""
+Cross-project task retrieval index
+
+auto-cursor-planner only injected the current project's memory.json (at most
+ten successful_patterns), so what hundreds of other projects in
+PROJECTS_DIR learned was never used, and reading every tasks.json on each
+plan would be too slow.
+
+This index holds every finished task across all projects: description,
+directory, complexity, outcome (status and QA verdict), estimated hours and
+actual duration. It is an SQLite FTS5 index (MEMORY_DIR/task-index.db,
+override with AUTO_CURSOR_TASK_INDEX_DB), like the log index: a query reads
+only the postings of its own terms and ranks them with FTS5's bm25(), and an
+update rewrites only the changed tasks' rows in a short per-project
+transaction instead of the whole index. SQLite builds without FTS5 keep the
+terms in a plain table instead, and a query scans the rows that contain any
+of its words (LIKE) and ranks them with the same BM25 in Python: slower on a
+large index, but retrieval keeps working.
+
+Updates are incremental: each project's tasks.json size and mtime are
+recorded, and update() re-reads only projects whose tasks.json changed.
+Documents are keyed by project, task id and creation time, so re-planning a
+project adds its new tasks without dropping the old ones. Task completion
+events update the index for their project (auto-cursor-memory update), and
+queries refresh changed projects first as long as that fits in half of the
+latency budget (AUTO_CURSOR_RETRIEVAL_BUDGET_MS, default 300); a query never
+waits behind another process's update.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from .common import MEMORY_DIR, PROJECTS_DIR, load_json
+
+DEFAULT_DB_PATH = Path(os.environ.get('AUTO_CURSOR_TASK_INDEX_DB', str(MEMORY_DIR / 'task-index.db')))
+BUDGET_MS = float(os.environ.get('AUTO_CURSOR_RETRIEVAL_BUDGET_MS', '300'))
+DEFAULT_TOP_K = 5
+
+# Finished tasks worth learning from, successes and failures alike
+INDEXED_STATUSES = ('completed', 'qa_passed', 'qa_failed', 'failed')
+
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''
+a an and are as at be by for from in into is it of on or that the this to with
+'''.split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_id  TEXT PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL,
+    size        INTEGER NOT NULL,
+    updated     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id          INTEGER PRIMARY KEY,
+    key         TEXT NOT NULL UNIQUE,
+    project_id  TEXT NOT NULL,
+    doc         TEXT NOT NULL
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(
+    text,
+    project_id UNINDEXED,
+    tokenize = 'unicode61'
+);
+"""
+
+# Without FTS5: the same rows in a plain table, with each text's term count
+SCAN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_terms (
+    rowid       INTEGER PRIMARY KEY,
+    text        TEXT NOT NULL,
+    project_id  TEXT NOT NULL,
+    length      INTEGER NOT NULL
+);
+"""
+
+# FTS5's bm25() parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def fts_query(text):
+    """Any of the text's words, quoted so FTS operators in a goal are not interpreted."""
+    return ' OR '.join(f'"{t}"' for t in dict.fromkeys(tokenize(text)))
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def task_document(project_id, task):
+    """
+    Returns:
+        dict: The indexed fields of a finished task, or None
+    """
+    if task.get('status') not in INDEXED_STATUSES or not isinstance(task.get('description'), str):
+        return None
+    started, completed = _number(task.get('started')), _number(task.get('completed'))
+    duration = round((completed - started) / 3600, 2) if started and completed and completed >= started else None
+    return {
+        'key': f"{project_id}/{task.get('id')}/{task.get('created', '')}",
+        'project': project_id,
+        'task': task.get('id'),
+        'description': task['description'],
+        'directory': task.get('directory') or '',
+        'complexity': task.get('complexity') or '',
+        'status': task['status'],
+        'qa_status': task.get('qa_status'),
+        'estimated_hours': _number(task.get('estimated_hours')),
+        'actual_hours': duration,
+    }
+
+
+def _document_text(doc):
+    return ' '.join(tokenize(' '.join((doc['description'], doc['directory'].replace('/', ' ')))))
+
+
+def _stamp(path):
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class TaskIndex:
+    """BM25 index over finished tasks."""
+
+    def __init__(self, path=None, busy_timeout_ms=30000):
+        self.path = Path(path or DEFAULT_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=busy_timeout_ms / 1000, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5
+            self.conn.executescript(SCAN_SCHEMA)
+            self.fts = False
+        else:
+            self._adopt_scan_terms()
+        self.terms = 'terms' if self.fts else 'scan_terms'
+
+    def _adopt_scan_terms(self):
+        """Move terms written by an SQLite without FTS5 into the FTS5 table."""
+        if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'scan_terms'").fetchone():
+            return
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute('INSERT OR REPLACE INTO terms (rowid, text, project_id) '
+                              'SELECT rowid, text, project_id FROM scan_terms')
+            self.conn.execute('DROP TABLE scan_terms')
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def _set_terms(self, rowid, doc, insert):
+        text = _document_text(doc)
+        if not self.fts:
+            self.conn.execute('INSERT OR REPLACE INTO scan_terms (rowid, text, project_id, length) '
+                              'VALUES (?, ?, ?, ?)', (rowid, text, doc['project'], len(text.split())))
+        elif insert:
+            self.conn.execute('INSERT INTO terms (rowid, text, project_id) VALUES (?, ?, ?)',
+                              (rowid, text, doc['project']))
+        else:
+            self.conn.execute('UPDATE terms SET text = ? WHERE rowid = ?', (text, rowid))
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, doc):
+        """Add or refresh a document (inside a transaction). Returns True if the index changed."""
+        data = json.dumps(doc, sort_keys=True)
+        row = self.conn.execute('SELECT id, doc FROM docs WHERE key = ?', (doc['key'],)).fetchone()
+        if row is None:
+            cursor = self.conn.execute('INSERT INTO docs (key, project_id, doc) VALUES (?, ?, ?)',
+                                       (doc['key'], doc['project'], data))
+            self._set_terms(cursor.lastrowid, doc, insert=True)
+            return True
+        if row['doc'] == data:
+            return False
+        self.conn.execute('UPDATE docs SET doc = ? WHERE id = ?', (data, row['id']))
+        old = json.loads(row['doc'])
+        if (old['description'], old['directory']) != (doc['description'], doc['directory']):
+            self._set_terms(row['id'], doc, insert=False)
+        return True
+
+    def index_project(self, project_id, stamp=None):
+        """
+        (Re-)index one project's finished tasks in one transaction.
+
+        Returns:
+            int: Documents added or refreshed
+        """
+        tasks_file = PROJECTS_DIR / project_id / 'tasks.json'
+        if stamp is None:
+            stamp = _stamp(tasks_file)
+        tasks = load_json(tasks_file, [])
+        changed = 0
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            for task in tasks if isinstance(tasks, list) else []:
+                doc = task_document(project_id, task) if isinstance(task, dict) else None
+                if doc and self.add(doc):
+                    changed += 1
+            if stamp is not None:
+                self.conn.execute(
+                    'INSERT INTO projects (project_id, mtime_ns, size, updated) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(project_id) DO UPDATE SET mtime_ns = excluded.mtime_ns, '
+                    'size = excluded.size, updated = excluded.updated',
+                    (project_id, stamp[0], stamp[1], time.time()))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return changed
+
+    def update(self, project_ids=None, deadline=None):
+        """
+        Re-index projects whose tasks.json changed since they were indexed.
+
+        Args:
+            project_ids: Only these projects (default: every project)
+            deadline: time.monotonic() value to stop at; the rest wait for
+                the next update
+
+        Returns:
+            int: Documents added or refreshed
+        """
+        if project_ids is None:
+            try:
+                project_ids = sorted(p.name for p in PROJECTS_DIR.iterdir() if p.is_dir())
+            except OSError:
+                project_ids = []
+        indexed = {row['project_id']: (row['mtime_ns'], row['size'])
+                   for row in self.conn.execute('SELECT project_id, mtime_ns, size FROM projects')}
+        changed = 0
+        for project_id in project_ids:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            stamp = _stamp(PROJECTS_DIR / project_id / 'tasks.json')
+            if stamp is None or indexed.get(project_id) == stamp:
+                continue
+            changed += self.index_project(project_id, stamp)
+        return changed
+
+    def rebuild(self):
+        """Drop the index and index every project from scratch."""
+        self.conn.execute('BEGIN IMMEDIATE')
+        for table in (self.terms, 'docs', 'projects'):
+            self.conn.execute(f'DELETE FROM {table}')
+        self.conn.execute('COMMIT')
+        return self.update()
+
+    def query(self, text, top_k=DEFAULT_TOP_K, exclude_project=None):
+        """
+        BM25 search (FTS5 bm25(), k1 1.2, b 0.75) for documents sharing any
+        word with text.
+
+        Returns:
+            list: (score, document) pairs, best first
+        """
+        if not self.fts:
+            return self._scan_query(text, top_k, exclude_project)
+        match = fts_query(text)
+        if not match:
+            return []
+        sql = ('SELECT docs.doc, bm25(terms) AS score FROM terms JOIN docs ON docs.id = terms.rowid '
+               'WHERE terms MATCH ?')
+        params = [match]
+        if exclude_project:
+            sql += ' AND terms.project_id != ?'
+            params.append(exclude_project)
+        # bm25() is negative, best match lowest
+        sql += ' ORDER BY score, terms.rowid LIMIT ?'
+        params.append(top_k)
+        return [(round(-row['score'], 3), json.loads(row['doc'])) for row in self.conn.execute(sql, params)]
+
+    def _scan_query(self, text, top_k, exclude_project):
+        """query() without FTS5: LIKE scan for the words, BM25 in Python."""
+        words = list(dict.fromkeys(tokenize(text)))
+        if not words:
+            return []
+        total, average = self.conn.execute('SELECT COUNT(*), AVG(length) FROM scan_terms').fetchone()
+        if not total:
+            return []
+        # Tokens are [a-z0-9]+, so they need no LIKE escaping
+        sql = ('SELECT rowid, text FROM scan_terms WHERE '
+               + ' OR '.join("' ' || text || ' ' LIKE ?" for _ in words))
+        candidates = [(row['rowid'], row['text'].split())
+                      for row in self.conn.execute(sql, [f'% {word} %' for word in words])]
+        # Every row holding a word is a candidate, so these are the index-wide frequencies
+        frequency = {word: sum(1 for _, terms in candidates if word in terms) for word in words}
+        scored = []
+        for rowid, terms in candidates:
+            score = 0.0
+            for word in words:
+                count = terms.count(word)
+                if count:
+                    # Floored like FTS5's, for words in over half of the tasks
+                    idf = max(math.log((total - frequency[word] + 0.5) / (frequency[word] + 0.5)), 1e-6)
+                    score += idf * count * (K1 + 1) / (count + K1 * (1 - B + B * len(terms) / (average or 1)))
+            scored.append((score, rowid))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        hits = []
+        for score, rowid in scored:
+            row = self.conn.execute('SELECT project_id, doc FROM docs WHERE id = ?', (rowid,)).fetchone()
+            if row is None or row['project_id'] == exclude_project:
+                continue
+            hits.append((round(score, 3), json.loads(row['doc'])))
+            if len(hits) == top_k:
+                break
+        return hits
+
+    def stats(self):
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        return {
+            'tasks': self.conn.execute('SELECT COUNT(*) FROM docs').fetchone()[0],
+            'projects': self.conn.execute('SELECT COUNT(*) FROM projects').fetchone()[0],
+            'db_bytes': size,
+        }
+
+
+def update(project_ids=None, deadline=None):
+    """Incrementally update the on-disk index. Returns the number of changed documents."""
+    index = TaskIndex()
+    try:
+        return index.update(project_ids, deadline)
+    finally:
+        index.close()
+
+
+def search(text, top_k=DEFAULT_TOP_K, budget_ms=BUDGET_MS, refresh=True, exclude_project=None):
+    """
+    Top-k similar past tasks within a latency budget. Half of the budget may
+    go to refreshing changed projects, the rest to the query.
+
+    Returns:
+        list: (score, document) pairs, best first
+    """
+    started = time.monotonic()
+    # Wait at most half of the budget for another process's update
+    index = TaskIndex(busy_timeout_ms=budget_ms / 2)
+    try:
+        if refresh:
+            try:
+                index.update(deadline=started + budget_ms / 2000)
+            except sqlite3.OperationalError:
+                # Locked by a long update; query the index as it is
+                pass
+        return index.query(text, top_k, exclude_project)
+    finally:
+        index.close()
+
+
+def format_hit(score, doc):
+    outcome = doc['status']
+    if doc.get('qa_status') and doc['qa_status'] != doc['status']:
+        outcome += f", QA {doc['qa_status']}"
+    details = [outcome]
+    if doc.get('complexity'):
+        details.append(doc['complexity'])
+    if doc.get('estimated_hours') is not None:
+        details.append(f"estimated {doc['estimated_hours']:g}h")
+    if doc.get('actual_hours') is not None:
+        details.append(f"took {doc['actual_hours']:g}h")
+    if doc.get('directory'):
+        details.append(f"in {doc['directory']}")
+    return f"- [{doc['project']}] {doc['description']} ({', '.join(details)})"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-task-index',
+                                     description='Cross-project retrieval index of finished tasks')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('update', help='Index projects whose tasks changed')
+    p.add_argument('project_ids', nargs='*', help='Only these projects (default: all)')
+
+    p = sub.add_parser('query', help='Print the past tasks most similar to a goal')
+    p.add_argument('text')
+    p.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    p.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    p.add_argument('--no-refresh', action='store_true', help='Query the index as it is')
+    p.add_argument('--exclude-project')
+    p.add_argument('--json', action='store_true')
+
+    sub.add_parser('rebuild', help='Re-index every project from scratch')
+
+    sub.add_parser('stats', help='Show index size')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'update':
+        print(f'Updated {update(args.project_ids or None)} documents')
+    elif args.command == 'rebuild':
+        index = TaskIndex()
+        try:
+            index.rebuild()
+            stats = index.stats()
+        finally:
+            index.close()
+        print(f"Indexed {stats['tasks']} tasks from {stats['projects']} projects")
+    elif args.command == 'query':
+        hits = search(args.text, args.top_k, args.budget_ms, not args.no_refresh, args.exclude_project)
+        if args.json:
+            print(json.dumps([dict(doc, score=score) for score, doc in hits], indent=2))
+        else:
+            for score, doc in hits:
+                print(format_hit(score, doc))
+    elif args.command == 'stats':
+        index = TaskIndex()
+        try:
+            print(json.dumps(index.stats(), indent=2))
+        finally:
+            index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,438 @@
+"""
+Run timeline tracing
+
+`auto-cursor trace-summary` promised concurrency analysis, but nothing
+recorded when each task spawned, ran, waited on dependencies, ran QA or
+merged (the command it dispatched to didn't exist). The scheduler and the
+CLI now append trace events to PROJECTS_DIR/<project>/trace.jsonl, one JSON
+object per line in Chrome trace-event form:
+
+- B/E (begin/end) events for task phases, tagged with the task id and a
+  lane: agent runs on "Agent slots" (the slot the agent occupied), QA on
+  "QA slots", and per-task lanes under "Tasks" for time spent blocked on
+  dependencies, queued for a slot, spawning, queued for QA and in retry
+  backoff
+- spans for worktree provisioning (per worker) and merges under
+  "Integration"
+- instant events when the scheduler starts and stops, carrying its slot
+  count
+
+`auto-cursor-trace export` writes Chrome trace JSON for Perfetto
+(ui.perfetto.dev) or chrome://tracing; `summary` reports wall-clock time,
+slot utilization, idle slot time (and how much of it passed while tasks were
+blocked on dependencies) and per-phase totals. `auto-cursor start` starts a
+new trace and keeps the previous one as trace.prev.jsonl; `continue`
+appends. AUTO_CURSOR_TRACE=off disables tracing.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from .common import PROJECTS_DIR
+
+TRACE_FILE = 'trace.jsonl'
+
+# Chrome trace "processes", i.e. timeline groups
+AGENT_SLOTS = 1
+QA_SLOTS = 2
+TASKS = 3
+INTEGRATION = 4
+GROUP_NAMES = {AGENT_SLOTS: 'Agent slots', QA_SLOTS: 'QA slots', TASKS: 'Tasks', INTEGRATION: 'Integration'}
+
+# Task status (or launch step) -> (phase name, timeline group)
+PHASES = {
+    'waiting': ('blocked on dependencies', TASKS),
+    'queued': ('queued for a slot', TASKS),
+    'spawn': ('spawn', TASKS),
+    'running': ('run', AGENT_SLOTS),
+    'qa_queued': ('QA queue', TASKS),
+    'qa_running': ('QA', QA_SLOTS),
+    'retry_wait': ('retry backoff', TASKS),
+}
+
+
+def enabled():
+    return os.environ.get('AUTO_CURSOR_TRACE', '').lower() not in ('off', '0', 'false', 'no')
+
+
+def trace_path(project_id):
+    return PROJECTS_DIR / project_id / TRACE_FILE
+
+
+def _now_us():
+    return int(time.time() * 1_000_000)
+
+
+class Tracer:
+    """Appends events to one trace file; errors never reach the caller."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def emit(self, event):
+        line = (json.dumps(event, separators=(',', ':')) + '\n').encode()
+        with self.lock:
+            try:
+                # One write() on an O_APPEND descriptor, so concurrent writers don't interleave lines
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+
+    def begin(self, name, group, lane, task=None, ts=None, **args):
+        self.emit({'ph': 'B', 'name': name, 'pid': group, 'tid': lane, 'ts': ts or _now_us(),
+                   'args': dict(args, task=task) if task else args})
+
+    def end(self, name, group, lane, task=None, ts=None, **args):
+        self.emit({'ph': 'E', 'name': name, 'pid': group, 'tid': lane, 'ts': ts or _now_us(),
+                   'args': dict(args, task=task) if task else args})
+
+    def complete(self, name, group, lane, start, end, task=None, **args):
+        """A finished span; start and end are time.time() values."""
+        self.emit({'ph': 'X', 'name': name, 'pid': group, 'tid': lane, 'ts': int(start * 1_000_000),
+                   'dur': max(0, int((end - start) * 1_000_000)),
+                   'args': dict(args, task=task) if task else args})
+
+    def instant(self, name, **args):
+        self.emit({'ph': 'i', 's': 'g', 'name': name, 'pid': TASKS, 'tid': 0, 'ts': _now_us(), 'args': args})
+
+
+class TaskTracer(Tracer):
+    """
+    Turns the scheduler's status changes into phase spans: each change ends
+    the task's current phase and begins the next, and agent and QA runs get
+    the lowest free slot of their group.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.current = {}       # task id -> (name, group, lane)
+        self.slots = {AGENT_SLOTS: {}, QA_SLOTS: {}}
+
+    def _lane(self, group, task_id, index):
+        if group == TASKS:
+            return index + 1
+        taken = set(self.slots[group].values())
+        lane = next(n for n in range(1, len(taken) + 2) if n not in taken)
+        self.slots[group][task_id] = lane
+        return lane
+
+    def phase(self, task_id, index, status):
+        """The task entered status (or 'spawn'); statuses without a phase just end the current one."""
+        ts = _now_us()
+        previous = self.current.pop(task_id, None)
+        if previous:
+            name, group, lane = previous
+            if (name, group) == PHASES.get(status):
+                self.current[task_id] = previous
+                return
+            self.end(name, group, lane, task_id, ts)
+            self.slots.get(group, {}).pop(task_id, None)
+        if status in PHASES:
+            name, group = PHASES[status]
+            lane = self._lane(group, task_id, index)
+            self.current[task_id] = (name, group, lane)
+            self.begin(name, group, lane, task_id, ts)
+
+
+def start_new_trace(project_id):
+    """Keep the previous run's trace as trace.prev.jsonl and start an empty one."""
+    path = trace_path(project_id)
+    if path.exists():
+        os.replace(path, path.with_name('trace.prev.jsonl'))
+
+
+def read_events(path):
+    events = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(event, dict) and 'ts' in event:
+                    events.append(event)
+    except OSError:
+        pass
+    events.sort(key=lambda e: e['ts'])
+    return events
+
+
+def spans(events):
+    """
+    Pair begin/end events into spans. A phase left open (the scheduler
+    stopped or was restarted) ends at the task's next event, or at the end
+    of the trace.
+
+    Returns:
+        list: dicts with name, group, lane, task, start and end (µs)
+    """
+    result = []
+    open_spans = {}     # (task,) or, for spans without a task, (group, lane, name) -> begin event
+    last_ts = events[-1]['ts'] if events else 0
+
+    def key(event):
+        task = event.get('args', {}).get('task')
+        return (task,) if task else (event['pid'], event['tid'], event['name'])
+
+    def close(begin, ts):
+        result.append({'name': begin['name'], 'group': begin['pid'], 'lane': begin['tid'],
+                       'task': begin.get('args', {}).get('task'), 'start': begin['ts'], 'end': ts})
+
+    for event in events:
+        if event['ph'] == 'X':
+            result.append({'name': event['name'], 'group': event['pid'], 'lane': event['tid'],
+                           'task': event.get('args', {}).get('task'), 'start': event['ts'],
+                           'end': event['ts'] + event.get('dur', 0)})
+        elif event['ph'] == 'B':
+            previous = open_spans.pop(key(event), None)
+            if previous:
+                close(previous, event['ts'])
+            open_spans[key(event)] = event
+        elif event['ph'] == 'E':
+            begin = open_spans.get(key(event))
+            if begin and begin['name'] == event['name']:
+                del open_spans[key(event)]
+                close(begin, event['ts'])
+    for begin in open_spans.values():
+        close(begin, last_ts)
+    return result
+
+
+def chrome_trace(events, project_id=None):
+    """
+    Returns:
+        dict: Chrome trace-event JSON (complete events, timestamps relative
+            to the first event)
+    """
+    origin = events[0]['ts'] if events else 0
+    trace = []
+    lanes = set()
+    task_names = {}
+    for span in spans(events):
+        if span['group'] == TASKS and span['task']:
+            task_names[span['lane']] = span['task']
+        lanes.add((span['group'], span['lane']))
+        args = {'task': span['task']} if span['task'] else {}
+        name = f"{span['name']} {span['task']}" if span['task'] and span['group'] != TASKS else span['name']
+        trace.append({'ph': 'X', 'name': name, 'cat': span['name'], 'pid': span['group'], 'tid': span['lane'],
+                      'ts': span['start'] - origin, 'dur': span['end'] - span['start'], 'args': args})
+    for event in events:
+        if event['ph'] == 'i':
+            trace.append(dict(event, ts=event['ts'] - origin))
+    for group, name in GROUP_NAMES.items():
+        trace.append({'ph': 'M', 'name': 'process_name', 'pid': group, 'tid': 0, 'args': {'name': name}})
+        trace.append({'ph': 'M', 'name': 'process_sort_index', 'pid': group, 'tid': 0, 'args': {'sort_index': group}})
+    for group, lane in sorted(lanes):
+        if group == AGENT_SLOTS:
+            label = f'slot {lane}'
+        elif group == QA_SLOTS:
+            label = f'QA slot {lane}'
+        elif group == TASKS:
+            label = task_names.get(lane, f'task {lane}')
+        else:
+            label = 'merges' if lane == 0 else f'worktree worker {lane}'
+        trace.append({'ph': 'M', 'name': 'thread_name', 'pid': group, 'tid': lane, 'args': {'name': label}})
+    metadata = {'project': project_id} if project_id else {}
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms', 'otherData': metadata}
+
+
+def summarize(events):
+    """
+    Returns:
+        dict: wall clock, slot utilization, idle slot time and phase totals
+            (seconds)
+    """
+    all_spans = spans(events)
+    if not all_spans:
+        return None
+    start = min(s['start'] for s in all_spans)
+    end = max(s['end'] for s in all_spans)
+
+    runs = [s for s in all_spans if s['group'] == AGENT_SLOTS]
+    starts = [e for e in events if e['ph'] == 'i' and e['name'] == 'scheduler start']
+    configured = max((e.get('args', {}).get('slots') or 0 for e in starts), default=0)
+
+    # Sweep over the scheduling window: running agents, tasks blocked on
+    # dependencies and tasks queued for a slot at each moment
+    changes = []
+    for span in all_spans:
+        kind = {'run': 'running', 'spawn': 'running', 'blocked on dependencies': 'blocked',
+                'queued for a slot': 'queued'}.get(span['name'])
+        if kind and span['end'] > span['start']:
+            changes.append((span['start'], kind, 1))
+            changes.append((span['end'], kind, -1))
+    changes.sort(key=lambda c: (c[0], c[2]))
+    window_start = min((e['ts'] for e in starts), default=min((c[0] for c in changes), default=start))
+    window_end = max((s['end'] for s in runs), default=window_start)
+    counts = {'running': 0, 'blocked': 0, 'queued': 0}
+    peak = 0
+    busy = 0.0
+    for ts, kind, delta in changes:
+        counts[kind] += delta
+        peak = max(peak, counts['running'])
+    slots = configured or peak
+
+    idle = idle_blocked = idle_queued = 0.0
+    counts = {'running': 0, 'blocked': 0, 'queued': 0}
+    previous = window_start
+    for ts, kind, delta in changes + [(window_end, None, 0)]:
+        ts = min(max(ts, window_start), window_end)
+        dt = (ts - previous) / 1e6
+        if dt > 0:
+            free = max(0, slots - counts['running'])
+            busy += min(slots, counts['running']) * dt
+            idle += free * dt
+            if counts['queued']:
+                idle_queued += free * dt
+            elif counts['blocked']:
+                idle_blocked += free * dt
+            previous = ts
+        if kind:
+            counts[kind] += delta
+
+    totals = {}
+    per_task = {}
+    for span in all_spans:
+        seconds = (span['end'] - span['start']) / 1e6
+        totals[span['name']] = totals.get(span['name'], 0.0) + seconds
+        if span['name'] == 'blocked on dependencies' and span['task']:
+            per_task[span['task']] = per_task.get(span['task'], 0.0) + seconds
+    per_slot = {}
+    for span in runs:
+        per_slot[span['lane']] = per_slot.get(span['lane'], 0.0) + (span['end'] - span['start']) / 1e6
+    window = max(0.0, (window_end - window_start) / 1e6)
+    return {
+        'wall_seconds': round((end - start) / 1e6, 3),
+        'scheduling_seconds': round(window, 3),
+        'slots': slots,
+        'peak_running': peak,
+        'average_running': round(busy / window, 2) if window else 0.0,
+        'slot_busy_seconds': round(busy, 3),
+        'slot_idle_seconds': round(idle, 3),
+        'idle_while_blocked_seconds': round(idle_blocked, 3),
+        'idle_while_queued_seconds': round(idle_queued, 3),
+        'phase_seconds': {name: round(seconds, 3) for name, seconds in sorted(totals.items())},
+        'blocked_by_task': {task: round(seconds, 3) for task, seconds in
+                            sorted(per_task.items(), key=lambda item: -item[1])},
+        'slot_busy': {str(lane): round(seconds, 3) for lane, seconds in sorted(per_slot.items())},
+    }
+
+
+def _duration(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f'{seconds // 3600}h {seconds % 3600 // 60:02d}m'
+    if seconds >= 60:
+        return f'{seconds // 60}m {seconds % 60:02d}s'
+    return f'{seconds}s'
+
+
+def format_summary(project_id, summary):
+    lines = [f'=== Trace Summary: {project_id} ===', '']
+    window = summary['scheduling_seconds']
+    lines.append(f"Wall clock: {_duration(summary['wall_seconds'])} "
+                 f"(scheduling window {_duration(window)})")
+    lines.append(f"Agent slots: {summary['slots']} (peak {summary['peak_running']} running, "
+                 f"average {summary['average_running']:g})")
+    capacity = summary['slot_busy_seconds'] + summary['slot_idle_seconds']
+    if capacity:
+        lines.append(f"Slot time: {_duration(summary['slot_busy_seconds'])} busy, "
+                     f"{_duration(summary['slot_idle_seconds'])} idle "
+                     f"({summary['slot_idle_seconds'] * 100 / capacity:.0f}% of slot time)")
+        lines.append(f"  idle while tasks were blocked on dependencies: "
+                     f"{_duration(summary['idle_while_blocked_seconds'])}")
+        lines.append(f"  idle while tasks were queued for admission: "
+                     f"{_duration(summary['idle_while_queued_seconds'])}")
+    for lane, seconds in summary['slot_busy'].items():
+        share = f' ({seconds * 100 / window:.0f}%)' if window else ''
+        lines.append(f'  slot {lane}: {_duration(seconds)} busy{share}')
+    lines.append('')
+    lines.append('Time by phase (summed over tasks):')
+    for name, seconds in summary['phase_seconds'].items():
+        lines.append(f'  {name:<24} {_duration(seconds)}')
+    if summary['blocked_by_task']:
+        lines.append('')
+        lines.append('Longest blocked on dependencies:')
+        for task, seconds in list(summary['blocked_by_task'].items())[:5]:
+            lines.append(f'  {task:<24} {_duration(seconds)}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-trace', description='Run timeline traces')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('summary', help='Idle slot time, dependency waits and phase totals')
+    p.add_argument('project_id')
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('export', help='Write Chrome trace-event JSON (open in ui.perfetto.dev)')
+    p.add_argument('project_id')
+    p.add_argument('-o', '--output', help='Output file (default: stdout)')
+
+    p = sub.add_parser('begin', help='Begin a span (for shell scripts)')
+    p.add_argument('project_id')
+    p.add_argument('name')
+    p.add_argument('--task')
+    p.add_argument('--lane', type=int, default=0)
+
+    p = sub.add_parser('end', help='End a span begun with begin')
+    p.add_argument('project_id')
+    p.add_argument('name')
+    p.add_argument('--task')
+    p.add_argument('--lane', type=int, default=0)
+
+    p = sub.add_parser('new', help="Start a new trace, keeping the previous run's")
+    p.add_argument('project_id')
+
+    args = parser.parse_args(argv)
+
+    if not (PROJECTS_DIR / args.project_id).is_dir():
+        print(f'Error: Project not found: {args.project_id}', file=sys.stderr)
+        return 1
+    path = trace_path(args.project_id)
+
+    if args.command in ('begin', 'end'):
+        if enabled():
+            tracer = Tracer(path)
+            getattr(tracer, args.command)(args.name, INTEGRATION, args.lane, args.task)
+        return 0
+    if args.command == 'new':
+        start_new_trace(args.project_id)
+        return 0
+
+    events = read_events(path)
+    if args.command == 'export':
+        output = json.dumps(chrome_trace(events, args.project_id))
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output)
+            print(f'Wrote {len(events)} events to {args.output} (open it in https://ui.perfetto.dev)')
+        else:
+            print(output)
+        return 0
+
+    summary = summarize(events)
+    if summary is None:
+        print(f'No trace recorded for {args.project_id} yet (it is written while the scheduler runs)',
+              file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_summary(args.project_id, summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,419 @@
+"""
+Plan validator
+
+Replaces the jq loops in `auto-cursor validate`, which spawned several jq
+processes per task and per dependency and only noticed direct two-task
+cycles (A <-> B); longer cycles passed validation and later left the
+scheduler with tasks stuck in `waiting`.
+
+The plan is parsed once and checked in time linear in tasks plus
+dependencies:
+
+- duplicate or missing ids, missing descriptions, unknown dependencies,
+  invalid complexity and estimated_hours values
+- dependency cycles, found as strongly connected components (Tarjan); each
+  cyclic component is reported with one concrete cycle path through it
+- plan shape: total and critical-path estimated hours, the plan's width
+  (the most tasks that can ever run at once: a maximum antichain, which can
+  be wider than any single dependency level when chains of different
+  lengths run side by side), and a recommended --parallel (the smaller of
+  that width and the work/critical-path ratio, beyond which extra agents
+  only wait)
+"""
+
+import argparse
+import json
+import math
+import sys
+from collections import deque
+
+from .common import PROJECTS_DIR, load_json
+from .graph import COMPLEXITY_HOURS, DEFAULT_HOURS, DependencyGraph
+
+RED = '\033[0;31m'
+GREEN = '\033[0;32m'
+YELLOW = '\033[1;33m'
+CYAN = '\033[0;36m'
+NC = '\033[0m'
+
+COMPLEXITIES = ('simple', 'medium', 'complex')
+
+
+def task_hours(task):
+    """estimated_hours, or the complexity default the scheduler would assume."""
+    hours = task.get('estimated_hours')
+    if isinstance(hours, (int, float)) and not isinstance(hours, bool) and hours > 0:
+        return float(hours)
+    return COMPLEXITY_HOURS.get(task.get('complexity'), DEFAULT_HOURS)
+
+
+def strongly_connected_components(nodes, edges):
+    """
+    Tarjan's algorithm, iterative so long dependency chains can't hit the
+    recursion limit.
+
+    Args:
+        nodes: Node ids
+        edges: dict node -> successors (unknown successors are ignored)
+
+    Returns:
+        list: Components (lists of node ids) in reverse topological order
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(edges.get(root, ())))]
+        while work:
+            node, successors = work[-1]
+            advanced = False
+            for successor in successors:
+                if successor not in edges:
+                    continue
+                if successor not in index:
+                    index[successor] = lowlink[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(edges.get(successor, ()))))
+                    advanced = True
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+def cycle_path(component, edges):
+    """
+    One cycle through a cyclic component, as a closed path of node ids
+    (first == last). Breadth-first from the component's first node back to
+    itself, so the reported cycle is a shortest one through that node.
+    """
+    members = set(component)
+    start = component[0]
+    parents = {}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for successor in edges.get(node, ()):
+            if successor not in members:
+                continue
+            if successor == start:
+                path = [node]
+                while path[-1] != start:
+                    path.append(parents[path[-1]])
+                return path[::-1] + [start]
+            if successor not in parents:
+                parents[successor] = node
+                queue.append(successor)
+    return [start, start]
+
+
+def max_antichain(order, dependencies):
+    """
+    Size of the largest set of tasks none of which depends on another,
+    directly or transitively: the most agents the plan can ever keep busy.
+
+    By Dilworth's theorem that is the number of tasks minus a maximum
+    matching between each task and the tasks that transitively depend on
+    it (the fewest chains that cover the plan). Reachability is kept as one
+    integer bitset per task and augmenting paths are searched iteratively,
+    so deep plans can't hit the recursion limit.
+
+    Args:
+        order: Task ids in topological order (dependencies first)
+        dependencies: dict task id -> ids it depends on, all within order
+
+    Returns:
+        int: Width of the plan
+    """
+    index = {task_id: i for i, task_id in enumerate(order)}
+    ancestors = []
+    for task_id in order:
+        bits = 0
+        for dep in dependencies[task_id]:
+            bits |= ancestors[index[dep]] | (1 << index[dep])
+        ancestors.append(bits)
+    descendants = [[] for _ in order]
+    for i, bits in enumerate(ancestors):
+        while bits:
+            low = bits & -bits
+            descendants[low.bit_length() - 1].append(i)
+            bits ^= low
+
+    matched_to = [None] * len(order)
+    matching = 0
+    for root in range(len(order)):
+        visited = set()
+        # Frames: (task, its remaining descendants, the descendant we came through)
+        stack = [(root, iter(descendants[root]), None)]
+        while stack:
+            node, candidates, _ = stack[-1]
+            for candidate in candidates:
+                if candidate not in visited:
+                    visited.add(candidate)
+                    break
+            else:
+                stack.pop()
+                continue
+            if matched_to[candidate] is None:
+                # Flip the alternating path back to the root
+                matched_to[candidate] = node
+                for depth in range(len(stack) - 1, 0, -1):
+                    matched_to[stack[depth][2]] = stack[depth - 1][0]
+                matching += 1
+                break
+            stack.append((matched_to[candidate], iter(descendants[matched_to[candidate]]), candidate))
+    return len(order) - matching
+
+
+def validate(tasks):
+    """
+    Args:
+        tasks: tasks.json contents
+
+    Returns:
+        dict: errors, warnings, cycles and the plan's shape
+    """
+    errors = []
+    warnings = []
+
+    ids = []
+    seen = set()
+    duplicates = []
+    missing_descriptions = []
+    invalid_complexity = []
+    invalid_hours = []
+    missing_ids = 0
+    for task in tasks:
+        task_id = task.get('id') if isinstance(task, dict) else None
+        if not task_id:
+            missing_ids += 1
+            continue
+        if task_id in seen:
+            if task_id not in duplicates:
+                duplicates.append(task_id)
+            continue
+        seen.add(task_id)
+        ids.append(task_id)
+        if not task.get('description'):
+            missing_descriptions.append(task_id)
+        complexity = task.get('complexity')
+        if complexity is not None and complexity not in COMPLEXITIES:
+            invalid_complexity.append(f'{task_id}: {complexity}')
+        hours = task.get('estimated_hours')
+        if hours is not None and (isinstance(hours, bool) or not isinstance(hours, (int, float)) or hours < 0):
+            invalid_hours.append(f'{task_id}: {hours}')
+
+    if duplicates:
+        errors.append(f"Duplicate task IDs: {' '.join(duplicates)}")
+    if missing_ids:
+        errors.append('Tasks with missing IDs found')
+    if missing_descriptions:
+        errors.append(f"Tasks with missing descriptions: {' '.join(missing_descriptions)}")
+
+    # First definition of each id wins, as in the scheduler
+    by_id = {}
+    for task in tasks:
+        if isinstance(task, dict) and task.get('id') and task['id'] not in by_id:
+            by_id[task['id']] = task
+
+    dependencies = {}
+    for task_id in ids:
+        deps = by_id[task_id].get('dependencies') or []
+        if not isinstance(deps, list):
+            errors.append(f"Task '{task_id}' has non-list dependencies")
+            deps = []
+        dependencies[task_id] = []
+        for dep in deps:
+            if dep not in seen:
+                warnings.append(f"Task '{task_id}' depends on non-existent task '{dep}'")
+                continue
+            dependencies[task_id].append(dep)
+
+    cycles = []
+    cyclic = set()
+    position = {task_id: i for i, task_id in enumerate(ids)}
+    for component in strongly_connected_components(ids, dependencies):
+        if len(component) == 1 and component[0] not in dependencies[component[0]]:
+            continue
+        # Start from the earliest task in the cycle, in plan order
+        component.sort(key=position.get)
+        cycles.append({'tasks': component, 'path': cycle_path(component, dependencies)})
+        cyclic.update(component)
+    cycles.sort(key=lambda cycle: position[cycle['tasks'][0]])
+    for cycle in cycles:
+        # Each task in the path depends on the next one
+        message = f"Circular dependency detected: {' -> '.join(cycle['path'])}"
+        if len(cycle['tasks']) > len(cycle['path']) - 1:
+            message += f" ({len(cycle['tasks'])} tasks are in this cycle group)"
+        errors.append(message)
+
+    if invalid_complexity:
+        warnings.append(f"Invalid complexity values: {', '.join(invalid_complexity)}")
+    if invalid_hours:
+        warnings.append(f"Invalid estimated_hours values: {', '.join(invalid_hours)}")
+
+    shape = plan_shape(ids, by_id, dependencies, cyclic)
+    return {'errors': errors, 'warnings': warnings, 'cycles': cycles, 'shape': shape}
+
+
+def plan_shape(ids, by_id, dependencies, cyclic):
+    """
+    Critical path, width and recommended parallelism of the acyclic part of
+    the plan (tasks in or behind a cycle can never run and are left out).
+    """
+    acyclic = [task_id for task_id in ids if task_id not in cyclic]
+    acyclic_set = set(acyclic)
+    hours = {task_id: task_hours(by_id[task_id]) for task_id in acyclic}
+
+    # Longest-path level of each task (Kahn's algorithm), dropping anything
+    # that waits on a cycle
+    indegree = {task_id: 0 for task_id in acyclic}
+    dependents = {task_id: [] for task_id in acyclic}
+    blocked = set()
+    for task_id in acyclic:
+        for dep in dependencies.get(task_id, ()):
+            if dep in acyclic_set:
+                indegree[task_id] += 1
+                dependents[dep].append(task_id)
+            else:
+                blocked.add(task_id)
+    level = {}
+    order = []
+    queue = deque(task_id for task_id in acyclic if indegree[task_id] == 0)
+    for task_id in queue:
+        level[task_id] = 0
+    while queue:
+        task_id = queue.popleft()
+        order.append(task_id)
+        for dependent in dependents[task_id]:
+            level[dependent] = max(level.get(dependent, 0), level[task_id] + 1)
+            indegree[dependent] -= 1
+            if indegree[dependent] == 0:
+                queue.append(dependent)
+    # Everything downstream of a blocked task is blocked too
+    pending = deque(blocked)
+    while pending:
+        for dependent in dependents[pending.popleft()]:
+            if dependent not in blocked:
+                blocked.add(dependent)
+                pending.append(dependent)
+    runnable = [task_id for task_id in acyclic if task_id not in blocked]
+
+    runnable_dependencies = {task_id: [d for d in dependencies[task_id] if d in acyclic_set and d not in blocked]
+                             for task_id in runnable}
+    graph = DependencyGraph((task_id, runnable_dependencies[task_id], hours[task_id]) for task_id in runnable)
+    ranks = graph.critical_path_lengths()
+    path = []
+    if ranks:
+        roots = [task_id for task_id in runnable if not graph.dependencies[task_id]]
+        current = max(roots, key=lambda t: (ranks[t], -graph.index[t]))
+        while current is not None:
+            path.append(current)
+            current = max(graph.dependents.get(current, ()), key=lambda t: (ranks[t], -graph.index[t]),
+                          default=None)
+
+    widths = {}
+    for task_id in runnable:
+        widths[level[task_id]] = widths.get(level[task_id], 0) + 1
+    total = sum(hours[task_id] for task_id in runnable)
+    critical = ranks[path[0]] if path else 0.0
+    width = max_antichain([task_id for task_id in order if task_id not in blocked], runnable_dependencies)
+    recommended = max(1, min(width, math.ceil(total / critical))) if critical else 1
+    return {
+        'tasks': len(ids),
+        'runnable_tasks': len(runnable),
+        'total_hours': round(total, 2),
+        'critical_path_hours': round(critical, 2),
+        'critical_path': path,
+        'levels': len(widths),
+        'widest_level': max(widths.values(), default=0),
+        'max_width': width,
+        'recommended_parallel': recommended,
+    }
+
+
+def _hours(value):
+    return f'{int(value)}' if float(value).is_integer() else f'{value:g}'
+
+
+def print_report(project_id, report):
+    shape = report['shape']
+    print(f'{CYAN}=== Validating Plan: {project_id} ==={NC}')
+    print()
+    if not report['errors'] and not report['warnings']:
+        print(f'{GREEN}✅ Plan validation passed!{NC}')
+        print()
+    if report['errors']:
+        print(f'{RED}❌ Validation Errors:{NC}')
+        for error in report['errors']:
+            print(f'  • {error}')
+        print()
+    if report['warnings']:
+        print(f'{YELLOW}⚠️  Validation Warnings:{NC}')
+        for warning in report['warnings']:
+            print(f'  • {warning}')
+        print()
+    print(f'  Tasks: {shape["tasks"]}'
+          + (f' ({shape["runnable_tasks"]} runnable)' if shape['runnable_tasks'] != shape['tasks'] else ''))
+    if shape['runnable_tasks']:
+        print(f'  Estimated time: {_hours(shape["total_hours"])} hours')
+        print(f'  Critical path: {_hours(shape["critical_path_hours"])} hours '
+              f'({len(shape["critical_path"])} tasks: {" -> ".join(shape["critical_path"])})')
+        print(f'  Max parallel width: {shape["max_width"]} tasks '
+              f'(widest of {shape["levels"]} dependency levels: {shape["widest_level"]})')
+        print(f'  Recommended: --parallel {shape["recommended_parallel"]}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-validate', description='Validate a plan')
+    parser.add_argument('project_id')
+    parser.add_argument('--tasks-file', help='Validate this file instead of the project\'s tasks.json')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    tasks_file = args.tasks_file or PROJECTS_DIR / args.project_id / 'tasks.json'
+    tasks = load_json(tasks_file)
+    if not isinstance(tasks, list) or not tasks:
+        print(f'{RED}Error: No plan found. Create a plan first with: '
+              f'auto-cursor plan {args.project_id} <goal>{NC}', file=sys.stderr)
+        return 3
+
+    report = validate(tasks)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(args.project_id, report)
+    # 2: errors, 1: warnings only
+    if report['errors']:
+        return 2
+    return 1 if report['warnings'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,520 @@
+"""
+Parallel worktree provisioning with a warm pool
+
+`auto-cursor start` and `continue` used to run `git worktree add` once per
+task, one after another, before any agent could start; on a large repository
+with dozens of tasks that alone took minutes. Worktrees are now created by a
+bounded thread pool (AUTO_CURSOR_WORKTREE_JOBS, default 4) and each task's
+worktree comes from, in order of preference:
+
+    existing   the directory is already there (resume)
+    branch     the task's auto-cursor/<task> branch exists; check it out
+    pool       a pre-created worktree at the base commit, renamed into place
+    new        `git worktree add -b auto-cursor/<task>`
+    copy       the project is not a git repository (or git failed): copy it
+
+The warm pool lives in WORKTREES_DIR/.pool/<project-id>/ and holds up to
+AUTO_CURSOR_WORKTREE_POOL (default 2) detached worktrees at the project's
+HEAD. Slots made at an older HEAD are discarded instead of handed out.
+`auto-cursor start` refills it in the background after provisioning.
+
+Sparse mode (opt-in: "sparse_worktrees": true in the project's config.json,
+or AUTO_CURSOR_SPARSE_WORKTREES=1) checks out only the task's `directory`
+plus the config's "sparse_paths" (build files, shared libraries) with
+`git sparse-checkout`; files at the repository root are always included.
+Tasks without a directory, or with ".", still get a full checkout, and the
+warm pool (full checkouts) is bypassed for sparse tasks. The copy fallback
+copies only the same paths and clones file extents (FICLONE) where the
+filesystem supports it instead of copying bytes.
+
+Per-task timings are printed and saved to the project's
+worktree-timings.json.
+"""
+
+import argparse
+import fcntl
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import trace
+from .common import PROJECTS_DIR, WORKTREES_DIR, load_json, write_json_atomic
+
+DEFAULT_JOBS = int(os.environ.get('AUTO_CURSOR_WORKTREE_JOBS', '4'))
+DEFAULT_POOL_SIZE = int(os.environ.get('AUTO_CURSOR_WORKTREE_POOL', '2'))
+POOL_DIR = WORKTREES_DIR / '.pool'
+BRANCH_PREFIX = 'auto-cursor/'
+# git serialises some ref and worktree admin updates with lock files;
+# concurrent adds occasionally lose that race and are retried
+LOCK_RETRIES = 3
+# ioctl(2) request for a copy-on-write clone of a whole file (linux/fs.h)
+FICLONE = 0x40049409
+
+BLUE = '\033[0;34m'
+GREEN = '\033[0;32m'
+YELLOW = '\033[1;33m'
+NC = '\033[0m'
+
+
+class ProvisionError(Exception):
+    """Raised when a project's worktrees cannot be provisioned."""
+
+
+def _git(directory, *args):
+    return subprocess.run(['git', '-C', str(directory)] + list(args), stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def _git_retrying(directory, *args):
+    for attempt in range(LOCK_RETRIES):
+        result = _git(directory, *args)
+        if result.returncode == 0 or '.lock' not in result.stderr:
+            return result
+        time.sleep(0.2 * (attempt + 1))
+    return result
+
+
+def is_git_repo(project_path):
+    return _git(project_path, 'rev-parse', '--is-inside-work-tree').returncode == 0
+
+
+def head_commit(project_path):
+    result = _git(project_path, 'rev-parse', 'HEAD')
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def branch_exists(project_path, branch):
+    return _git(project_path, 'rev-parse', '--verify', '--quiet', f'refs/heads/{branch}').returncode == 0
+
+
+def sparse_settings(config):
+    """
+    Returns:
+        tuple: (sparse mode enabled, shared paths every sparse task gets)
+    """
+    env = os.environ.get('AUTO_CURSOR_SPARSE_WORKTREES', '').lower()
+    if env in ('1', 'true', 'yes', 'on'):
+        enabled = True
+    elif env in ('0', 'false', 'no', 'off'):
+        enabled = False
+    else:
+        enabled = bool(config.get('sparse_worktrees'))
+    shared = [p.strip('/') for p in config.get('sparse_paths') or [] if p.strip('/')]
+    return enabled, shared
+
+
+def task_sparse_paths(task, shared):
+    """
+    Paths a task's sparse worktree checks out, or None for a full checkout.
+    """
+    directory = (task.get('directory') or '').strip().strip('/')
+    if not directory or directory == '.':
+        return None
+    return [directory] + [p for p in shared if p != directory]
+
+
+def clone_file(src, dst):
+    """copy2, but share extents with src on filesystems that support reflinks."""
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return dst
+    except OSError:
+        return shutil.copy2(src, dst)
+
+
+def copy_project(project_path, target, paths=None):
+    """
+    Fallback when git can't make the worktree: copy the project (without
+    .git), or only the root files plus paths when given.
+    """
+    ignore = shutil.ignore_patterns('.git')
+    if paths is None:
+        shutil.copytree(project_path, target, symlinks=True, dirs_exist_ok=True,
+                        ignore=ignore, copy_function=clone_file)
+        return
+    source, target = Path(project_path), Path(target)
+    target.mkdir(parents=True, exist_ok=True)
+    for entry in source.iterdir():
+        if entry.name != '.git' and (entry.is_symlink() or entry.is_file()):
+            shutil.copy2(entry, target / entry.name, follow_symlinks=False) if entry.is_symlink() \
+                else clone_file(entry, target / entry.name)
+    for path in paths:
+        src = source / path
+        if src.is_dir():
+            shutil.copytree(src, target / path, symlinks=True, dirs_exist_ok=True,
+                            ignore=ignore, copy_function=clone_file)
+        elif src.exists():
+            (target / path).parent.mkdir(parents=True, exist_ok=True)
+            clone_file(src, target / path)
+
+
+def apply_sparse(worktree, paths):
+    """
+    Restrict a --no-checkout worktree to paths and check it out. Cone mode
+    (fast, directories only) unless a path names a file.
+    """
+    if all(_git(worktree, 'cat-file', '-t', f'HEAD:{p}').stdout.strip() != 'blob' for p in paths):
+        result = _git(worktree, 'sparse-checkout', 'set', '--cone', *paths)
+    else:
+        patterns = ['/*', '!/*/']
+        for p in paths:
+            is_file = _git(worktree, 'cat-file', '-t', f'HEAD:{p}').stdout.strip() == 'blob'
+            patterns.append(f'/{p}' if is_file else f'/{p}/')
+        result = _git(worktree, 'sparse-checkout', 'set', '--no-cone', *patterns)
+    if result.returncode != 0:
+        return result
+    return _git_retrying(worktree, 'checkout', '-q')
+
+
+def is_sparse(worktree):
+    return _git(worktree, 'config', '--get', 'core.sparseCheckout').stdout.strip() == 'true'
+
+
+def outside_sparse(worktree):
+    """
+    Changed or new files in a sparse worktree that lie outside its sparse
+    definition. `git add -A` skips these, so committing and merging the
+    task's branch would silently leave them behind.
+
+    Returns:
+        list: Paths relative to the worktree (empty for full checkouts)
+    """
+    if not is_sparse(worktree):
+        return []
+    env = dict(os.environ, LC_ALL='C')
+
+    def dry_run(*extra):
+        result = subprocess.run(['git', '-C', str(worktree), 'add', '-A', '--dry-run'] + list(extra),
+                                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True, env=env)
+        return {line.split(' ', 1)[1].strip("'") for line in result.stdout.splitlines()
+                if line.startswith(('add ', 'remove ')) and ' ' in line}
+
+    return sorted(dry_run('--sparse') - dry_run())
+
+
+def remove_worktree(project_path, path):
+    if _git(project_path, 'worktree', 'remove', '--force', str(path)).returncode != 0:
+        shutil.rmtree(path, ignore_errors=True)
+        _git(project_path, 'worktree', 'prune')
+
+
+class WarmPool:
+    """
+    Detached worktrees at the base commit, ready to be renamed into place.
+
+    Args:
+        project_id: Project the pool belongs to
+        project_path: The project's repository
+    """
+
+    def __init__(self, project_id, project_path, size=DEFAULT_POOL_SIZE):
+        self.project_path = project_path
+        self.size = size
+        self.dir = POOL_DIR / project_id
+        self.lock_path = self.dir / '.lock'
+
+    def _locked(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        f = open(self.lock_path, 'w')
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def slots(self):
+        if not self.dir.is_dir():
+            return []
+        return sorted(p for p in self.dir.iterdir() if p.is_dir() and p.name.startswith('slot-'))
+
+    def claim(self, target, branch, base):
+        """
+        Move a slot at base to target and create branch in it.
+
+        Returns:
+            bool: Whether a slot was used
+        """
+        if self.size <= 0 or not base:
+            return False
+        with self._locked():
+            for slot in self.slots():
+                if _git(slot, 'rev-parse', 'HEAD').stdout.strip() != base:
+                    remove_worktree(self.project_path, slot)
+                    continue
+                if _git_retrying(self.project_path, 'worktree', 'move', str(slot), str(target)).returncode != 0:
+                    remove_worktree(self.project_path, slot)
+                    continue
+                break
+            else:
+                return False
+        if _git_retrying(target, 'checkout', '-q', '-b', branch).returncode == 0:
+            return True
+        # Leave nothing half-made behind; the caller falls back to a fresh add
+        remove_worktree(self.project_path, target)
+        return False
+
+    def fill(self, jobs=DEFAULT_JOBS):
+        """
+        Top the pool up to its size with worktrees at the current HEAD.
+
+        Returns:
+            int: Slots created
+        """
+        base = head_commit(self.project_path)
+        if self.size <= 0 or not base:
+            return 0
+        with self._locked():
+            current = []
+            for slot in self.slots():
+                if _git(slot, 'rev-parse', 'HEAD').stdout.strip() == base:
+                    current.append(slot)
+                else:
+                    remove_worktree(self.project_path, slot)
+            missing = self.size - len(current)
+            if missing <= 0:
+                return 0
+            names = {slot.name for slot in current}
+            new_slots = []
+            number = 0
+            while len(new_slots) < missing:
+                name = f'slot-{number}'
+                if name not in names:
+                    new_slots.append(self.dir / name)
+                number += 1
+
+            def add(slot):
+                return _git_retrying(self.project_path, 'worktree', 'add', '--detach', '-q',
+                                     str(slot), base).returncode == 0
+
+            with ThreadPoolExecutor(max_workers=max(1, min(jobs, missing))) as executor:
+                return sum(executor.map(add, new_slots))
+
+    def drain(self):
+        """Remove every slot."""
+        removed = 0
+        with self._locked():
+            for slot in self.slots():
+                remove_worktree(self.project_path, slot)
+                removed += 1
+        shutil.rmtree(self.dir, ignore_errors=True)
+        return removed
+
+
+def provision_one(project_path, task_id, target, git_repo, base, pool, sparse_paths=None):
+    """
+    Make sure one task's worktree exists.
+
+    Args:
+        sparse_paths: Check out only these paths (None for everything)
+
+    Returns:
+        dict: task, path, method, seconds and (on failure) error
+    """
+    started = time.monotonic()
+    result = {'task': task_id, 'path': str(target)}
+    target = Path(target)
+    branch = BRANCH_PREFIX + task_id
+    try:
+        if target.is_dir():
+            result['method'] = 'existing'
+        elif not git_repo:
+            copy_project(project_path, target, sparse_paths)
+            result['method'] = 'copy'
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            checkout = ['--no-checkout'] if sparse_paths else []
+            if branch_exists(project_path, branch):
+                added = _git_retrying(project_path, 'worktree', 'add', '-q', *checkout, str(target), branch)
+                result['method'] = 'branch'
+            elif not sparse_paths and pool and pool.claim(target, branch, base):
+                added = None
+                result['method'] = 'pool'
+            else:
+                added = _git_retrying(project_path, 'worktree', 'add', '-q', *checkout,
+                                      str(target), '-b', branch)
+                result['method'] = 'new'
+            if sparse_paths and added.returncode == 0:
+                added = apply_sparse(target, sparse_paths)
+                if added.returncode != 0:
+                    remove_worktree(project_path, target)
+                    if result['method'] == 'new':
+                        # Or the next provision fails with "branch already exists"
+                        _git(project_path, 'branch', '-D', branch)
+            if added is not None and added.returncode != 0:
+                # Same fallback as before: a plain copy still lets the agent work
+                copy_project(project_path, target, sparse_paths)
+                result['method'] = 'copy'
+                result['error'] = added.stderr.strip().splitlines()[-1] if added.stderr.strip() else 'git failed'
+        if sparse_paths and result['method'] != 'existing':
+            result['sparse'] = sparse_paths
+    except OSError as e:
+        result['method'] = 'failed'
+        result['error'] = str(e)
+    result['seconds'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def provision(project_id, jobs=DEFAULT_JOBS, pool_size=DEFAULT_POOL_SIZE, progress=None, sparse=None):
+    """
+    Create every missing worktree in the project's orchestration.json.
+
+    Args:
+        jobs: Worktrees created concurrently
+        pool_size: Warm pool size to draw from (0 disables the pool)
+        progress: Called with each result as it finishes
+        sparse: Force sparse mode on or off (None: project config)
+
+    Returns:
+        dict: {'results': [...], 'seconds': wall time, 'jobs': jobs}
+
+    Raises:
+        ProvisionError: If the project or its orchestration file is missing
+    """
+    project_dir = PROJECTS_DIR / project_id
+    config = load_json(project_dir / 'config.json')
+    orchestration = load_json(project_dir / 'orchestration.json')
+    if not config or not config.get('path'):
+        raise ProvisionError(f'no project path configured for {project_id}')
+    if not orchestration:
+        raise ProvisionError(f'no orchestration.json for {project_id}')
+    project_path = config['path']
+
+    git_repo = is_git_repo(project_path)
+    base = head_commit(project_path) if git_repo else None
+    if git_repo:
+        # Forget worktrees whose directories were deleted by hand, so their
+        # branches can be checked out again
+        _git(project_path, 'worktree', 'prune')
+    pool = WarmPool(project_id, project_path, pool_size) if git_repo and pool_size > 0 else None
+
+    agents = [a for a in orchestration.get('agents', []) if a.get('id') and a.get('directory')]
+    configured, shared = sparse_settings(config)
+    if sparse is None:
+        sparse = configured
+    tasks = {t.get('id'): t for t in load_json(project_dir / 'tasks.json', []) or [] if isinstance(t, dict)}
+    started = time.monotonic()
+    results = []
+    lock = threading.Lock()
+
+    tracer = trace.Tracer(trace.trace_path(project_id)) if trace.enabled() else None
+    workers = {}
+
+    def run(agent):
+        paths = task_sparse_paths(tasks.get(agent['id'], {}), shared) if sparse else None
+        began = time.time()
+        result = provision_one(project_path, agent['id'], agent['directory'], git_repo, base, pool, paths)
+        with lock:
+            if tracer:
+                worker = workers.setdefault(threading.get_ident(), len(workers) + 1)
+                tracer.complete('worktree', trace.INTEGRATION, worker, began, time.time(), agent['id'],
+                                method=result['method'])
+            results.append(result)
+            if progress:
+                progress(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        list(executor.map(run, agents))
+
+    order = {agent['id']: position for position, agent in enumerate(agents)}
+    results.sort(key=lambda r: order[r['task']])
+    report = {'results': results, 'seconds': round(time.monotonic() - started, 3), 'jobs': jobs,
+              'finished': time.time()}
+    write_json_atomic(project_dir / 'worktree-timings.json', report)
+    return report
+
+
+def format_summary(report):
+    created = [r for r in report['results'] if r['method'] != 'existing']
+    if not created:
+        return f"All {len(report['results'])} worktrees already exist"
+    serial = sum(r['seconds'] for r in created)
+    line = f"{len(created)} worktrees provisioned in {report['seconds']:.2f}s with {report['jobs']} jobs"
+    if created and report['seconds'] > 0:
+        line += f' (sum of task times {serial:.2f}s, {serial / report["seconds"]:.1f}x)'
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='auto-cursor-worktrees', description='Provision task worktrees')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('provision', help="Create missing worktrees for a project's orchestration")
+    p.add_argument('project_id')
+    p.add_argument('--jobs', type=int, default=DEFAULT_JOBS)
+    p.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE, help='0 disables the warm pool')
+    p.add_argument('--quiet', action='store_true', help='Only print the summary')
+    p.add_argument('--sparse', action='store_true', default=None,
+                   help="Check out only each task's directory plus the configured sparse_paths")
+    p.add_argument('--no-sparse', dest='sparse', action='store_false')
+
+    p = sub.add_parser('pool', help='Manage the warm worktree pool')
+    p.add_argument('action', choices=('fill', 'drain', 'status'))
+    p.add_argument('project_id')
+    p.add_argument('--size', type=int, default=DEFAULT_POOL_SIZE)
+    p.add_argument('--jobs', type=int, default=DEFAULT_JOBS)
+
+    p = sub.add_parser('timings', help='Show the last provisioning timings')
+    p.add_argument('project_id')
+
+    p = sub.add_parser('sparse-check', help='List changes outside a sparse worktree\'s checkout')
+    p.add_argument('worktree')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'provision':
+        def progress(result):
+            if args.quiet or result['method'] == 'existing':
+                return
+            colour = YELLOW if result['method'] in ('copy', 'failed') else GREEN
+            scope = f" [{', '.join(result['sparse'])}]" if result.get('sparse') else ''
+            print(f"  {colour}{result['method']:<8}{NC} {result['task']}{scope} ({result['seconds']:.2f}s)"
+                  + (f" - {result['error']}" if result.get('error') else ''), flush=True)
+        try:
+            report = provision(args.project_id, args.jobs, args.pool_size, progress, args.sparse)
+        except ProvisionError as e:
+            print(f'Error: {e}', file=sys.stderr)
+            return 1
+        print(f'{BLUE}{format_summary(report)}{NC}')
+        return 1 if any(r['method'] == 'failed' for r in report['results']) else 0
+
+    if args.command == 'sparse-check':
+        stray = outside_sparse(args.worktree)
+        for path in stray:
+            print(path)
+        return 1 if stray else 0
+
+    if args.command == 'timings':
+        report = load_json(PROJECTS_DIR / args.project_id / 'worktree-timings.json')
+        if not report:
+            print(f'No provisioning timings for {args.project_id}')
+            return 1
+        for result in report['results']:
+            print(f"{result['task']:<30} {result['method']:<8} {result['seconds']:>7.2f}s")
+        print(format_summary(report))
+        return 0
+
+    config = load_json(PROJECTS_DIR / args.project_id / 'config.json') or {}
+    if not config.get('path') or not is_git_repo(config['path']):
+        print(f'Error: {args.project_id} has no git repository to pool worktrees from', file=sys.stderr)
+        return 1
+    pool = WarmPool(args.project_id, config['path'], args.size)
+    if args.action == 'fill':
+        print(f'Created {pool.fill(args.jobs)} pool worktrees')
+    elif args.action == 'drain':
+        print(f'Removed {pool.drain()} pool worktrees')
+    else:
+        base = head_commit(config['path'])
+        for slot in pool.slots():
+            fresh = _git(slot, 'rev-parse', 'HEAD').stdout.strip() == base
+            print(f"{slot.name} {'ready' if fresh else 'stale'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Shared setup for the library tests
+
+auto_cursor.common reads its directories from the environment at import
+time, so every test session gets its own AUTO_CURSOR_DIR, AGENTS_DIR and
+HOME before anything from the library is imported.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SESSION_DIR = Path(tempfile.mkdtemp(prefix='auto-cursor-tests-'))
+
+os.environ['AUTO_CURSOR_DIR'] = str(SESSION_DIR / 'auto-cursor')
+os.environ['AGENTS_DIR'] = str(SESSION_DIR / 'agents')
+os.environ['AUTO_CURSOR_COORD_SOCKET'] = str(SESSION_DIR / 'agents' / 'no-coord.sock')
+os.environ['HOME'] = str(SESSION_DIR / 'home')
+os.environ['AUTO_CURSOR_SPAWN'] = 'direct'
+os.environ['QA_WRAPPER'] = str(SESSION_DIR / 'no-qa-wrapper.sh')
+for name in ('AUTO_CURSOR_STATE_STORE', 'AUTO_CURSOR_MAX_RETRIES', 'AUTO_CURSOR_QA_PARALLEL'):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, str(ROOT / 'lib'))
+
+
+@pytest.fixture
+def make_project():
+    """
+    Create a project under PROJECTS_DIR with an orchestration.json and a
+    tasks.json built from the given agents.
+
+    Returns:
+        function: (agents, coordination=None) -> (project_id, orchestration file)
+    """
+    from auto_cursor.common import PROJECTS_DIR
+
+    def make(agents, coordination=None):
+        project_id = f'test-{uuid.uuid4().hex[:8]}'
+        project_dir = PROJECTS_DIR / project_id
+        project_dir.mkdir(parents=True)
+        for agent in agents:
+            agent.setdefault('directory', str(project_dir))
+            agent['id'] = f"{project_id}-{agent['id']}"
+            agent['dependencies'] = [f'{project_id}-{dep}' for dep in agent.get('dependencies', [])]
+        orchestration = project_dir / 'orchestration.json'
+        orchestration.write_text(json.dumps({'agents': agents, 'coordination': coordination or {}}))
+        (project_dir / 'tasks.json').write_text(json.dumps(
+            [{'id': a['id'], 'description': a.get('initial_prompt', ''), 'status': 'pending'} for a in agents]))
+        return project_id, orchestration
+
+    return make
+
+
+GIT_IDENTITY = {'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.com',
+                'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.com'}
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    """
+    A git repository with one commit of the given files.
+
+    Returns:
+        function: (files dict of path -> text) -> repository path
+    """
+    import subprocess
+
+    for name, value in GIT_IDENTITY.items():
+        monkeypatch.setenv(name, value)
+
+    def make(files):
+        repo = tmp_path / f'repo-{uuid.uuid4().hex[:6]}'
+        for path, text in files.items():
+            (repo / path).parent.mkdir(parents=True, exist_ok=True)
+            (repo / path).write_text(text)
+        for args in (['init', '-q', '-b', 'main'], ['add', '-A'], ['commit', '-q', '-m', 'base']):
+            subprocess.run(['git', '-C', str(repo)] + args, check=True, stdout=subprocess.DEVNULL)
+        return repo
+
+    return make
@@ -0,0 +1,77 @@
+"""Admission control: the max_parallel cap, pressure throttling and the run queue."""
+
+from auto_cursor import admission
+from auto_cursor.admission import AdmissionController
+from auto_cursor.scheduler import Scheduler
+
+
+def test_admit_fills_only_free_slots_in_queue_order():
+    controller = AdmissionController({'max_parallel': 3})
+    for task_id in ('a', 'b', 'c', 'd'):
+        controller.enqueue(task_id)
+    assert not controller.enqueue('a')
+
+    assert controller.admit(running=1) == ['a', 'b']
+    assert controller.positions() == {'c': 1, 'd': 2}
+    assert controller.admit(running=3) == []
+
+
+def test_rejected_tasks_keep_their_place():
+    controller = AdmissionController({'max_parallel': 2})
+    for task_id in ('a', 'b', 'c'):
+        controller.enqueue(task_id)
+
+    assert controller.admit(running=0, allow=lambda task_id, admitted: task_id != 'a') == ['b', 'c']
+    assert list(controller.queue) == ['a']
+
+
+def test_each_crossed_threshold_halves_the_limit(monkeypatch):
+    monkeypatch.setattr(admission, 'load_per_cpu', lambda: 3.0)
+    monkeypatch.setattr(admission, 'available_memory_mb', lambda: 512)
+    controller = AdmissionController({'max_parallel': 8, 'max_load_per_cpu': 2.0})
+
+    assert controller.limit() == 4
+    assert controller.throttled_by == ['load 3.00/cpu > 2.0']
+
+    controller.min_mem_mb = 1024
+    assert controller.limit() == 2
+    monkeypatch.setattr(admission, 'load_per_cpu', lambda: 0.5)
+    monkeypatch.setattr(admission, 'available_memory_mb', lambda: 4096)
+    assert controller.limit() == 8
+    assert controller.throttled_by == []
+
+
+def test_environment_overrides_the_plan(monkeypatch):
+    monkeypatch.setenv('AUTO_CURSOR_MAX_PARALLEL', '1')
+    controller = AdmissionController({'max_parallel': 6})
+
+    assert controller.limit() == 1
+    assert controller.recheck_interval() is None
+
+
+def test_scheduler_queues_past_max_parallel_and_fills_freed_slots(make_project, monkeypatch):
+    project_id, orchestration = make_project([{'id': n} for n in ('a', 'b', 'c', 'd')],
+                                             {'max_parallel': 2, 'policy': 'fifo'})
+    scheduler = Scheduler(orchestration)
+    scheduler.init_dependencies()
+    started = []
+
+    def launch(tasks):
+        for task in tasks:
+            scheduler.set_status(task, 'running')
+            started.append(task.id)
+        return len(tasks)
+
+    monkeypatch.setattr(scheduler, 'launch', launch)
+    scheduler.schedule()
+
+    ids = [f'{project_id}-{n}' for n in ('a', 'b', 'c', 'd')]
+    assert started == ids[:2]
+    assert [(scheduler.tasks[t].status, scheduler.tasks[t].queue_position) for t in ids[2:]] == [
+        ('queued', 1), ('queued', 2)]
+
+    scheduler.set_status(scheduler.tasks[ids[0]], 'completed')
+    scheduler.schedule([])
+
+    assert started == ids[:3]
+    assert scheduler.tasks[ids[3]].queue_position == 1
@@ -0,0 +1,20 @@
+"""Board views on the command line."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+BOARD = Path(__file__).resolve().parents[1] / 'bin' / 'auto-cursor-board'
+
+
+def test_reader_closing_the_pipe_early_is_not_a_traceback(make_project):
+    project_id, _ = make_project([{'id': f'task-{n}'} for n in range(50)])
+    board = subprocess.Popen([sys.executable, str(BOARD), project_id, '--view', 'tasks'],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Like `| head`: the reader is gone before the board is written
+    board.stdout.close()
+    stderr = board.stderr.read().decode()
+    board.wait()
+
+    assert 'Traceback' not in stderr and 'Exception ignored' not in stderr
+    assert board.returncode == 1
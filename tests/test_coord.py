@@ -0,0 +1,41 @@
+"""Shared state writes and their SQLite store mirror."""
+
+import uuid
+
+import pytest
+
+from auto_cursor import coord
+from auto_cursor.state_store import StateStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUTO_CURSOR_STATE_STORE', 'sqlite')
+    store = StateStore(tmp_path / 'state.db')
+    monkeypatch.setattr(coord, '_store', store)
+    return store
+
+
+def test_daemon_delete_is_mirrored_to_the_store(store):
+    namespace = f'agent-{uuid.uuid4().hex[:8]}'
+    state = coord.CoordState()
+    state.set(namespace, 'API_URL', 'http://localhost:3000')
+    assert store.get_state(namespace, 'API_URL') == 'http://localhost:3000'
+
+    assert state.delete(namespace, 'API_URL')['found']
+
+    assert store.get_state(namespace, 'API_URL') is None
+    assert coord._read_mirror(namespace) == {}
+
+
+def test_fallback_delete_is_mirrored_to_the_store(store):
+    namespace = f'agent-{uuid.uuid4().hex[:8]}'
+    # No daemon is listening in the tests: these go through the flock'd files
+    coord.set_value(namespace, 'TOKEN', 'abc')
+    coord.set_value(namespace, 'PORT', 8080)
+    assert store.get_state(namespace) == {'PORT': '8080', 'TOKEN': 'abc'}
+
+    assert coord.delete(namespace, 'TOKEN') == {'found': True}
+
+    assert store.get_state(namespace) == {'PORT': '8080'}
+    assert coord.get(namespace, 'TOKEN')['found'] is False
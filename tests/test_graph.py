@@ -0,0 +1,69 @@
+"""Critical-path ranking and duration feedback."""
+
+from auto_cursor.graph import DependencyGraph, DurationModel
+from auto_cursor.scheduler import Scheduler
+
+
+def _graph():
+    # short (1h) stands alone; long (1h) gates a 6h chain
+    return DependencyGraph([
+        ('short', [], 1.0),
+        ('long', [], 1.0),
+        ('build', ['long'], 4.0),
+        ('deploy', ['build'], 2.0),
+        ('docs', ['long'], 1.0),
+    ])
+
+
+def test_rank_is_the_longest_remaining_path():
+    ranks = _graph().critical_path_lengths()
+
+    assert ranks == {'short': 1.0, 'long': 7.0, 'build': 6.0, 'deploy': 2.0, 'docs': 1.0}
+
+
+def test_ready_tasks_rank_by_critical_path_with_plan_order_breaking_ties():
+    graph = _graph()
+
+    assert sorted(['docs', 'short', 'long'], key=graph.priority_key()) == ['long', 'short', 'docs']
+    assert sorted(['docs', 'short', 'long'], key=graph.priority_key('fifo')) == ['short', 'long', 'docs']
+
+
+def test_cycles_do_not_hang_the_ranking():
+    graph = DependencyGraph([('a', ['b'], 1.0), ('b', ['a'], 2.0), ('c', [], 1.0)])
+
+    assert set(graph.critical_path_lengths()) == {'a', 'b', 'c'}
+
+
+def test_observed_durations_correct_later_estimates(tmp_path):
+    model = DurationModel(tmp_path / 'durations.json')
+    assert model.estimate(None, 'complex') == 8.0
+
+    # A 2h medium task that took 4h
+    model.record(2.0, 'medium', 4 * 3600)
+
+    reloaded = DurationModel(tmp_path / 'durations.json')
+    assert reloaded.estimate(2.0, 'medium') == 4.0
+    # Complexities without samples of their own use the overall ratio
+    assert reloaded.estimate(1.0, 'simple') == 2.0
+
+
+def test_scheduler_starts_the_critical_path_first(make_project, monkeypatch):
+    project_id, orchestration = make_project([
+        {'id': 'short', 'estimated_hours': 1},
+        {'id': 'long', 'estimated_hours': 1},
+        {'id': 'build', 'estimated_hours': 6, 'dependencies': ['long']},
+    ], {'max_parallel': 1})
+    scheduler = Scheduler(orchestration)
+    scheduler.init_dependencies()
+    started = []
+
+    def launch(tasks):
+        for task in tasks:
+            scheduler.set_status(task, 'running')
+            started.append(task.id)
+        return len(tasks)
+
+    monkeypatch.setattr(scheduler, 'launch', launch)
+    scheduler.schedule()
+
+    assert started == [f'{project_id}-long']
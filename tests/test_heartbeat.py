@@ -0,0 +1,88 @@
+"""Agent heartbeats: beats follow progress, and the watchdog reads them."""
+
+import os
+import time
+
+from auto_cursor.heartbeat import AgentBeat, Watchdog, group_cpu_ticks, heartbeat_path, read_heartbeat
+
+
+class Clock:
+    def __init__(self):
+        self.cpu = 0
+
+    def __call__(self):
+        return self.cpu
+
+
+def _beat(agent_id, cpu, **kwargs):
+    path = heartbeat_path(agent_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        path.unlink()
+    except OSError:
+        pass
+    return AgentBeat(path, 4242, cpu_ticks=cpu, interval=5, idle_grace=30, **kwargs)
+
+
+def test_beats_carry_the_agent_pid():
+    beat = _beat('hb-pid', Clock())
+    assert beat.tick(0, now=1000)
+    assert read_heartbeat('hb-pid') == {'ts': 1000.0, 'pid': 4242, 'log_bytes': 0, 'state': 'running'}
+
+
+def test_hung_agent_stops_beating_after_idle_grace():
+    beat = _beat('hb-hung', Clock())
+    assert beat.tick(10, now=1000)
+    assert beat.tick(10, now=1020)
+    assert beat.tick(10, now=1030)
+    assert not beat.tick(10, now=1035)
+    assert read_heartbeat('hb-hung')['ts'] == 1030
+
+
+def test_output_or_cpu_time_keeps_it_beating():
+    cpu = Clock()
+    beat = _beat('hb-busy', cpu)
+    beat.tick(10, now=1000)
+    assert beat.tick(20, now=1040)
+    cpu.cpu = 7
+    assert beat.tick(20, now=1080)
+    # Only as often as the interval
+    assert not beat.tick(30, now=1082)
+
+
+def test_paused_agent_keeps_beating(tmp_path):
+    pause = tmp_path / 'PAUSE'
+    pause.touch()
+    beat = _beat('hb-paused', Clock(), pause_files=[pause])
+    beat.tick(0, now=1000)
+    assert beat.tick(0, now=1100)
+    assert read_heartbeat('hb-paused')['state'] == 'paused'
+
+
+def test_watchdog_reports_missed_beats():
+    beat = _beat('hb-watch', Clock())
+    now = time.time()
+    beat.tick(0, now=now - 60)
+    reason = Watchdog().check('hb-watch', started=now - 120, now=now)
+    assert reason and reason.startswith('missed heartbeat')
+
+
+def test_group_cpu_ticks_counts_this_process_group():
+    before = group_cpu_ticks(os.getpgid(0))
+    if before is None:
+        return      # no /proc
+    deadline = time.process_time() + 0.1
+    while time.process_time() < deadline:
+        pass
+    assert group_cpu_ticks(os.getpgid(0)) > before
+
+
+def test_silent_running_agent_keeps_beating_by_default():
+    path = heartbeat_path('hb-silent')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    beat = AgentBeat(path, 4242, cpu_ticks=Clock(), interval=5)
+    # No output and no CPU time for 20 minutes: waiting on the model
+    for now in range(1000, 2200, 5):
+        assert beat.tick(10, now=now)
+    assert read_heartbeat('hb-silent')['ts'] == 2195
+    assert Watchdog().check('hb-silent', started=1000, now=2196) is None
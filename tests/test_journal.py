@@ -0,0 +1,72 @@
+"""Write-ahead journal replay and scheduler adoption."""
+
+import subprocess
+
+from auto_cursor import agent_state
+from auto_cursor.journal import Journal
+from auto_cursor.scheduler import Scheduler
+
+
+def test_replay_folds_records_in_order(make_project):
+    project_id, _ = make_project([{'id': 'a'}])
+    journal = Journal(project_id)
+    journal.append('status', 'a', status='running')
+    journal.append('spawn', 'a', pid=1234)
+    journal.append('exit', 'a', code=0)
+    journal.append('qa', 'a', passed=True, cached=True)
+    journal.append('status', 'a', status='qa_passed')
+
+    state, replayed = Journal(project_id).recover()
+
+    assert replayed == 5
+    assert state['a']['status'] == 'qa_passed'
+    assert (state['a']['pid'], state['a']['exit_code']) == (1234, 0)
+    assert (state['a']['qa'], state['a']['qa_cached']) == ('passed', True)
+    assert journal.path.read_text() == ''
+
+
+def test_replay_after_a_crash_before_truncation_is_idempotent(make_project):
+    project_id, _ = make_project([{'id': 'a'}])
+    journal = Journal(project_id)
+    journal.append('status', 'a', status='failed')
+    journal.append('retry', 'a', retry_count=1, due=100.0)
+    journal.append('status', 'a', status='retry_wait')
+    records = journal.path.read_text()
+
+    state, _ = journal.checkpoint()
+    expected = {task_id: dict(entry) for task_id, entry in state.items()}
+    # Crash between writing the checkpoint and truncating the journal
+    journal.path.write_text(records + '{"e": "status", "task": "a", "sta')
+
+    recovered, replayed = Journal(project_id).recover()
+
+    assert replayed == 3
+    assert recovered == expected
+    assert recovered['a']['retry_count'] == 1
+
+
+def test_scheduler_adopts_running_agents_and_retries_from_the_journal(make_project):
+    project_id, orchestration = make_project([{'id': 'a'}, {'id': 'b'}], {'retry_base_seconds': 60})
+    scheduler = Scheduler(orchestration)
+    a, b = scheduler.tasks[f'{project_id}-a'], scheduler.tasks[f'{project_id}-b']
+    agent = subprocess.Popen(['sleep', '30'])
+    try:
+        scheduler.set_status(a, 'running')
+        scheduler._started(a, agent.pid, child=False)
+        scheduler.set_status(b, 'failed')
+        scheduler.maybe_retry(b)
+        # The status files are stale; the journal is what counts
+        agent_state.set_agent_status(a.id, 'pending', project_id)
+        agent_state.set_agent_status(b.id, 'pending', project_id)
+
+        restarted = Scheduler(orchestration)
+        restarted.adopt_existing()
+
+        a, b = restarted.tasks[a.id], restarted.tasks[b.id]
+        assert (a.status, a.pid) == ('running', agent.pid)
+        assert a.id in restarted.watcher.watched
+        assert (b.status, b.retry_count) == ('retry_wait', 1)
+        assert b.id in restarted.retries
+    finally:
+        agent.kill()
+        agent.wait()
@@ -0,0 +1,39 @@
+"""Incremental log indexing."""
+
+import os
+
+from auto_cursor.log_index import LogIndex
+
+
+def _lines(index, query):
+    return [hit['line'] for hit in index.search('p', query)]
+
+
+def test_appends_index_only_new_lines(tmp_path):
+    index = LogIndex(tmp_path / 'index.db')
+    log = tmp_path / 'qa.log'
+    log.write_text('lint passed\n')
+    assert index.update_file('p', 't', 'qa', log) == 1
+
+    with open(log, 'a') as f:
+        f.write('tests passed\n')
+
+    assert index.update_file('p', 't', 'qa', log) == 1
+    assert _lines(index, 'passed') == ['lint passed', 'tests passed']
+
+
+def test_log_rewritten_in_place_is_reindexed(tmp_path):
+    index = LogIndex(tmp_path / 'index.db')
+    log = tmp_path / 'qa.log'
+    log.write_text('FAIL: test_login\n')
+    index.update_file('p', 't', 'qa', log)
+    inode = os.stat(log).st_ino
+
+    # The next QA attempt truncates the same file and writes a longer log
+    with open(log, 'w') as f:
+        f.write('PASS: test_login\nPASS: test_logout\n')
+
+    assert os.stat(log).st_ino == inode
+    assert index.update_file('p', 't', 'qa', log) == 2
+    assert _lines(index, 'FAIL') == []
+    assert _lines(index, 'test_logout') == ['PASS: test_logout']
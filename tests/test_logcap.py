@@ -0,0 +1,73 @@
+"""Log capture: the raw log, its structured sidecar and the exit code."""
+
+import sys
+
+from auto_cursor import logcap
+from auto_cursor.heartbeat import exit_path
+
+
+def test_capture_records_the_exit_code_next_to_the_heartbeat(tmp_path):
+    heartbeat = tmp_path / 'agent.heartbeat'
+    command = [sys.executable, '-c', 'import sys; print("boom"); sys.exit(3)']
+
+    assert logcap.capture(command, tmp_path / 'agent.log', echo=False, heartbeat=heartbeat) == 3
+    assert exit_path(heartbeat).read_text() == '3\n'
+    assert (tmp_path / 'agent.log').read_text() == 'boom\n'
+
+
+def test_records_are_stripped_and_classified_per_stream(tmp_path):
+    command = [sys.executable, '-c',
+               'import sys; print("\\x1b[32mall tests passed\\x1b[0m"); sys.stdout.flush(); '
+               'print("\\x1b[31mError: disk full\\x1b[0m", file=sys.stderr)']
+
+    logcap.capture(command, tmp_path / 'agent.log', echo=False)
+
+    records, _ = logcap.read_from(tmp_path / 'agent.log')
+    assert [(r['seq'], r['stream'], r['level'], r['msg']) for r in records] == [
+        (0, 'stdout', 'success', 'all tests passed'),
+        (1, 'stderr', 'error', 'Error: disk full'),
+    ]
+
+
+def _write_records(log, count):
+    writer = logcap.CaptureWriter(log)
+    for seq in range(count):
+        writer.write('stdout', f'line {seq}', ts=1000.0 + seq / 10)
+    writer.close()
+
+
+def test_time_range_reads_from_the_preceding_index_entry(tmp_path):
+    log = tmp_path / 'agent.log'
+    _write_records(log, 1000)
+    index = logcap.read_index(log)
+    assert [seq for _, seq, _ in index] == list(range(0, 1000, logcap.INDEX_EVERY))
+
+    # Put the first record's timestamp inside the range: a reader that
+    # scanned from the start of the file would return it
+    records_path, _ = logcap.sidecar_paths(log)
+    data = records_path.read_bytes()
+    records_path.write_bytes(data.replace(b'"ts": 1000.0,', b'"ts": 1050.2,', 1))
+
+    matched = logcap.records_between(log, 1050.0, 1050.4)
+
+    assert [r['seq'] for r in matched] == [500, 501, 502, 503, 504]
+
+
+def test_tail_seeks_near_the_end_and_skips_a_partial_record(tmp_path, monkeypatch):
+    log = tmp_path / 'agent.log'
+    _write_records(log, 1000)
+    records_path, _ = logcap.sidecar_paths(log)
+    size = records_path.stat().st_size
+    with open(records_path, 'ab') as f:
+        f.write(b'{"ts": 1100.0, "seq": 1000, "str')
+    offsets = []
+    read_from = logcap.read_from
+    monkeypatch.setattr(logcap, 'read_from',
+                        lambda path, offset=0, limit=None: offsets.append(offset) or read_from(path, offset, limit))
+
+    records, end = logcap.tail(log, 150)
+
+    assert [r['seq'] for r in records] == list(range(850, 1000))
+    assert end == size
+    # Started at the index entry at or before seq 900 - 150, not at the top
+    assert offsets == [dict((seq, offset) for _, seq, offset in logcap.read_index(log))[700]]
@@ -0,0 +1,88 @@
+"""Merge planning: merge-tree dry runs, batches and predicted conflicts."""
+
+import json
+import subprocess
+
+from auto_cursor import merge_plan
+from auto_cursor.common import PROJECTS_DIR, WORKTREES_DIR
+
+
+def _git(repo, *args):
+    subprocess.run(['git', '-C', str(repo)] + list(args), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _branch(repo, task_id, files, orphan=False):
+    if orphan:
+        _git(repo, 'checkout', '-q', '--orphan', f'auto-cursor/{task_id}')
+        _git(repo, 'rm', '-rfq', '.')
+    else:
+        _git(repo, 'checkout', '-q', '-b', f'auto-cursor/{task_id}', 'main')
+    for path, text in files.items():
+        (repo / path).write_text(text)
+    _git(repo, 'add', '-A')
+    _git(repo, 'commit', '-q', '-m', task_id)
+    _git(repo, 'checkout', '-q', '-f', 'main')
+
+
+def _project(git_repo, make_project, branches):
+    """
+    A project whose completed tasks have worktrees and the given branches.
+
+    Args:
+        branches: task -> (dependencies, files the branch writes, or None
+            for no branch, and whether the branch has its own history)
+    """
+    repo = git_repo({'api.py': 'x = 1\n', 'web.html': '<p>\n'})
+    project_id, _ = make_project([{'id': task, 'dependencies': deps} for task, (deps, _, _) in branches.items()])
+    project_dir = PROJECTS_DIR / project_id
+    (project_dir / 'config.json').write_text(json.dumps({'path': str(repo)}))
+    tasks = []
+    for task, (deps, files, orphan) in branches.items():
+        task_id = f'{project_id}-{task}'
+        tasks.append({'id': task_id, 'status': 'completed', 'dependencies': [f'{project_id}-{d}' for d in deps]})
+        (WORKTREES_DIR / f'auto-cursor-{project_id}-{task_id}').mkdir(parents=True)
+        if files is not None:
+            _branch(repo, task_id, files, orphan)
+    (project_dir / 'tasks.json').write_text(json.dumps(tasks))
+    return project_id
+
+
+def test_clean_branches_batch_and_conflicts_merge_alone(git_repo, make_project):
+    project_id = _project(git_repo, make_project, {
+        'a': ([], {'api.py': 'x = 2\n'}, False),
+        'b': ([], {'web.html': '<div>\n'}, False),
+        'c': ([], {'api.py': 'x = 3\n'}, False),
+        'd': (['c'], {'docs.md': 'c and d\n'}, False),
+    })
+    ids = {task: f'{project_id}-{task}' for task in 'abcd'}
+
+    report = merge_plan.plan(project_id)
+
+    assert [(step['kind'], step['tasks']) for step in report['steps']] == [
+        ('batch', [ids['a'], ids['b']]),
+        ('conflict', [ids['c']]),
+        ('batch', [ids['d']]),
+    ]
+    assert report['predicted_conflicts'] == {ids['c']: {'api.py': [ids['a']]}}
+    assert report['conflicting_files'] == ['api.py']
+    # a, b, c and d against the target, and only a and c against each other
+    assert report['dry_runs'] == 5
+
+
+def test_branches_git_cannot_merge_fall_back_to_single_steps(git_repo, make_project, capsys):
+    project_id = _project(git_repo, make_project, {
+        'a': ([], {'api.py': 'x = 2\n'}, False),
+        'orphan': ([], {'other.py': 'y = 1\n'}, True),
+        'nobranch': ([], None, False),
+    })
+
+    assert merge_plan.main([project_id, '--steps']) == 0
+
+    assert capsys.readouterr().out.splitlines() == [
+        f'batch\t{project_id}-a',
+        f'conflict\t{project_id}-orphan',
+        f'copy\t{project_id}-nobranch',
+    ]
+    step = merge_plan.plan(project_id)['steps'][1]
+    assert step['unmergeable']
@@ -0,0 +1,115 @@
+"""Plan cache: keying, hits and misses, eviction and the planner's bypass."""
+
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from auto_cursor import plan_cache
+
+PLANNER = Path(__file__).resolve().parents[1] / 'bin' / 'auto-cursor-planner'
+
+PLAN = [{'id': 'api', 'description': 'Build the API', 'dependencies': [], 'complexity': 'medium',
+         'directory': 'api', 'estimated_hours': 3}]
+
+STUB_AGENT = """#!/bin/sh
+echo call >> "{calls}"
+echo '{plan}'
+"""
+
+
+def test_key_covers_goal_complexity_repository_memory_and_planner(git_repo, tmp_path):
+    repo = git_repo({'app.py': 'x = 1\n'})
+    memory = tmp_path / 'memory.json'
+    memory.write_text(json.dumps({'successful_patterns': ['small tasks'], 'total_successful_builds': 1}))
+    planner = tmp_path / 'planner'
+    planner.write_text('prompt v1\n')
+
+    def key(goal='Add a login API', complexity=''):
+        return plan_cache.cache_key(goal, repo, complexity, memory, planner)
+
+    base = key()
+    assert key('  Add a   login API\n') == base
+    assert key(complexity='simple') != base
+
+    # Memory fields that are not injected into the prompt don't matter
+    memory.write_text(json.dumps({'successful_patterns': ['small tasks'], 'total_successful_builds': 2}))
+    assert key() == base
+    memory.write_text(json.dumps({'successful_patterns': ['small tasks', 'tests first']}))
+    changed_memory = key()
+    assert changed_memory != base
+
+    planner.write_text('prompt v2\n')
+    changed_planner = key()
+    assert changed_planner != changed_memory
+
+    # Uncommitted and untracked changes count, not only HEAD
+    (repo / 'notes.md').write_text('todo\n')
+    assert key() != changed_planner
+
+
+def test_lookup_counts_hits_and_misses_and_expires_old_plans(monkeypatch, tmp_path):
+    monkeypatch.setattr(plan_cache, 'CACHE_DIR', tmp_path / 'plan-cache')
+    monkeypatch.setattr(plan_cache, 'STATS_FILE', tmp_path / 'plan-cache' / 'stats.json')
+
+    assert plan_cache.lookup('k1') is None
+    plan_cache.store('k1', PLAN, goal='Build the API')
+    assert plan_cache.lookup('k1') == PLAN
+    assert (plan_cache.stats()['hits'], plan_cache.stats()['misses']) == (1, 1)
+
+    entry = json.loads((tmp_path / 'plan-cache' / 'k1.json').read_text())
+    entry['created'] -= (plan_cache.MAX_AGE_DAYS + 1) * 86400
+    (tmp_path / 'plan-cache' / 'k1.json').write_text(json.dumps(entry))
+    assert plan_cache.lookup('k1') is None
+
+
+def test_prune_evicts_least_recently_used_first(monkeypatch, tmp_path):
+    monkeypatch.setattr(plan_cache, 'CACHE_DIR', tmp_path / 'plan-cache')
+    monkeypatch.setattr(plan_cache, 'STATS_FILE', tmp_path / 'plan-cache' / 'stats.json')
+    for number, key in enumerate(('old', 'used', 'new')):
+        plan_cache.store(key, PLAN)
+        path = tmp_path / 'plan-cache' / f'{key}.json'
+        os.utime(path, (time.time() - 100 + number, time.time() - 100 + number))
+    plan_cache.lookup('used')
+    size = (tmp_path / 'plan-cache' / 'old.json').stat().st_size
+
+    assert plan_cache.prune(max_size_mb=2.5 * size / (1024 * 1024)) == 1
+
+    assert sorted(p.stem for p in plan_cache._entries()) == ['new', 'used']
+
+
+@pytest.fixture
+def planner(tmp_path):
+    """Run auto-cursor-planner against a stub cursor-agent; returns (run, calls)."""
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    calls = tmp_path / 'calls'
+    agent = bin_dir / 'cursor-agent'
+    agent.write_text(STUB_AGENT.format(calls=calls, plan=json.dumps(PLAN)))
+    agent.chmod(0o755)
+    env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}", AUTO_CURSOR_RETRIEVAL='off')
+
+    def run(*args):
+        result = subprocess.run([str(PLANNER)] + list(args), env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        return json.loads(result.stdout), result.stderr
+
+    return run, calls
+
+
+def test_planner_reuses_cached_plans_unless_bypassed(planner, git_repo):
+    run, calls = planner
+    repo = str(git_repo({'app.py': 'x = 1\n'}))
+
+    first, log = run('Build the API', repo)
+    assert first == PLAN and 'Plan cache miss' in log
+    again, log = run('Build the API', repo)
+    assert again == PLAN and 'Plan cache hit' in log
+    assert len(calls.read_text().splitlines()) == 1
+
+    bypassed, log = run('--no-cache', 'Build the API', repo)
+    assert bypassed == PLAN and 'Plan cache' not in log
+    assert len(calls.read_text().splitlines()) == 2
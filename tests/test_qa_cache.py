@@ -0,0 +1,77 @@
+"""QA verdict cache: worktree keys and which verdicts are reused."""
+
+import json
+import os
+import subprocess
+import time
+import uuid
+
+from auto_cursor import qa_cache
+
+
+def _repo(tmp_path):
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    env = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.com',
+               GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.com')
+    (repo / 'app.py').write_text('print("hi")\n')
+    for args in (['init', '-q'], ['add', '.'], ['commit', '-q', '-m', 'base']):
+        subprocess.run(['git', '-C', str(repo)] + args, check=True, env=env, stdout=subprocess.DEVNULL)
+    return repo
+
+
+def test_key_follows_the_worktree_without_touching_the_index(tmp_path):
+    repo = _repo(tmp_path)
+    wrapper = tmp_path / 'qa-wrapper.sh'
+    wrapper.write_text('exit 0\n')
+    index = (repo / '.git' / 'index').read_bytes()
+
+    key, tree = qa_cache.cache_key(repo, wrapper)
+    assert qa_cache.cache_key(repo, wrapper) == (key, tree)
+    head_tree = subprocess.run(['git', '-C', str(repo), 'rev-parse', 'HEAD^{tree}'],
+                               stdout=subprocess.PIPE, text=True).stdout.strip()
+    assert tree == head_tree
+
+    # Untracked files count, and the real index is left alone
+    (repo / 'new.py').write_text('x = 1\n')
+    changed, _ = qa_cache.cache_key(repo, wrapper)
+    assert changed != key
+    assert (repo / '.git' / 'index').read_bytes() == index
+
+    # So does the QA wrapper
+    (repo / 'new.py').unlink()
+    wrapper.write_text('exit 1\n')
+    assert qa_cache.cache_key(repo, wrapper)[0] != key
+
+
+def test_directories_outside_git_are_hashed_by_content(tmp_path):
+    (tmp_path / 'plain').mkdir()
+    (tmp_path / 'plain' / 'a.txt').write_text('a')
+    key, tree = qa_cache.cache_key(tmp_path / 'plain', tmp_path / 'missing-wrapper')
+    assert tree.startswith('content-')
+    (tmp_path / 'plain' / 'a.txt').write_text('b')
+    assert qa_cache.cache_key(tmp_path / 'plain', tmp_path / 'missing-wrapper')[0] != key
+
+
+def test_passes_are_reused_and_failures_are_not(tmp_path):
+    log = tmp_path / 'qa.log'
+    log.write_text('all good\n')
+    passed, failed = uuid.uuid4().hex, uuid.uuid4().hex
+
+    assert qa_cache.lookup(passed) is None
+    qa_cache.store(passed, 'tree', True, 0, log)
+    qa_cache.store(failed, 'tree', False, 1, log)
+
+    entry = qa_cache.lookup(passed)
+    assert entry['passed'] and entry['exit_code'] == 0
+    with open(entry['log_path']) as f:
+        assert f.read() == 'all good\n'
+    assert qa_cache.lookup(failed) is None
+
+
+def test_failed_entries_from_older_caches_are_ignored():
+    key = uuid.uuid4().hex
+    qa_cache.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    (qa_cache.CACHE_DIR / f'{key}.json').write_text(json.dumps(
+        {'passed': False, 'exit_code': 1, 'tree': 'tree', 'created': time.time()}))
+    assert qa_cache.lookup(key) is None
@@ -0,0 +1,99 @@
+"""Conflict resolution through the hunk cache, with a stub cursor-agent."""
+
+import os
+import subprocess
+
+import pytest
+
+from auto_cursor.resolve import ResolutionCache, resolve
+
+STUB_AGENT = """#!/bin/sh
+echo call >> "{calls}"
+echo "Resolving the conflict"
+echo "timeout = 45"
+"""
+
+
+@pytest.fixture
+def conflicted_repo(tmp_path, monkeypatch):
+    """
+    A repo with branches whose merge conflicts on one line, and a stub
+    cursor-agent on PATH that records its calls.
+
+    Returns:
+        tuple: (repo, calls file, function that starts the conflicting merge)
+    """
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    calls = tmp_path / 'calls'
+    agent = bin_dir / 'cursor-agent'
+    agent.write_text(STUB_AGENT.format(calls=calls))
+    agent.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    for name in ('AUTHOR', 'COMMITTER'):
+        monkeypatch.setenv(f'GIT_{name}_NAME', 'test')
+        monkeypatch.setenv(f'GIT_{name}_EMAIL', 'test@example.com')
+
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+
+    def git(*args):
+        return subprocess.run(['git', '-C', str(repo)] + list(args), check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    git('init', '-q', '-b', 'main')
+    config = repo / 'config.py'
+    config.write_text('host = "localhost"\ntimeout = 10\nretries = 3\n')
+    git('add', '.')
+    git('commit', '-q', '-m', 'base')
+    for branch, timeout in (('task-a', 30), ('task-b', 60)):
+        git('checkout', '-q', '-b', branch, 'main')
+        config.write_text(f'host = "localhost"\ntimeout = {timeout}\nretries = 3\n')
+        git('commit', '-q', '-am', branch)
+    git('checkout', '-q', 'task-a')
+
+    def merge():
+        git('reset', '-q', '--hard', 'task-a')
+        result = subprocess.run(['git', '-C', str(repo), 'merge', '-q', 'task-b'],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        assert result.returncode != 0
+
+    return repo, calls, merge
+
+
+def _calls(calls):
+    return len(calls.read_text().splitlines()) if calls.exists() else 0
+
+
+def test_replayed_conflict_is_resolved_from_the_cache(conflicted_repo, tmp_path):
+    repo, calls, merge = conflicted_repo
+    cache = ResolutionCache(tmp_path / 'cache')
+    logs = []
+
+    merge()
+    first = resolve(repo, cache=cache, log=logs.append)
+
+    assert first['resolved'] == ['config.py']
+    assert (first['agent_calls'], first['cache_hits']) == (1, 0)
+    assert _calls(calls) == 1
+    assert (repo / 'config.py').read_text() == 'host = "localhost"\ntimeout = 45\nretries = 3\n'
+
+    merge()
+    replay = resolve(repo, cache=cache, log=logs.append)
+
+    assert replay['resolved'] == ['config.py']
+    assert (replay['agent_calls'], replay['cache_hits']) == (0, 1)
+    assert _calls(calls) == 1
+    assert (repo / 'config.py').read_text() == 'host = "localhost"\ntimeout = 45\nretries = 3\n'
+
+
+def test_failed_agent_reply_leaves_the_file_conflicted(conflicted_repo, tmp_path):
+    repo, _, merge = conflicted_repo
+    (tmp_path / 'bin' / 'cursor-agent').write_text('#!/bin/sh\nexit 1\n')
+
+    merge()
+    report = resolve(repo, cache=ResolutionCache(tmp_path / 'cache'), log=lambda message: None)
+
+    assert report['unresolved'] == ['config.py']
+    assert '<<<<<<<' in (repo / 'config.py').read_text()
+    assert not list((tmp_path / 'cache').glob('*.json'))
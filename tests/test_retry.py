@@ -0,0 +1,39 @@
+"""Retry backoff and the timed retry queue."""
+
+from auto_cursor.retry import RetryPolicy, RetryQueue
+
+
+def test_backoff_doubles_up_to_the_cap():
+    policy = RetryPolicy({'retry_base_seconds': 30, 'retry_max_seconds': 100})
+    assert [policy.delay(n) for n in range(4)] == [30, 60, 100, 100]
+
+
+def test_attempt_limit_and_default_retry_slots():
+    policy = RetryPolicy({'max_retries': 2, 'max_parallel': 5})
+    assert policy.should_retry(1)
+    assert not policy.should_retry(2)
+    assert policy.slots == 2
+    assert RetryPolicy({}).slots is None
+
+
+def test_queue_releases_due_retries_earliest_first():
+    queue = RetryQueue()
+    queue.push('c', 30.0)
+    queue.push('a', 10.0)
+    queue.push('b', 20.0)
+
+    assert queue.seconds_until_next(now=5.0) == 5.0
+    assert queue.pop_due(now=25.0) == ['a', 'b']
+    assert 'c' in queue and len(queue) == 1
+    assert queue.seconds_until_next(now=25.0) == 5.0
+
+
+def test_a_later_push_supersedes_the_earlier_due_time():
+    queue = RetryQueue()
+    queue.push('a', 10.0)
+    queue.push('a', 50.0)
+
+    assert queue.pop_due(now=20.0) == []
+    assert queue.seconds_until_next(now=20.0) == 30.0
+    assert queue.pop_due(now=50.0) == ['a']
+    assert queue.seconds_until_next() is None
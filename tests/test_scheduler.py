@@ -0,0 +1,186 @@
+"""Scheduler retry and dependency transitions."""
+
+from auto_cursor.common import LOG_DIR, QA_DIR, load_json
+from auto_cursor.heartbeat import exit_path, heartbeat_path
+from auto_cursor.scheduler import Scheduler
+
+
+def _plan(make_project, **coordination):
+    project_id, orchestration = make_project([
+        {'id': 'a', 'run_qa': True, 'qa_required': True},
+        {'id': 'b', 'dependencies': ['a']},
+    ], dict({'max_retries': 2}, **coordination))
+    scheduler = Scheduler(orchestration)
+    return scheduler, scheduler.tasks[f'{project_id}-a'], scheduler.tasks[f'{project_id}-b']
+
+
+def _qa_log(task, text):
+    QA_DIR.mkdir(parents=True, exist_ok=True)
+    task.qa_log.write_text(text)
+
+
+def test_retried_qa_failure_is_not_a_met_dependency(make_project):
+    scheduler, a, _ = _plan(make_project)
+    _qa_log(a, 'FAIL: test failed\n')
+    scheduler.set_status(a, 'qa_running')
+
+    scheduler.finish_qa(a, False)
+
+    assert a.status == 'retry_wait'
+    project_task = scheduler.project_tasks[a.id]
+    assert project_task['status'] == 'pending'
+    assert project_task['completed'] is None
+    assert project_task['qa_status'] is None
+    assert not scheduler.dependency_met(a.id)
+    # Same answer from tasks.json on disk, as a restarted scheduler sees it
+    on_disk = {t['id']: t for t in load_json(scheduler.tasks_file)}
+    assert on_disk[a.id]['completed'] is None
+    assert not Scheduler(scheduler.task_file).dependency_met(a.id)
+
+
+def test_stale_completed_timestamp_does_not_satisfy_dependents(make_project):
+    scheduler, a, _ = _plan(make_project)
+    scheduler.project_tasks[a.id].update(status='pending', completed=1.0, qa_status='qa_failed')
+    assert not scheduler.dependency_met(a.id)
+
+
+def test_critical_qa_failure_blocks_without_retries(make_project):
+    scheduler, a, _ = _plan(make_project, max_retries=0)
+    _qa_log(a, 'Traceback (most recent call last):\n')
+    scheduler.set_status(a, 'qa_running')
+
+    scheduler.finish_qa(a, False)
+
+    assert a.status == 'qa_failed'
+    assert scheduler.project_tasks[a.id]['qa_status'] == 'qa_failed'
+    assert not scheduler.dependency_met(a.id)
+
+
+def test_non_critical_qa_failure_unblocks_dependents(make_project):
+    scheduler, a, _ = _plan(make_project, max_retries=0)
+    _qa_log(a, 'docs: 2 spelling warnings\n')
+    scheduler.set_status(a, 'qa_running')
+
+    scheduler.finish_qa(a, False)
+
+    assert scheduler.dependency_met(a.id)
+
+
+def test_qa_failure_without_log_counts_as_critical(make_project):
+    scheduler, a, _ = _plan(make_project)
+    scheduler.project_tasks[a.id].update(status='completed', qa_status='qa_failed')
+    assert not scheduler.dependency_met(a.id)
+
+
+def test_completed_task_unblocks_its_dependents(make_project):
+    scheduler, a, b = _plan(make_project)
+    scheduler.init_dependencies()
+    assert scheduler.unmet[b.id] == {a.id}
+
+    scheduler.set_status(a, 'running')
+    scheduler.set_status(a, 'qa_passed')
+    scheduler.update_project_task(a, 'qa_passed', qa_status='qa_passed', completed=1.0)
+
+    assert scheduler.resolve(a.id) == [b.id]
+
+
+def test_retry_becomes_due_and_returns_to_pending(make_project):
+    scheduler, a, _ = _plan(make_project, retry_base_seconds=0)
+    scheduler.set_status(a, 'running')
+    scheduler.set_status(a, 'failed')
+
+    assert scheduler.maybe_retry(a)
+    assert a.retry_count == 1
+    assert scheduler.release_retries() == [a.id]
+    assert a.status == 'pending'
+
+
+def test_out_of_retries_stays_failed(make_project):
+    scheduler, a, _ = _plan(make_project, max_retries=1)
+    a.retry_count = 1
+    scheduler.set_status(a, 'failed')
+
+    assert not scheduler.maybe_retry(a)
+    assert a.status == 'failed'
+
+
+def test_launch_counts_only_started_agents(make_project, monkeypatch, tmp_path):
+    scheduler, a, b = _plan(make_project, retry_base_seconds=60)
+    a.directory = str(tmp_path / 'missing')
+    # The wrapper can't be executed: Popen raises instead of starting b
+    monkeypatch.setattr('auto_cursor.scheduler.AGENT_WRAPPER', str(tmp_path / 'no-wrapper'))
+
+    assert scheduler.launch([a, b]) == 0
+
+    for task in (a, b):
+        assert task.status == 'retry_wait'
+        assert task.retry_count == 1
+        assert scheduler.project_tasks[task.id]['status'] == 'pending'
+    assert 'does not exist' in load_json(scheduler.tasks_file)[0]['error']
+
+
+def _retrying(make_project, first_attempt_dependencies):
+    """Four slots, three failed tasks due for a retry and one first attempt."""
+    project_id, orchestration = make_project([
+        {'id': 'r1'}, {'id': 'r2'}, {'id': 'r3'},
+        {'id': 'fresh', 'dependencies': first_attempt_dependencies},
+    ], {'max_parallel': 4})
+    scheduler = Scheduler(orchestration)
+    scheduler.init_dependencies()
+    retries = [scheduler.tasks[f'{project_id}-r{n}'] for n in (1, 2, 3)]
+    for task in retries:
+        task.retry_count = 1
+        task.status = 'pending'
+    return scheduler, [task.id for task in retries]
+
+
+def test_retry_cap_holds_slots_for_waiting_first_attempts(make_project):
+    scheduler, retries = _retrying(make_project, [])
+    scheduler.tasks[retries[0]].status = 'running'
+
+    assert scheduler.retry_policy.slots == 2
+    assert scheduler.retry_slot_available(retries[1], [])
+    assert not scheduler.retry_slot_available(retries[2], [retries[1]])
+
+
+def test_retries_fill_free_slots_once_no_first_attempt_waits(make_project):
+    scheduler, retries = _retrying(make_project, [])
+    fresh = next(task for task in scheduler.tasks.values() if task.retry_count == 0)
+    fresh.status = 'completed'
+    scheduler.tasks[retries[0]].status = 'running'
+
+    assert scheduler.retry_slot_available(retries[1], [])
+    assert scheduler.retry_slot_available(retries[2], [retries[1]])
+
+
+def test_first_attempts_blocked_on_a_retry_do_not_hold_slots(make_project):
+    scheduler, retries = _retrying(make_project, ['r1'])
+    scheduler.tasks[retries[0]].status = 'running'
+
+    assert not scheduler.first_attempts_waiting()
+    assert scheduler.retry_slot_available(retries[2], [retries[1]])
+
+
+def test_crashed_tmux_agent_is_failed_and_retried(make_project):
+    scheduler, a, _ = _plan(make_project, retry_base_seconds=60)
+    scheduler.set_status(a, 'running')
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    # tmux agents are not our children: the exit code comes from logcap
+    exit_path(heartbeat_path(a.id)).write_text('1\n')
+
+    scheduler.handle_exit(a, None)
+
+    assert a.status == 'retry_wait'
+    assert 'exited with code 1' in load_json(scheduler.tasks_file)[0]['error']
+
+
+def test_clean_tmux_exit_completes(make_project):
+    scheduler, a, _ = _plan(make_project)
+    a.run_qa = False
+    scheduler.set_status(a, 'running')
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    exit_path(heartbeat_path(a.id)).write_text('0\n')
+
+    scheduler.handle_exit(a, None)
+
+    assert a.status == 'completed'
@@ -0,0 +1,80 @@
+"""Cross-project task retrieval index."""
+
+import json
+import os
+
+from auto_cursor.common import PROJECTS_DIR
+from auto_cursor.task_index import TaskIndex
+
+
+def _finish(project_id, task_id, description, status='completed'):
+    tasks_file = PROJECTS_DIR / project_id / 'tasks.json'
+    tasks = [t for t in json.loads(tasks_file.read_text()) if t['id'] != task_id]
+    tasks.append({'id': task_id, 'description': description, 'status': status, 'created': 1})
+    tasks_file.write_text(json.dumps(tasks))
+    # Same-size rewrites within one mtime tick must still look changed
+    stat = tasks_file.stat()
+    os.utime(tasks_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_query_ranks_by_bm25_and_excludes_the_project(make_project, tmp_path):
+    mine, _ = make_project([{'id': 'a'}])
+    other, _ = make_project([{'id': 'a'}])
+    _finish(mine, f'{mine}-a', 'JWT login API for users')
+    _finish(other, f'{other}-a', 'JWT login API for admin')
+    _finish(other, f'{other}-b', 'Dashboard charts')
+
+    index = TaskIndex(tmp_path / 'index.db')
+    assert index.update([mine, other]) == 3
+
+    hits = index.query('Build a JWT login API', exclude_project=mine)
+    assert [doc['task'] for _, doc in hits] == [f'{other}-a']
+    assert index.query('the and of') == []
+
+
+def test_update_rewrites_only_changed_projects(make_project, tmp_path):
+    project_id, _ = make_project([{'id': 'a'}])
+    _finish(project_id, f'{project_id}-a', 'Add search page')
+    index = TaskIndex(tmp_path / 'index.db')
+    index.update([project_id])
+
+    assert index.update([project_id]) == 0
+
+    _finish(project_id, f'{project_id}-a', 'Add billing page', status='failed')
+    assert index.update([project_id]) == 1
+    assert index.query('search') == []
+    (_, doc), = index.query('billing')
+    assert doc['status'] == 'failed'
+    assert index.stats()['tasks'] == 1
+
+
+def test_query_without_fts5_scans_and_ranks_by_bm25(make_project, tmp_path, monkeypatch):
+    from auto_cursor import task_index
+
+    mine, _ = make_project([{'id': 'a'}])
+    other, _ = make_project([{'id': 'a'}])
+    _finish(mine, f'{mine}-a', 'JWT login API for users')
+    _finish(other, f'{other}-a', 'JWT login API for admin')
+    _finish(other, f'{other}-b', 'Login page styling')
+    _finish(other, f'{other}-c', 'Dashboard charts')
+    _finish(other, f'{other}-d', 'Email alerts')
+    _finish(other, f'{other}-e', 'Billing export')
+    # As on an SQLite built without FTS5
+    monkeypatch.setattr(task_index, 'FTS_SCHEMA',
+                        'CREATE VIRTUAL TABLE IF NOT EXISTS terms USING no_such_module(text);')
+
+    index = TaskIndex(tmp_path / 'index.db')
+    assert not index.fts
+    assert index.update([mine, other]) == 6
+
+    hits = index.query('Build a JWT login API', exclude_project=mine)
+    assert [doc['task'] for _, doc in hits] == [f'{other}-a', f'{other}-b']
+    assert hits[0][0] > hits[1][0]
+    assert index.query('the and of') == []
+    index.close()
+
+    # An SQLite with FTS5 takes the scanned terms over
+    monkeypatch.undo()
+    index = TaskIndex(tmp_path / 'index.db')
+    assert index.fts
+    assert [doc['task'] for _, doc in index.query('dashboard')] == [f'{other}-c']
@@ -0,0 +1,100 @@
+"""Trace events: B/E/X pairing, slot lanes, export and the idle-time summary."""
+
+import json
+
+from auto_cursor import trace
+from auto_cursor.trace import AGENT_SLOTS, INTEGRATION, QA_SLOTS, TASKS, TaskTracer, Tracer
+
+SECOND = 1_000_000
+
+
+def _spans(path):
+    return [(s['name'], s['group'], s['lane'], s['task']) for s in trace.spans(trace.read_events(path))]
+
+
+def test_status_changes_become_paired_phase_spans_on_the_lowest_free_slot(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    tracer = TaskTracer(path)
+    for status in ('waiting', 'queued', 'spawn', 'running'):
+        tracer.phase('a', 0, status)
+    tracer.phase('b', 1, 'running')
+    # A repeated status keeps the phase open instead of splitting it
+    tracer.phase('a', 0, 'running')
+    tracer.phase('a', 0, 'qa_running')
+    tracer.phase('c', 2, 'running')
+    tracer.phase('a', 0, 'qa_passed')
+    for task in ('b', 'c'):
+        tracer.phase(task, 0, 'completed')
+
+    assert sorted(_spans(path)) == sorted([
+        ('blocked on dependencies', TASKS, 1, 'a'),
+        ('queued for a slot', TASKS, 1, 'a'),
+        ('spawn', TASKS, 1, 'a'),
+        ('run', AGENT_SLOTS, 1, 'a'),
+        ('run', AGENT_SLOTS, 2, 'b'),
+        ('QA', QA_SLOTS, 1, 'a'),
+        # a's agent slot was free again
+        ('run', AGENT_SLOTS, 1, 'c'),
+    ])
+
+
+def test_unmatched_begins_end_at_the_next_begin_or_the_end_of_the_trace(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    tracer = Tracer(path)
+    tracer.begin('run', AGENT_SLOTS, 1, 'a', ts=1 * SECOND)
+    # The scheduler restarted: a's next phase begins without an end
+    tracer.begin('QA', QA_SLOTS, 1, 'a', ts=3 * SECOND)
+    # An end for a phase that isn't open is ignored
+    tracer.end('run', AGENT_SLOTS, 1, 'a', ts=4 * SECOND)
+    tracer.begin('merge', INTEGRATION, 0, ts=5 * SECOND)
+    tracer.end('merge', INTEGRATION, 0, ts=6 * SECOND)
+    tracer.complete('worktree', INTEGRATION, 2, 0.5, 2.5, 'b', method='new')
+
+    spans = {(s['name'], s['task']): (s['start'], s['end']) for s in trace.spans(trace.read_events(path))}
+
+    assert spans == {
+        ('worktree', 'b'): (int(0.5 * SECOND), int(2.5 * SECOND)),
+        ('run', 'a'): (1 * SECOND, 3 * SECOND),
+        ('QA', 'a'): (3 * SECOND, 6 * SECOND),
+        ('merge', None): (5 * SECOND, 6 * SECOND),
+    }
+
+
+def test_export_is_complete_events_relative_to_the_first(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    tracer = Tracer(path)
+    tracer.begin('run', AGENT_SLOTS, 1, 'a', ts=10 * SECOND)
+    tracer.end('run', AGENT_SLOTS, 1, 'a', ts=12 * SECOND)
+    tracer.begin('blocked on dependencies', TASKS, 2, 'b', ts=10 * SECOND)
+    tracer.end('blocked on dependencies', TASKS, 2, 'b', ts=12 * SECOND)
+
+    exported = json.loads(json.dumps(trace.chrome_trace(trace.read_events(path), 'p')))
+
+    events = [e for e in exported['traceEvents'] if e['ph'] == 'X']
+    assert sorted((e['name'], e['ts'], e['dur']) for e in events) == [
+        ('blocked on dependencies', 0, 2 * SECOND), ('run a', 0, 2 * SECOND)]
+    names = {(e['pid'], e['tid']): e['args']['name'] for e in exported['traceEvents']
+             if e['ph'] == 'M' and e['name'] == 'thread_name'}
+    assert names == {(AGENT_SLOTS, 1): 'slot 1', (TASKS, 2): 'b'}
+
+
+def test_summary_splits_idle_slot_time_by_cause(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    tracer = Tracer(path)
+    tracer.emit({'ph': 'i', 's': 'g', 'name': 'scheduler start', 'pid': TASKS, 'tid': 0, 'ts': 100 * SECOND,
+                 'args': {'slots': 2}})
+    # Two slots: a runs for 10s while b waits on it, then b runs for 10s alone
+    tracer.begin('run', AGENT_SLOTS, 1, 'a', ts=100 * SECOND)
+    tracer.end('run', AGENT_SLOTS, 1, 'a', ts=110 * SECOND)
+    tracer.begin('blocked on dependencies', TASKS, 2, 'b', ts=100 * SECOND)
+    tracer.end('blocked on dependencies', TASKS, 2, 'b', ts=110 * SECOND)
+    tracer.begin('run', AGENT_SLOTS, 1, 'b', ts=110 * SECOND)
+    tracer.end('run', AGENT_SLOTS, 1, 'b', ts=120 * SECOND)
+
+    summary = trace.summarize(trace.read_events(path))
+
+    assert (summary['slots'], summary['peak_running'], summary['average_running']) == (2, 1, 1.0)
+    assert (summary['slot_busy_seconds'], summary['slot_idle_seconds']) == (20.0, 20.0)
+    assert summary['idle_while_blocked_seconds'] == 10.0
+    assert summary['blocked_by_task'] == {'b': 10.0}
+    assert summary['slot_busy'] == {'1': 20.0}
@@ -0,0 +1,53 @@
+"""Plan shape: width and recommended parallelism."""
+
+import itertools
+import random
+
+from auto_cursor.validator import max_antichain, validate
+
+
+def _task(task_id, hours, *dependencies):
+    return {'id': task_id, 'description': task_id, 'estimated_hours': hours, 'dependencies': list(dependencies)}
+
+
+def test_width_counts_tasks_at_different_depths_that_can_run_together():
+    # p1 -> p2 -> p3, r after p1 and s after p2: q1, r, s and p3 can all run
+    # at once, though no dependency level holds more than two of them
+    tasks = [_task('p1', 1), _task('p2', 1, 'p1'), _task('p3', 1, 'p2'),
+             _task('q1', 3), _task('r', 2, 'p1'), _task('s', 1, 'p2')]
+
+    shape = validate(tasks)['shape']
+
+    assert (shape['levels'], shape['widest_level']) == (3, 2)
+    assert shape['max_width'] == 4
+    # 9 hours of work over a 3 hour critical path
+    assert shape['recommended_parallel'] == 3
+
+
+def test_tasks_behind_a_cycle_do_not_count_towards_the_width():
+    tasks = [_task('a', 1, 'b'), _task('b', 1, 'a'), _task('c', 1, 'a'), _task('d', 1), _task('e', 1)]
+
+    shape = validate(tasks)['shape']
+
+    assert shape['runnable_tasks'] == 2
+    assert shape['max_width'] == 2
+
+
+def test_max_antichain_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(200):
+        order = [f't{i}' for i in range(rng.randint(1, 8))]
+        dependencies = {task_id: [dep for dep in order[:i] if rng.random() < 0.3]
+                        for i, task_id in enumerate(order)}
+        reaches = {}
+        for task_id in order:
+            reaches[task_id] = set(dependencies[task_id])
+            for dep in dependencies[task_id]:
+                reaches[task_id] |= reaches[dep]
+
+        def independent(group):
+            return all(a not in reaches[b] and b not in reaches[a] for a, b in itertools.combinations(group, 2))
+
+        expected = max(size for size in range(1, len(order) + 1)
+                       if any(independent(group) for group in itertools.combinations(order, size)))
+        assert max_antichain(order, dependencies) == expected
@@ -0,0 +1,136 @@
+"""Worktree provisioning: fresh, sparse and from the warm pool."""
+
+import shutil
+import subprocess
+
+from auto_cursor import worktrees
+
+
+def _branches(repo):
+    result = subprocess.run(['git', '-C', str(repo), 'branch', '--format=%(refname:short)'],
+                            stdout=subprocess.PIPE, text=True)
+    return set(result.stdout.split())
+
+
+def test_failed_sparse_checkout_drops_the_new_branch(git_repo, tmp_path, monkeypatch):
+    repo = git_repo({'api/app.py': 'x = 1\n', 'web/index.html': '<p>\n'})
+    target = tmp_path / 'worktrees' / 't1'
+    apply_sparse = worktrees.apply_sparse
+    failed = subprocess.CompletedProcess([], 1, '', 'fatal: sparse-checkout failed\n')
+    monkeypatch.setattr(worktrees, 'apply_sparse', lambda worktree, paths: failed)
+
+    result = worktrees.provision_one(repo, 't1', target, True, None, None, ['api'])
+
+    assert result['method'] == 'copy'
+    assert 'auto-cursor/t1' not in _branches(repo)
+
+    # The next provision can create the branch again
+    monkeypatch.setattr(worktrees, 'apply_sparse', apply_sparse)
+    shutil.rmtree(target)
+    again = worktrees.provision_one(repo, 't1', target, True, None, None, ['api'])
+    assert again['method'] == 'new'
+    assert 'auto-cursor/t1' in _branches(repo)
+
+
+def _commit(repo, path, text):
+    (repo / path).write_text(text)
+    for args in (['add', '-A'], ['commit', '-q', '-m', path]):
+        subprocess.run(['git', '-C', str(repo)] + args, check=True, stdout=subprocess.DEVNULL)
+
+
+def test_warm_pool_hands_out_slots_at_the_base_commit(git_repo, tmp_path):
+    repo = git_repo({'app.py': 'x = 1\n'})
+    pool = worktrees.WarmPool(f'pool-{tmp_path.name}', repo, size=2)
+    assert pool.fill() == 2
+    assert pool.fill() == 0
+
+    target = tmp_path / 'worktrees' / 't1'
+    result = worktrees.provision_one(repo, 't1', target, True, worktrees.head_commit(repo), pool)
+
+    assert result['method'] == 'pool'
+    assert (target / 'app.py').read_text() == 'x = 1\n'
+    assert worktrees._git(target, 'branch', '--show-current').stdout.strip() == 'auto-cursor/t1'
+    assert len(pool.slots()) == 1
+
+    # Slots left at an older commit are replaced, not handed out
+    _commit(repo, 'app.py', 'x = 2\n')
+    assert pool.fill() == 2
+    head = worktrees.head_commit(repo)
+    assert {worktrees.head_commit(slot) for slot in pool.slots()} == {head}
+    assert pool.drain() == 2
+
+
+def test_provision_creates_worktrees_in_parallel_and_records_timings(git_repo, make_project, tmp_path):
+    from auto_cursor.common import PROJECTS_DIR, load_json
+
+    repo = git_repo({'app.py': 'x = 1\n'})
+    project_id, _ = make_project([{'id': n, 'directory': str(tmp_path / 'worktrees' / n)} for n in ('a', 'b', 'c')])
+    (PROJECTS_DIR / project_id / 'config.json').write_text(f'{{"path": "{repo}"}}')
+
+    report = worktrees.provision(project_id, jobs=3, pool_size=0)
+
+    assert [(r['task'], r['method']) for r in report['results']] == [
+        (f'{project_id}-{n}', 'new') for n in ('a', 'b', 'c')]
+    assert all((tmp_path / 'worktrees' / n / 'app.py').exists() for n in ('a', 'b', 'c'))
+    timings = load_json(PROJECTS_DIR / project_id / 'worktree-timings.json')
+    assert timings['jobs'] == 3
+    assert all(r['seconds'] >= 0 for r in timings['results'])
+
+    again = worktrees.provision(project_id, jobs=3, pool_size=0)
+    assert worktrees.format_summary(again) == 'All 3 worktrees already exist'
+
+
+def _files(root):
+    return sorted(str(p.relative_to(root)) for p in root.rglob('*') if p.is_file() and '.git' not in p.parts)
+
+
+SPARSE_FILES = {'Makefile': 'all:\n', 'api/app.py': 'x = 1\n', 'shared/util.py': 'y = 1\n',
+                'web/index.html': '<p>\n', 'web/style.css': 'p {}\n'}
+
+
+def test_sparse_worktree_checks_out_the_task_directory_and_shared_paths(git_repo, make_project, tmp_path):
+    import json
+
+    from auto_cursor.common import PROJECTS_DIR
+
+    repo = git_repo(SPARSE_FILES)
+    project_id, _ = make_project([{'id': 'a', 'directory': str(tmp_path / 'worktrees' / 'a')}])
+    project_dir = PROJECTS_DIR / project_id
+    (project_dir / 'config.json').write_text(json.dumps(
+        {'path': str(repo), 'sparse_worktrees': True, 'sparse_paths': ['shared/']}))
+    (project_dir / 'tasks.json').write_text(json.dumps([{'id': f'{project_id}-a', 'directory': 'api'}]))
+
+    result, = worktrees.provision(project_id, pool_size=1)['results']
+
+    assert (result['method'], result['sparse']) == ('new', ['api', 'shared'])
+    worktree = tmp_path / 'worktrees' / 'a'
+    assert _files(worktree) == ['Makefile', 'api/app.py', 'shared/util.py']
+
+    # Work outside the sparse paths would be left out of the task's commit
+    (worktree / 'api' / 'app.py').write_text('x = 2\n')
+    (worktree / 'web').mkdir()
+    (worktree / 'web' / 'new.html').write_text('<p>\n')
+    assert worktrees.outside_sparse(worktree) == ['web/new.html']
+
+
+def test_sparse_path_naming_a_file_checks_out_only_that_file(git_repo, tmp_path):
+    repo = git_repo(SPARSE_FILES)
+    target = tmp_path / 'worktrees' / 't1'
+
+    result = worktrees.provision_one(repo, 't1', target, True, None, None, ['api', 'web/index.html'])
+
+    assert result['method'] == 'new'
+    assert _files(target) == ['Makefile', 'api/app.py', 'web/index.html']
+
+
+def test_copy_fallback_copies_only_root_files_and_sparse_paths(tmp_path):
+    project = tmp_path / 'project'
+    for path, text in SPARSE_FILES.items():
+        (project / path).parent.mkdir(parents=True, exist_ok=True)
+        (project / path).write_text(text)
+    target = tmp_path / 'worktrees' / 't1'
+
+    result = worktrees.provision_one(project, 't1', target, False, None, None, ['api'])
+
+    assert result['method'] == 'copy'
+    assert _files(target) == ['Makefile', 'api/app.py']
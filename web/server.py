@@ -32,6 +32,26 @@ except ImportError:
 
 from datetime import datetime
 
+# Shared Auto-Cursor library (repo lib/ directory); optional so the server
+# still runs standalone, e.g. in the Docker image built from web/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+try:
+    from auto_cursor import state_store
+except ImportError:
+    state_store = None
+try:
+    from auto_cursor import heartbeat
+except ImportError:
+    heartbeat = None
+try:
+    from auto_cursor import logcap
+except ImportError:
+    logcap = None
+try:
+    from auto_cursor import log_index
+except ImportError:
+    log_index = None
+
 # Default port - uncommon to avoid conflicts
 DEFAULT_PORT = 8765
 
@@ -74,6 +94,57 @@ def get_projects():
                     pass
     return projects
 
+def load_tasks(project_id, tasks_file):
+    """
+    Load a project's tasks.
+    
+    Reads from the SQLite state store when it is enabled and knows the
+    project (one consistent snapshot), otherwise from tasks.json.
+    
+    Returns:
+        list: Task dictionaries in plan order
+    """
+    if state_store and state_store.enabled():
+        store = state_store.StateStore()
+        try:
+            if store.has_project(project_id):
+                return store.snapshot(project_id)['tasks']
+        finally:
+            store.close()
+    with open(tasks_file, 'r') as f:
+        return json.load(f)
+
+def save_tasks(project_id, tasks_file, tasks, original_statuses=None):
+    """
+    Persist reconciled task statuses.
+    
+    With the state store enabled only the statuses that changed are written,
+    in one transaction, and only if the orchestrator hasn't moved the task
+    since we read it; tasks.json is then re-exported from the store.
+    Otherwise tasks.json is replaced atomically.
+    """
+    if state_store and state_store.enabled():
+        original_statuses = original_statuses or {}
+        changes = {
+            task.get('id'): (original_statuses.get(task.get('id')), task.get('status'))
+            for task in tasks
+            if task.get('status') != original_statuses.get(task.get('id'))
+        }
+        store = state_store.StateStore()
+        try:
+            if not store.has_project(project_id):
+                store.import_tasks(project_id, tasks)
+            elif changes:
+                store.update_task_statuses(project_id, changes)
+            store.export_tasks(project_id, tasks_file)
+        finally:
+            store.close()
+        return
+    tmp_file = Path(f'{tasks_file}.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(tasks, f, indent=2)
+    os.replace(tmp_file, tasks_file)
+
 def strip_ansi(text):
     """
     Remove ANSI color codes from text.
@@ -88,6 +159,66 @@ def strip_ansi(text):
     ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
     return ansi_escape.sub('', text)
 
+def parse_time_param(value):
+    """
+    Parse a since/until query parameter.
+    
+    Args:
+        value (str): Epoch seconds, an ISO 8601 timestamp, or HH:MM[:SS] today
+        
+    Returns:
+        float: Epoch seconds, or None if value is empty
+        
+    Raises:
+        ValueError: If value is not in one of the accepted formats
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    if len(value) <= 8 and ':' in value:
+        parsed = datetime.strptime(value, '%H:%M:%S' if value.count(':') == 2 else '%H:%M').time()
+        return datetime.combine(datetime.now().date(), parsed).timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+def sidecar_log_entry(record):
+    """Convert a structured capture record into the log entry format used by the UI."""
+    return {
+        'type': record.get('level', 'info'),
+        'message': record.get('msg', ''),
+        'stream': record.get('stream'),
+        'seq': record.get('seq'),
+        'timestamp': datetime.fromtimestamp(record['ts']).isoformat() if record.get('ts') else None
+    }
+
+def read_log_page(log_path, offset, lines):
+    """
+    Read up to `lines` lines of a raw log starting at a byte offset.
+    
+    Returns:
+        tuple: (log entries, byte offset after the last line read)
+    """
+    logs = []
+    with open(log_path, 'rb') as f:
+        f.seek(offset)
+        for raw_line in f:
+            if not raw_line.endswith(b'\n'):
+                break
+            line_offset = offset
+            offset += len(raw_line)
+            line = strip_ansi(raw_line.decode('utf-8', errors='ignore').strip())
+            if line:
+                logs.append({
+                    'type': logcap.classify(line) if logcap else 'info',
+                    'message': line,
+                    'offset': line_offset
+                })
+                if len(logs) >= lines:
+                    break
+    return logs, offset
+
 def get_running_agents():
     """
     Get status of all running agents from orchestrate-agents.
@@ -182,6 +313,11 @@ def verify_agent_actually_running(agent_id):
     Returns:
         bool: True if agent is actually running, False otherwise
     """
+    # Agents started through orchestrate-agent-wrapper beat while
+    # cursor-agent is alive, so a fresh beat means it is running
+    if heartbeat and heartbeat.is_fresh(agent_id):
+        return True
+    
     # Check process existence
     is_actually_running = False
     pid_file = Path(f'/tmp/cursor-agents/pids/{agent_id}.pid')
@@ -291,171 +427,106 @@ def get_project_status(project_id):
     tasks_file = project_dir / 'tasks.json'
     if tasks_file.exists():
         try:
-            with open(tasks_file, 'r') as f:
-                tasks = json.load(f)
+            tasks = load_tasks(project_id, tasks_file)
+            original_statuses = {task.get('id'): task.get('status') for task in tasks}
+            
+            # Sync task status with actual agent status
+            for task in tasks:
+                task_id = task.get('id', '')
+                # Try multiple matching strategies
+                matching_status = None
                 
-                # Sync task status with actual agent status
-                for task in tasks:
-                    task_id = task.get('id', '')
-                    # Try multiple matching strategies
-                    matching_status = None
-                    
-                    # Strategy 1: Direct match
-                    if task_id in agent_status_map:
-                        matching_status = agent_status_map[task_id]
-                    else:
-                        # Strategy 2: Agent ID contains task ID
-                        for agent_id, agent_status in agent_status_map.items():
-                            if (task_id in agent_id or 
-                                agent_id.endswith(task_id) or
-                                f"{project_id}-{task_id}" in agent_id or
-                                task_id.replace('-', '') in agent_id.replace('-', '')):
-                                matching_status = agent_status
-                                break
-                    
-                    if matching_status:
-                        # Update task status from actual agent - verify process exists for 'running'
-                        if matching_status == 'running':
-                            # CRITICAL: Verify process is actually running before marking as running
-                            is_actually_running = False
-                            pid_file = Path(f'/tmp/cursor-agents/pids/{task_id}.pid')
+                # Strategy 1: Direct match
+                if task_id in agent_status_map:
+                    matching_status = agent_status_map[task_id]
+                else:
+                    # Strategy 2: Agent ID contains task ID
+                    for agent_id, agent_status in agent_status_map.items():
+                        if (task_id in agent_id or 
+                            agent_id.endswith(task_id) or
+                            f"{project_id}-{task_id}" in agent_id or
+                            task_id.replace('-', '') in agent_id.replace('-', '')):
+                            matching_status = agent_status
+                            break
+                
+                if matching_status:
+                    # Update task status from actual agent - verify process exists for 'running'
+                    if matching_status == 'running':
+                        # CRITICAL: Verify process is actually running before marking as running
+                        is_actually_running = False
+                        pid_file = Path(f'/tmp/cursor-agents/pids/{task_id}.pid')
+                        if pid_file.exists():
+                            try:
+                                pid = int(pid_file.read_text().strip())
+                                result = subprocess.run(
+                                    ['ps', '-p', str(pid)],
+                                    capture_output=True,
+                                    timeout=1
+                                )
+                                if result.returncode == 0:
+                                    is_actually_running = True
+                            except:
+                                pass
+                        
+                        if not is_actually_running:
+                            # Check process list as fallback
+                            try:
+                                result = subprocess.run(
+                                    ['pgrep', '-f', f"cursor-agent.*{task_id}"],
+                                    capture_output=True,
+                                    timeout=2
+                                )
+                                if result.returncode == 0:
+                                    is_actually_running = True
+                            except:
+                                pass
+                        
+                        # CRITICAL: Check log file activity - if log hasn't been updated in 10+ minutes, agent is likely stuck/dead
+                        log_stale = False
+                        log_file = Path(f'/tmp/cursor-agents/logs/{task_id}.log')
+                        if log_file.exists():
+                            try:
+                                from datetime import datetime
+                                mtime = log_file.stat().st_mtime
+                                age_minutes = (datetime.now().timestamp() - mtime) / 60
+                                if age_minutes > 10:  # Log hasn't been updated in 10+ minutes
+                                    log_stale = True
+                            except:
+                                pass
+                        
+                        # CRITICAL: Only mark as running if process actually exists AND log is recent
+                        if is_actually_running and not log_stale:
+                            task['status'] = 'running'
+                        else:
+                            # Process doesn't exist OR log is stale - shut down and check if it actually completed
+                            # Shut down any remaining processes
                             if pid_file.exists():
                                 try:
                                     pid = int(pid_file.read_text().strip())
-                                    result = subprocess.run(
-                                        ['ps', '-p', str(pid)],
-                                        capture_output=True,
-                                        timeout=1
-                                    )
-                                    if result.returncode == 0:
-                                        is_actually_running = True
-                                except:
-                                    pass
-                            
-                            if not is_actually_running:
-                                # Check process list as fallback
-                                try:
-                                    result = subprocess.run(
-                                        ['pgrep', '-f', f"cursor-agent.*{task_id}"],
-                                        capture_output=True,
-                                        timeout=2
-                                    )
-                                    if result.returncode == 0:
-                                        is_actually_running = True
-                                except:
-                                    pass
-                            
-                            # CRITICAL: Check log file activity - if log hasn't been updated in 10+ minutes, agent is likely stuck/dead
-                            log_stale = False
-                            log_file = Path(f'/tmp/cursor-agents/logs/{task_id}.log')
-                            if log_file.exists():
-                                try:
-                                    from datetime import datetime
-                                    mtime = log_file.stat().st_mtime
-                                    age_minutes = (datetime.now().timestamp() - mtime) / 60
-                                    if age_minutes > 10:  # Log hasn't been updated in 10+ minutes
-                                        log_stale = True
+                                    subprocess.run(['kill', '-9', str(pid)], capture_output=True, timeout=2)
                                 except:
                                     pass
+                            try:
+                                subprocess.run(['pkill', '-9', '-f', f"cursor-agent.*{task_id}"], capture_output=True, timeout=2)
+                            except:
+                                pass
                             
-                            # CRITICAL: Only mark as running if process actually exists AND log is recent
-                            if is_actually_running and not log_stale:
-                                task['status'] = 'running'
-                            else:
-                                # Process doesn't exist OR log is stale - shut down and check if it actually completed
-                                # Shut down any remaining processes
-                                if pid_file.exists():
-                                    try:
-                                        pid = int(pid_file.read_text().strip())
-                                        subprocess.run(['kill', '-9', str(pid)], capture_output=True, timeout=2)
-                                    except:
-                                        pass
-                                try:
-                                    subprocess.run(['pkill', '-9', '-f', f"cursor-agent.*{task_id}"], capture_output=True, timeout=2)
-                                except:
-                                    pass
-                                
-                                # Check if task actually completed successfully before marking as failed
-                                # Look for completion indicators in logs AND verify work was actually done
-                                if task.get('status') == 'running':
-                                    # Check if there's evidence of successful completion
-                                    log_file = Path(f'/tmp/cursor-agents/logs/{task_id}.log')
-                                    qa_log_file = Path(f'/tmp/cursor-agents/qa/{task_id}.log')
-                                    worktree_path = Path.home() / '.auto-cursor' / 'worktrees' / f'auto-cursor-auto-cursor-web-{task_id}'
-                                    
-                                    completed = False
-                                    qa_passed = False
-                                    
-                                    # Check QA log first - if QA failed, task didn't complete successfully
-                                    if qa_log_file.exists():
-                                        try:
-                                            qa_content = qa_log_file.read_text()
-                                            # Check for QA failure indicators
-                                            if any(indicator in qa_content.lower() for indicator in ['qa failed', 'qa_failed', 'failed:', 'error:', 'errors:']):
-                                                qa_passed = False
-                                            elif any(indicator in qa_content.lower() for indicator in ['qa passed', 'qa_passed', 'all tests passed', 'success']):
-                                                qa_passed = True
-                                        except:
-                                            pass
-                                    
-                                    # Check agent log for completion
-                                    if log_file.exists():
-                                        try:
-                                            log_content = log_file.read_text()
-                                            # Look for success indicators
-                                            if any(indicator in log_content.lower() for indicator in ['completed', 'success', 'done', 'finished', 'task complete']):
-                                                completed = True
-                                        except:
-                                            pass
-                                    
-                                    # Only mark as completed if BOTH agent completed AND QA passed
-                                    # But be smarter about QA failures - some are minor and shouldn't block completion
-                                    if completed and qa_passed:
-                                        task['status'] = 'completed'
-                                    elif completed and not qa_passed:
-                                        # Check if QA failures are critical or minor
-                                        qa_critical = False
-                                        if qa_log_file.exists():
-                                            try:
-                                                qa_content = qa_log_file.read_text()
-                                                # Critical failures: actual errors, test failures, build failures
-                                                critical_indicators = ['test failed', 'build failed', 'error:', 'exception', 'traceback', 'fatal']
-                                                if any(indicator in qa_content.lower() for indicator in critical_indicators):
-                                                    qa_critical = True
-                                                # Minor failures: documentation, file structure (non-critical)
-                                                minor_indicators = ['documentation', 'file structure', 'style', 'formatting']
-                                                if any(indicator in qa_content.lower() for indicator in minor_indicators) and not qa_critical:
-                                                    # Minor QA issues - don't block completion
-                                                    task['status'] = 'completed'
-                                                    return
-                                            except:
-                                                pass
-                                        
-                                        if qa_critical:
-                                            # Critical QA failure - mark as failed (needs fixing)
-                                            task['status'] = 'failed'
-                                        else:
-                                            # Minor QA issues - allow completion
-                                            task['status'] = 'completed'
-                                    else:
-                                        # Agent didn't complete - allow retry
-                                        task['status'] = 'pending'  # Allow retry instead of permanent failure
-                                else:
-                                    task['status'] = 'pending'  # Wasn't running, keep as pending
-                        elif matching_status == 'pending':
-                            # Agent is marked as pending (not actually running) - check if task was running
+                            # Check if task actually completed successfully before marking as failed
+                            # Look for completion indicators in logs AND verify work was actually done
                             if task.get('status') == 'running':
-                                # Task was marked as running but agent is pending - check if it completed
+                                # Check if there's evidence of successful completion
                                 log_file = Path(f'/tmp/cursor-agents/logs/{task_id}.log')
                                 qa_log_file = Path(f'/tmp/cursor-agents/qa/{task_id}.log')
+                                worktree_path = Path.home() / '.auto-cursor' / 'worktrees' / f'auto-cursor-auto-cursor-web-{task_id}'
                                 
                                 completed = False
                                 qa_passed = False
                                 
-                                # Check QA log
+                                # Check QA log first - if QA failed, task didn't complete successfully
                                 if qa_log_file.exists():
                                     try:
                                         qa_content = qa_log_file.read_text()
+                                        # Check for QA failure indicators
                                         if any(indicator in qa_content.lower() for indicator in ['qa failed', 'qa_failed', 'failed:', 'error:', 'errors:']):
                                             qa_passed = False
                                         elif any(indicator in qa_content.lower() for indicator in ['qa passed', 'qa_passed', 'all tests passed', 'success']):
@@ -463,156 +534,101 @@ def get_project_status(project_id):
                                     except:
                                         pass
                                 
-                                # Check agent log
+                                # Check agent log for completion
                                 if log_file.exists():
                                     try:
                                         log_content = log_file.read_text()
+                                        # Look for success indicators
                                         if any(indicator in log_content.lower() for indicator in ['completed', 'success', 'done', 'finished', 'task complete']):
                                             completed = True
                                     except:
                                         pass
                                 
-                                # Only mark as completed if both agent completed AND QA passed
+                                # Only mark as completed if BOTH agent completed AND QA passed
+                                # But be smarter about QA failures - some are minor and shouldn't block completion
                                 if completed and qa_passed:
                                     task['status'] = 'completed'
                                 elif completed and not qa_passed:
-                                    # Agent finished but QA failed - mark as failed
-                                    task['status'] = 'failed'
+                                    # Check if QA failures are critical or minor
+                                    qa_critical = False
+                                    if qa_log_file.exists():
+                                        try:
+                                            qa_content = qa_log_file.read_text()
+                                            # Critical failures: actual errors, test failures, build failures
+                                            critical_indicators = ['test failed', 'build failed', 'error:', 'exception', 'traceback', 'fatal']
+                                            if any(indicator in qa_content.lower() for indicator in critical_indicators):
+                                                qa_critical = True
+                                            # Minor failures: documentation, file structure (non-critical)
+                                            minor_indicators = ['documentation', 'file structure', 'style', 'formatting']
+                                            if any(indicator in qa_content.lower() for indicator in minor_indicators) and not qa_critical:
+                                                # Minor QA issues - don't block completion
+                                                task['status'] = 'completed'
+                                                return
+                                        except:
+                                            pass
+                                    
+                                    if qa_critical:
+                                        # Critical QA failure - mark as failed (needs fixing)
+                                        task['status'] = 'failed'
+                                    else:
+                                        # Minor QA issues - allow completion
+                                        task['status'] = 'completed'
                                 else:
-                                    # Allow retry instead of permanent failure
-                                    task['status'] = 'pending'
-                        elif matching_status == 'completed':
-                            if task.get('status') not in ['qa_running', 'qa_passed']:
-                                task['status'] = 'completed'
-                        elif matching_status == 'failed':
-                            task['status'] = 'failed'
-                        elif matching_status == 'qa_running':
-                            task['status'] = 'qa_running'
-                    else:
-                        # No matching agent found - if task was marked as running, verify it's actually running
+                                    # Agent didn't complete - allow retry
+                                    task['status'] = 'pending'  # Allow retry instead of permanent failure
+                            else:
+                                task['status'] = 'pending'  # Wasn't running, keep as pending
+                    elif matching_status == 'pending':
+                        # Agent is marked as pending (not actually running) - check if task was running
                         if task.get('status') == 'running':
-                            # Check if process actually exists
-                            is_actually_running = False
-                            pid_file = Path(f'/tmp/cursor-agents/pids/{task_id}.pid')
-                            if pid_file.exists():
-                                try:
-                                    pid = int(pid_file.read_text().strip())
-                                    result = subprocess.run(
-                                        ['ps', '-p', str(pid)],
-                                        capture_output=True,
-                                        timeout=1
-                                    )
-                                    if result.returncode == 0:
-                                        is_actually_running = True
-                                except:
-                                    pass
+                            # Task was marked as running but agent is pending - check if it completed
+                            log_file = Path(f'/tmp/cursor-agents/logs/{task_id}.log')
+                            qa_log_file = Path(f'/tmp/cursor-agents/qa/{task_id}.log')
+                            
+                            completed = False
+                            qa_passed = False
                             
-                            if not is_actually_running:
+                            # Check QA log
+                            if qa_log_file.exists():
                                 try:
-                                    result = subprocess.run(
-                                        ['pgrep', '-f', f"cursor-agent.*{task_id}"],
-                                        capture_output=True,
-                                        timeout=2
-                                    )
-                                    if result.returncode == 0:
-                                        is_actually_running = True
+                                    qa_content = qa_log_file.read_text()
+                                    if any(indicator in qa_content.lower() for indicator in ['qa failed', 'qa_failed', 'failed:', 'error:', 'errors:']):
+                                        qa_passed = False
+                                    elif any(indicator in qa_content.lower() for indicator in ['qa passed', 'qa_passed', 'all tests passed', 'success']):
+                                        qa_passed = True
                                 except:
                                     pass
                             
-                            # CRITICAL: If not actually running, shut down and check completion status
-                            # This fixes stale 'running' status when processes don't exist
-                            if not is_actually_running:
-                                # Shut down any remaining processes
-                                if pid_file.exists():
-                                    try:
-                                        pid = int(pid_file.read_text().strip())
-                                        subprocess.run(['kill', '-9', str(pid)], capture_output=True, timeout=2)
-                                    except:
-                                        pass
+                            # Check agent log
+                            if log_file.exists():
                                 try:
-                                    subprocess.run(['pkill', '-9', '-f', f"cursor-agent.*{task_id}"], capture_output=True, timeout=2)
+                                    log_content = log_file.read_text()
+                                    if any(indicator in log_content.lower() for indicator in ['completed', 'success', 'done', 'finished', 'task complete']):
+                                        completed = True
                                 except:
                                     pass
-                                
-                                # Check if task actually completed before marking status
-                                if task.get('status') == 'running':
-                                    log_file = Path(f'/tmp/cursor-agents/logs/{task_id}.log')
-                                    qa_log_file = Path(f'/tmp/cursor-agents/qa/{task_id}.log')
-                                    
-                                    completed = False
-                                    qa_passed = False
-                                    
-                                    # Check QA log
-                                    if qa_log_file.exists():
-                                        try:
-                                            qa_content = qa_log_file.read_text()
-                                            if any(indicator in qa_content.lower() for indicator in ['qa failed', 'qa_failed', 'failed:', 'error:', 'errors:']):
-                                                qa_passed = False
-                                            elif any(indicator in qa_content.lower() for indicator in ['qa passed', 'qa_passed', 'all tests passed', 'success']):
-                                                qa_passed = True
-                                        except:
-                                            pass
-                                    
-                                    # Check agent log
-                                    if log_file.exists():
-                                        try:
-                                            log_content = log_file.read_text()
-                                            if any(indicator in log_content.lower() for indicator in ['completed', 'success', 'done', 'finished', 'task complete']):
-                                                completed = True
-                                        except:
-                                            pass
-                                    
-                                    # Only mark as completed if both agent completed AND QA passed
-                                    # But be smarter about QA failures
-                                    if completed and qa_passed:
-                                        task['status'] = 'completed'
-                                    elif completed and not qa_passed:
-                                        # Check if QA failures are critical or minor
-                                        qa_critical = False
-                                        if qa_log_file.exists():
-                                            try:
-                                                qa_content = qa_log_file.read_text()
-                                                critical_indicators = ['test failed', 'build failed', 'error:', 'exception', 'traceback', 'fatal']
-                                                if any(indicator in qa_content.lower() for indicator in critical_indicators):
-                                                    qa_critical = True
-                                                minor_indicators = ['documentation', 'file structure', 'style', 'formatting']
-                                                if any(indicator in qa_content.lower() for indicator in minor_indicators) and not qa_critical:
-                                                    # Minor QA issues - allow completion
-                                                    task['status'] = 'completed'
-                                                    continue
-                                            except:
-                                                pass
-                                        
-                                        if qa_critical:
-                                            task['status'] = 'failed'
-                                        else:
-                                            task['status'] = 'completed'
-                                    else:
-                                        # Allow retry instead of permanent failure
-                                        task['status'] = 'pending'
-                                else:
-                                    task['status'] = 'pending'  # Wasn't running, keep as pending
-                    # Note: The else block for no matching agent is now handled above
-                
-                status['tasks'] = tasks
-                
-                # CRITICAL: Write updated task statuses back to tasks.json
-                # This ensures stale 'running' statuses are persisted as 'failed'
-                try:
-                    with open(tasks_file, 'w') as f:
-                        json.dump(tasks, f, indent=2)
-                except Exception as e:
-                    pass  # Silently fail if can't write
-                
-                # Group by status (now synced with actual agents)
-                # CRITICAL: Only add to 'running' if process actually exists
-                for task in tasks:
-                    task_status = task.get('status', 'pending')
-                    
-                    # For 'running' status, double-check process exists
-                    if task_status == 'running':
+                            
+                            # Only mark as completed if both agent completed AND QA passed
+                            if completed and qa_passed:
+                                task['status'] = 'completed'
+                            elif completed and not qa_passed:
+                                # Agent finished but QA failed - mark as failed
+                                task['status'] = 'failed'
+                            else:
+                                # Allow retry instead of permanent failure
+                                task['status'] = 'pending'
+                    elif matching_status == 'completed':
+                        if task.get('status') not in ['qa_running', 'qa_passed']:
+                            task['status'] = 'completed'
+                    elif matching_status == 'failed':
+                        task['status'] = 'failed'
+                    elif matching_status == 'qa_running':
+                        task['status'] = 'qa_running'
+                else:
+                    # No matching agent found - if task was marked as running, verify it's actually running
+                    if task.get('status') == 'running':
+                        # Check if process actually exists
                         is_actually_running = False
-                        task_id = task.get('id', '')
                         pid_file = Path(f'/tmp/cursor-agents/pids/{task_id}.pid')
                         if pid_file.exists():
                             try:
@@ -639,29 +655,148 @@ def get_project_status(project_id):
                             except:
                                 pass
                         
-                        # Only add to running column if process actually exists
-                        if is_actually_running:
-                            status['kanban']['running'].append(task)
-                        else:
-                            # Process doesn't exist - keep in current status (don't auto-change)
-                            # But don't show in 'running' column
-                            if task_status in ['completed', 'qa_passed']:
-                                status['kanban']['completed'].append(task)
-                            elif task_status in ['failed', 'qa_failed']:
-                                status['kanban']['failed'].append(task)
-                            elif task_status == 'qa_running':
-                                status['kanban']['qa'].append(task)
+                        # CRITICAL: If not actually running, shut down and check completion status
+                        # This fixes stale 'running' status when processes don't exist
+                        if not is_actually_running:
+                            # Shut down any remaining processes
+                            if pid_file.exists():
+                                try:
+                                    pid = int(pid_file.read_text().strip())
+                                    subprocess.run(['kill', '-9', str(pid)], capture_output=True, timeout=2)
+                                except:
+                                    pass
+                            try:
+                                subprocess.run(['pkill', '-9', '-f', f"cursor-agent.*{task_id}"], capture_output=True, timeout=2)
+                            except:
+                                pass
+                            
+                            # Check if task actually completed before marking status
+                            if task.get('status') == 'running':
+                                log_file = Path(f'/tmp/cursor-agents/logs/{task_id}.log')
+                                qa_log_file = Path(f'/tmp/cursor-agents/qa/{task_id}.log')
+                                
+                                completed = False
+                                qa_passed = False
+                                
+                                # Check QA log
+                                if qa_log_file.exists():
+                                    try:
+                                        qa_content = qa_log_file.read_text()
+                                        if any(indicator in qa_content.lower() for indicator in ['qa failed', 'qa_failed', 'failed:', 'error:', 'errors:']):
+                                            qa_passed = False
+                                        elif any(indicator in qa_content.lower() for indicator in ['qa passed', 'qa_passed', 'all tests passed', 'success']):
+                                            qa_passed = True
+                                    except:
+                                        pass
+                                
+                                # Check agent log
+                                if log_file.exists():
+                                    try:
+                                        log_content = log_file.read_text()
+                                        if any(indicator in log_content.lower() for indicator in ['completed', 'success', 'done', 'finished', 'task complete']):
+                                            completed = True
+                                    except:
+                                        pass
+                                
+                                # Only mark as completed if both agent completed AND QA passed
+                                # But be smarter about QA failures
+                                if completed and qa_passed:
+                                    task['status'] = 'completed'
+                                elif completed and not qa_passed:
+                                    # Check if QA failures are critical or minor
+                                    qa_critical = False
+                                    if qa_log_file.exists():
+                                        try:
+                                            qa_content = qa_log_file.read_text()
+                                            critical_indicators = ['test failed', 'build failed', 'error:', 'exception', 'traceback', 'fatal']
+                                            if any(indicator in qa_content.lower() for indicator in critical_indicators):
+                                                qa_critical = True
+                                            minor_indicators = ['documentation', 'file structure', 'style', 'formatting']
+                                            if any(indicator in qa_content.lower() for indicator in minor_indicators) and not qa_critical:
+                                                # Minor QA issues - allow completion
+                                                task['status'] = 'completed'
+                                                continue
+                                        except:
+                                            pass
+                                    
+                                    if qa_critical:
+                                        task['status'] = 'failed'
+                                    else:
+                                        task['status'] = 'completed'
+                                else:
+                                    # Allow retry instead of permanent failure
+                                    task['status'] = 'pending'
                             else:
-                                # Keep as pending or current status
-                                status['kanban']['pending'].append(task)
-                    elif task_status in ['completed', 'qa_passed']:
-                        status['kanban']['completed'].append(task)
-                    elif task_status in ['failed', 'qa_failed']:
-                        status['kanban']['failed'].append(task)
-                    elif task_status == 'qa_running':
-                        status['kanban']['qa'].append(task)
+                                task['status'] = 'pending'  # Wasn't running, keep as pending
+                # Note: The else block for no matching agent is now handled above
+            
+            status['tasks'] = tasks
+            
+            # CRITICAL: Write updated task statuses back to tasks.json
+            # This ensures stale 'running' statuses are persisted as 'failed'
+            try:
+                save_tasks(project_id, tasks_file, tasks, original_statuses)
+            except Exception as e:
+                pass  # Silently fail if can't write
+            
+            # Group by status (now synced with actual agents)
+            # CRITICAL: Only add to 'running' if process actually exists
+            for task in tasks:
+                task_status = task.get('status', 'pending')
+                
+                # For 'running' status, double-check process exists
+                if task_status == 'running':
+                    is_actually_running = False
+                    task_id = task.get('id', '')
+                    pid_file = Path(f'/tmp/cursor-agents/pids/{task_id}.pid')
+                    if pid_file.exists():
+                        try:
+                            pid = int(pid_file.read_text().strip())
+                            result = subprocess.run(
+                                ['ps', '-p', str(pid)],
+                                capture_output=True,
+                                timeout=1
+                            )
+                            if result.returncode == 0:
+                                is_actually_running = True
+                        except:
+                            pass
+                    
+                    if not is_actually_running:
+                        try:
+                            result = subprocess.run(
+                                ['pgrep', '-f', f"cursor-agent.*{task_id}"],
+                                capture_output=True,
+                                timeout=2
+                            )
+                            if result.returncode == 0:
+                                is_actually_running = True
+                        except:
+                            pass
+                    
+                    # Only add to running column if process actually exists
+                    if is_actually_running:
+                        status['kanban']['running'].append(task)
                     else:
-                        status['kanban']['pending'].append(task)
+                        # Process doesn't exist - keep in current status (don't auto-change)
+                        # But don't show in 'running' column
+                        if task_status in ['completed', 'qa_passed']:
+                            status['kanban']['completed'].append(task)
+                        elif task_status in ['failed', 'qa_failed']:
+                            status['kanban']['failed'].append(task)
+                        elif task_status == 'qa_running':
+                            status['kanban']['qa'].append(task)
+                        else:
+                            # Keep as pending or current status
+                            status['kanban']['pending'].append(task)
+                elif task_status in ['completed', 'qa_passed']:
+                    status['kanban']['completed'].append(task)
+                elif task_status in ['failed', 'qa_failed']:
+                    status['kanban']['failed'].append(task)
+                elif task_status == 'qa_running':
+                    status['kanban']['qa'].append(task)
+                else:
+                    status['kanban']['pending'].append(task)
         except:
             pass
     
@@ -1049,6 +1184,40 @@ def api_agent_logs(project_id, agent_id):
                     log_path = possible_log
                     break
     
+    # QA log instead of the agent log (search hits with kind "qa")
+    if request.args.get('source') == 'qa':
+        log_path = Path(f'/tmp/cursor-agents/qa/{agent_id}.log')
+    
+    # Paging from a byte offset, e.g. a log search hit. Offsets point into
+    # the structured sidecar when there is one, otherwise into the raw log.
+    offset = request.args.get('offset', type=int)
+    if offset is not None and log_path and log_path.exists():
+        lines = request.args.get('lines', 200, type=int)
+        if request.args.get('source') != 'qa' and logcap and logcap.has_sidecar(log_path):
+            records, next_offset = logcap.read_from(log_path, offset, limit=lines)
+            logs = [sidecar_log_entry(record) for record in records]
+            return jsonify({'logs': logs, 'structured': True, 'offset': offset, 'next_offset': next_offset})
+        logs, next_offset = read_log_page(log_path, offset, lines)
+        return jsonify({'logs': logs, 'structured': False, 'offset': offset, 'next_offset': next_offset})
+    
+    # Structured capture (auto-cursor-logcap): timestamps, streams and levels
+    # come from the sidecar, and time ranges/tails seek via its index
+    if logcap and log_path and logcap.has_sidecar(log_path) and request.args.get('source') != 'qa':
+        try:
+            since = parse_time_param(request.args.get('since'))
+            until = parse_time_param(request.args.get('until'))
+        except ValueError as e:
+            return jsonify({'error': f'Invalid time: {e}'}), 400
+        lines = request.args.get('lines', 200, type=int)
+        if since is not None or until is not None:
+            records = logcap.records_between(log_path, since, until,
+                                             limit=request.args.get('limit', 1000, type=int))
+            next_offset = None
+        else:
+            records, next_offset = logcap.tail(log_path, lines)
+        logs = [sidecar_log_entry(record) for record in records]
+        return jsonify({'logs': logs, 'structured': True, 'next_offset': next_offset})
+    
     if log_path and log_path.exists():
         try:
             with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
@@ -1083,6 +1252,33 @@ def api_agent_logs(project_id, agent_id):
     
     return jsonify({'logs': logs})
 
+@app.route('/api/projects/<project_id>/logs/search', methods=['GET'])
+def api_search_logs(project_id):
+    """
+    Full-text search over the project's agent and QA logs.
+    
+    Query parameters: q (required), severity, task, kind (agent/qa), limit,
+    order (time/rank). Each hit's offset can be passed to the agent-logs
+    endpoint (?offset=, plus source=qa for QA hits) to page from that line.
+    """
+    if not log_index:
+        return jsonify({'error': 'Log search is not available'}), 501
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    severity = request.args.get('severity') or None
+    if severity and severity not in log_index.SEVERITIES:
+        return jsonify({'error': f'Invalid severity: {severity}'}), 400
+    try:
+        hits = log_index.search(project_id, query, severity=severity,
+                                task=request.args.get('task') or None,
+                                kind=request.args.get('kind') or None,
+                                limit=min(request.args.get('limit', 100, type=int), 1000),
+                                order=request.args.get('order', 'time'))
+    except Exception as e:
+        return jsonify({'error': f'Search failed: {str(e)}'}), 500
+    return jsonify({'query': query, 'hits': hits, 'count': len(hits)})
+
 @app.route('/api/projects/<project_id>/agent-logs/<agent_id>/stream', methods=['GET'])
 def api_agent_logs_stream(project_id, agent_id):
     """Stream live log content for a specific agent using Server-Sent Events"""
@@ -1113,6 +1309,15 @@ def api_agent_logs_stream(project_id, agent_id):
             yield f"data: {json.dumps({'type': 'info', 'message': 'No log file found'})}\n\n"
             return
         
+        if logcap and logcap.has_sidecar(log_path):
+            # Follow the structured sidecar from its current end
+            _, offset = logcap.tail(log_path, 0)
+            while True:
+                records, offset = logcap.read_from(log_path, offset)
+                for record in records:
+                    yield f"data: {json.dumps(sidecar_log_entry(record))}\n\n"
+                time.sleep(0.5)
+        
         # Track last position in file
         last_position = 0
         if log_path.exists():